@@ -0,0 +1,82 @@
+import streamlit as st
+import pandas as pd
+from metrics import METRICS_ENABLED, prometheus_text, registry
+import startup_profile
+
+def _labels_text(labels):
+    return ", ".join(f"{key}={value}" for key, value in labels.items())
+
+def _show_histograms(histograms):
+    st.subheader("⏱️ Czasy etapów")
+    latency = [h for h in histograms if h["name"].endswith("_seconds")]
+    if not latency:
+        st.info("Brak pomiarów - wygeneruj ofertę, żeby zobaczyć czasy etapów.")
+    else:
+        st.dataframe(pd.DataFrame([
+            {
+                "etap": h["name"].removesuffix("_seconds"),
+                "etykiety": _labels_text(h["labels"]),
+                "liczba": h["count"],
+                "średnio ms": h["mean"] * 1000,
+                "p50 ms": h["p50"] * 1000,
+                "p95 ms": h["p95"] * 1000,
+                "p99 ms": h["p99"] * 1000,
+                "max ms": h["max"] * 1000,
+            }
+            for h in latency
+        ]).round(1), hide_index=True, use_container_width=True)
+
+    sizes = [h for h in histograms if h["name"] == "offer_pdf_bytes"]
+    for h in sizes:
+        label = f" ({_labels_text(h['labels'])})" if h["labels"] else ""
+        st.write(f"📄 **Rozmiar PDF{label}:** średnio {h['mean'] / 1024:.0f} KB, p95 {h['p95'] / 1024:.0f} KB ({h['count']} ofert)")
+
+def _show_counters(counters, gauges):
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🔢 Liczniki")
+        if counters:
+            st.dataframe(pd.DataFrame([
+                {"licznik": c["name"], "etykiety": _labels_text(c["labels"]), "wartość": c["value"]}
+                for c in counters
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.write("Brak")
+    with col2:
+        st.subheader("🗄️ Cache i kolejka")
+        if gauges:
+            st.dataframe(pd.DataFrame(
+                [{"wskaźnik": name, "wartość": value} for name, value in sorted(gauges.items())]
+            ), hide_index=True, use_container_width=True)
+        else:
+            st.write("Brak")
+
+def admin_interface():
+    st.title("Metryki ofertownika")
+    if not METRICS_ENABLED:
+        st.warning("Metryki są wyłączone (METRICS_ENABLED=0).")
+        return
+
+    snapshot = registry.snapshot()
+    _show_histograms(snapshot["histograms"])
+    _show_counters(snapshot["counters"], snapshot["gauges"])
+
+    if startup_profile.is_enabled():
+        st.subheader("🚀 Import modułów przy starcie")
+        st.dataframe(pd.DataFrame(startup_profile.import_report()), hide_index=True, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Pobierz (format Prometheus)",
+            data=prometheus_text(),
+            file_name="metrics.prom",
+            mime="text/plain",
+        )
+    with col2:
+        if st.button("Wyzeruj metryki"):
+            registry.reset()
+            st.rerun()
+
+if __name__ == "__main__":
+    admin_interface()
@@ -0,0 +1,453 @@
+"""
+HTTP API ofert (Tornado) - wyceny, PDF i analiza opisów dla CRM i
+konfiguratora na stronie, bez interfejsu Streamlit.
+
+    python api_server.py --port 8600 --processes 2
+
+Endpointy (JSON w UTF-8, błędy jako {"error": "..."}):
+
+- GET/POST /api/quote    - wycena i odległość dostawy, bez renderu PDF.
+                           GET (parametry w adresie) ma ETag - powtórzone
+                           zapytanie z If-None-Match dostaje 304
+- GET/POST /api/offer.pdf - oferta PDF (parametr profile: email/print/preview);
+                           POST zapisuje ofertę w archiwum (source="api").
+                           X-Offer-Profile - profil, w którym powstał PDF; gdy
+                           zamówiony przekroczył limit rozmiaru, jest mniejszy,
+                           a X-Offer-Profile-Requested podaje zamówiony
+- POST /api/parse        - konfiguracja sauny z opisu (parser lokalny / LLM)
+- GET /healthz           - stan procesu
+- GET /metrics           - metryki w formacie Prometheusa
+
+Konfiguracja: GET - pola konfiguracji jako parametry (product_type=sauna,
+model=..., location=..., pole podane kilka razy = lista, np. addons);
+POST - {"product_type": "sauna", "data": {...}, "profile": "email"}.
+
+Handlery są asynchroniczne: geokodowanie i analiza opisu idą do puli
+wątków, render PDF do osobnej, ograniczonej puli (API_RENDER_WORKERS), a
+ponad API_RENDER_QUEUE ofert w toku serwer odpowiada 503 z Retry-After.
+Połączenia są utrzymywane (keep-alive HTTP/1.1) do API_IDLE_TIMEOUT s
+bezczynności. Przy ustawionym API_TOKEN zapytania /api/* wymagają nagłówka
+Authorization: Bearer <token>. Przepustowość: benchmarks/bench_api.py.
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Ustawienia z .env (LLM_BACKEND, GEOCODER_MODE, ...) muszą być znane przed importem modułów aplikacji
+load_dotenv()
+
+import argparse
+import asyncio
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.parse import quote as url_quote
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.process
+import tornado.web
+
+from data.catalog import UnknownProductError
+from metrics import inc, observe, prometheus_text, register_collector
+from offer_engine import (
+    ProductType, generate_offer_details_async, get_delivery_info_async, get_product_type,
+    weasyprint_available,
+)
+from pdf_profiles import get_pdf_profile
+from render_env import compile_templates, start_render_threads, warm_up_render_thread
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8600"))
+API_PROCESSES = int(os.getenv("API_PROCESSES", "1"))
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_RENDER_WORKERS = int(os.getenv("API_RENDER_WORKERS", "2"))
+# Oferty PDF w toku (renderowane + czekające na pulę); ponad limit - 503
+API_RENDER_QUEUE = int(os.getenv("API_RENDER_QUEUE", "16"))
+API_PARSE_WORKERS = int(os.getenv("API_PARSE_WORKERS", "4"))
+API_MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(64 * 1024)))
+API_IDLE_TIMEOUT = float(os.getenv("API_IDLE_TIMEOUT", "75"))
+API_MAX_TEXT_CHARS = 4000
+# Pola konfiguracji, które mogą być liczbą (np. "paint": 2) - zamieniane na tekst
+NUMERIC_FIELDS = ("paint", "custom_delivery")
+
+_started = time.monotonic()
+_stats = {"renders_in_flight": 0, "renders_rejected": 0}
+_stats_lock = threading.Lock()
+_parse_executor: Optional[ThreadPoolExecutor] = None
+
+
+class ApiError(tornado.web.HTTPError):
+    """Błąd zwracany klientowi jako {"error": message} (treść po polsku - poza linią statusu HTTP)."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[int] = None):
+        super().__init__(status_code, log_message=message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+def _round_money(value):
+    """Kwoty i odległości w odpowiedzi do 2 miejsc po przecinku (bez 187.60000000000002)"""
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {key: _round_money(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_round_money(item) for item in value]
+    return value
+
+
+def _field_value(product_type: ProductType, field: str, value):
+    """Wartość pola konfiguracji po sprawdzeniu typu: tekst, liczba (NUMERIC_FIELDS) albo lista tekstów (list_fields)"""
+    if value is None or isinstance(value, str):
+        return value or ""
+    if field in NUMERIC_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if field in product_type.list_fields and isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    if field in NUMERIC_FIELDS:
+        expected = "tekst lub liczba"
+    elif field in product_type.list_fields:
+        expected = "tekst lub lista tekstów"
+    else:
+        expected = "tekst"
+    raise ApiError(400, f'Niepoprawne pole "{field}": oczekiwano - {expected}')
+
+
+def _json(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    # Etykieta metryk api_requests_total / api_request_seconds
+    endpoint = "other"
+    requires_token = True
+
+    def prepare(self):
+        if self.requires_token and API_TOKEN:
+            expected = f"Bearer {API_TOKEN}".encode("utf-8")
+            if not hmac.compare_digest(self.request.headers.get("Authorization", "").encode("utf-8"), expected):
+                raise ApiError(401, "Brak lub niepoprawny token API")
+
+    def log_exception(self, typ, value, tb):
+        # Błędy klienta i odrzucenia przy przeciążeniu liczą metryki (_log_request) - bez wpisu w logu
+        if not isinstance(value, ApiError):
+            super().log_exception(typ, value, tb)
+
+    def send_json(self, payload, status: int = 200) -> None:
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.finish(_json(payload))
+
+    def write_error(self, status_code: int, **kwargs):
+        error = kwargs.get("exc_info", (None, None))[1]
+        message = error.message if isinstance(error, ApiError) else self._reason
+        if getattr(error, "retry_after", None) is not None:
+            self.set_header("Retry-After", str(error.retry_after))
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.finish(_json({"error": message}))
+
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(400, f"Niepoprawny JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise ApiError(400, "Oczekiwano obiektu JSON")
+        return body
+
+    def configuration(self) -> Tuple[ProductType, dict, dict]:
+        """
+        Typ produktu i konfiguracja z zapytania (GET - parametry, POST - JSON), po sprawdzeniu w katalogu.
+
+        Returns:
+            Tuple[ProductType, dict, dict]: Typ produktu, konfiguracja z nazwami
+            z katalogu oraz pozostałe opcje zapytania (np. profile)
+        """
+        if self.request.method == "POST":
+            body = self.json_body()
+            type_name = body.get("product_type") or "sauna"
+            data = body.get("data")
+            if not isinstance(data, dict):
+                raise ApiError(400, 'Brak konfiguracji ("data")')
+            options = {key: value for key, value in body.items() if key not in ("product_type", "data")}
+        else:
+            type_name = self.get_query_argument("product_type", "sauna")
+            data, options = {}, {}
+            for name in self.request.query_arguments:
+                values = self.get_query_arguments(name)
+                target = options if name in ("product_type", "profile") else data
+                target[name] = values if len(values) > 1 else values[0]
+
+        if not isinstance(type_name, str) or not isinstance(options.get("profile", ""), (str, type(None))):
+            raise ApiError(400, 'Pola "product_type" i "profile" muszą być tekstem')
+        try:
+            product_type = get_product_type(type_name)
+        except KeyError as e:
+            raise ApiError(400, str(e.args[0])) from None
+        data = {field: _field_value(product_type, field, data.get(field)) for field in product_type.printed_fields}
+        if not data["model"]:
+            raise ApiError(400, "Brak modelu w konfiguracji")
+
+        data = product_type.canonicalize(data)
+        try:
+            product_type.check_catalog(data)
+        except UnknownProductError as e:
+            raise ApiError(400, str(e)) from None
+        return product_type, data, options
+
+
+class QuoteHandler(ApiHandler):
+    endpoint = "quote"
+
+    async def get(self):
+        await self._quote()
+
+    async def post(self):
+        await self._quote()
+
+    async def _quote(self):
+        product_type, data, _ = self.configuration()
+        delivery_info = await get_delivery_info_async(data.get("location", ""))
+        quote = product_type.quote(data, delivery_info["distance_km"])
+        if delivery_info.get("degraded") or delivery_info.get("provisional"):
+            # Odległość zastępcza lub nierozstrzygająca - klient nie może tej wyceny zapamiętać
+            self.set_header("Cache-Control", "no-store")
+        else:
+            # Wycena zależy od cennika i odległości - klient pyta ponownie z If-None-Match (ETag z treści)
+            self.set_header("Cache-Control", "no-cache")
+        self.send_json({
+            "product_type": product_type.name,
+            "data": data,
+            "delivery": _round_money(delivery_info),
+            "quote": _round_money(quote),
+            "total_price": _round_money(quote["total_price"]),
+        })
+
+    def compute_etag(self):
+        return None if self._headers.get("Cache-Control") == "no-store" else super().compute_etag()
+
+
+class OfferHandler(ApiHandler):
+    endpoint = "offer"
+
+    async def get(self):
+        await self._offer(archive=False)
+
+    async def post(self):
+        await self._offer(archive=True)
+
+    async def _offer(self, archive: bool):
+        product_type, data, options = self.configuration()
+        try:
+            profile = get_pdf_profile(options.get("profile"))
+        except KeyError as e:
+            raise ApiError(400, str(e.args[0])) from None
+        if not weasyprint_available():
+            raise ApiError(503, "WeasyPrint nie jest dostępny na tym serwerze")
+
+        with _stats_lock:
+            if _stats["renders_in_flight"] >= API_RENDER_QUEUE:
+                _stats["renders_rejected"] += 1
+                raise ApiError(503, f"Za dużo ofert w toku ({API_RENDER_QUEUE}) - spróbuj ponownie za chwilę", retry_after=2)
+            _stats["renders_in_flight"] += 1
+        try:
+            offer = await generate_offer_details_async(product_type, data, profile=profile)
+            if archive:
+                archive_id = await asyncio.get_running_loop().run_in_executor(_get_parse_executor(), _archive, offer)
+                if archive_id is not None:
+                    self.set_header("X-Archive-Id", str(archive_id))
+            self.set_header("X-Offer-Number", offer["number"])
+        finally:
+            with _stats_lock:
+                _stats["renders_in_flight"] -= 1
+
+        filename = product_type.filename(data)
+        self.set_header("Content-Type", "application/pdf")
+        self.set_header("Content-Disposition", f"attachment; filename*=UTF-8''{url_quote(filename)}")
+        self.set_header("X-Offer-Profile", offer["profile"])
+        if offer["profile"] != offer["requested_profile"]:
+            self.set_header("X-Offer-Profile-Requested", offer["requested_profile"])
+        self.finish(offer["pdf_bytes"])
+
+
+def _archive(offer: dict) -> Optional[int]:
+    from offer_archive import archive_offer
+
+    return archive_offer(offer, source="api")
+
+
+class ParseHandler(ApiHandler):
+    endpoint = "parse"
+
+    async def post(self):
+        text = self.json_body().get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ApiError(400, 'Brak opisu ("text")')
+        if len(text) > API_MAX_TEXT_CHARS:
+            raise ApiError(413, f"Opis dłuższy niż {API_MAX_TEXT_CHARS} znaków")
+        try:
+            sauna_data, path = await asyncio.get_running_loop().run_in_executor(_get_parse_executor(), _parse, text)
+        except json.JSONDecodeError:
+            raise ApiError(502, "Model językowy nie zwrócił poprawnego JSON") from None
+        except Exception as e:
+            print(f"Błąd analizy opisu przez API: {e}")
+            raise ApiError(502, f"Analiza opisu nie powiodła się: {e}") from None
+        self.send_json({"data": sauna_data, "path": path})
+
+
+def _parse(text: str):
+    # Moduł z LLM i katalogiem ładowany przy pierwszym opisie
+    from sauny.description import parse_description
+
+    return parse_description(text)
+
+
+class HealthHandler(ApiHandler):
+    endpoint = "healthz"
+    requires_token = False
+
+    def get(self):
+        self.set_header("Cache-Control", "no-store")
+        self.send_json({
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - _started, 1),
+            "weasyprint": weasyprint_available(),
+            **api_stats(),
+        })
+
+    def compute_etag(self):
+        return None
+
+
+class MetricsHandler(ApiHandler):
+    endpoint = "metrics"
+    requires_token = False
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(prometheus_text())
+
+    def compute_etag(self):
+        return None
+
+
+def _get_parse_executor() -> ThreadPoolExecutor:
+    global _parse_executor
+    if _parse_executor is None:
+        with _stats_lock:
+            if _parse_executor is None:
+                _parse_executor = ThreadPoolExecutor(max_workers=API_PARSE_WORKERS, thread_name_prefix="api-parse")
+    return _parse_executor
+
+
+def api_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["render_queue_limit"] = API_RENDER_QUEUE
+    return stats
+
+
+def _log_request(handler: tornado.web.RequestHandler) -> None:
+    # Zamiast logu dostępu Tornado - metryki każdego zapytania
+    endpoint = getattr(handler, "endpoint", "other")
+    status = handler.get_status()
+    inc("api_requests_total", endpoint=endpoint, status=status)
+    observe("api_request_seconds", handler.request.request_time(), endpoint=endpoint)
+    if status == 500:
+        print(f"API {handler.request.method} {handler.request.path}: {status} ({handler.request.request_time() * 1000:.0f} ms)")
+
+
+class NotFoundHandler(ApiHandler):
+    requires_token = False
+
+    def prepare(self):
+        raise ApiError(404, "Nie ma takiego endpointu")
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (r"/api/quote", QuoteHandler),
+            (r"/api/offer\.pdf", OfferHandler),
+            (r"/api/parse", ParseHandler),
+            (r"/healthz", HealthHandler),
+            (r"/metrics", MetricsHandler),
+        ],
+        default_handler_class=NotFoundHandler,
+        log_function=_log_request,
+    )
+
+
+def warm_up() -> float:
+    """
+    WeasyPrint, szablony, katalogi i zdjęcia ofert - przed pierwszym zapytaniem
+    (i przed fork). Fonty i CSS rozgrzewa każdy wątek puli renderu osobno
+    (install_render_executor).
+    """
+    from data.pricing_engine import get_price_catalog
+    from offer_engine import product_types, warm_up_assets
+
+    started = time.perf_counter()
+    if weasyprint_available():
+        compile_templates()
+    for product_type in product_types():
+        product_type.catalog()
+    get_price_catalog()
+    warm_up_assets()
+    return time.perf_counter() - started
+
+
+def create_server(app: Optional[tornado.web.Application] = None) -> tornado.httpserver.HTTPServer:
+    # Połączenia HTTP/1.1 są utrzymywane między zapytaniami (keep-alive) do idle_connection_timeout
+    return tornado.httpserver.HTTPServer(
+        app or make_app(),
+        xheaders=True,
+        max_body_size=API_MAX_BODY_BYTES,
+        idle_connection_timeout=API_IDLE_TIMEOUT,
+    )
+
+
+def install_render_executor() -> None:
+    """
+    Render PDF (asyncio.to_thread w offer_engine) w ograniczonej puli pętli zdarzeń;
+    wątki puli startują od razu i rozgrzewają własne fonty i CSS.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=API_RENDER_WORKERS, thread_name_prefix="api-render", initializer=warm_up_render_thread
+    )
+    if weasyprint_available():
+        start_render_threads(executor, API_RENDER_WORKERS)
+    asyncio.get_running_loop().set_default_executor(executor)
+
+
+async def serve(sockets) -> None:
+    install_render_executor()
+    server = create_server()
+    server.add_sockets(sockets)
+    print(f"API ofert nasłuchuje (pid {os.getpid()})")
+    await asyncio.Event().wait()
+
+
+register_collector("api", api_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP API ofert (wyceny, PDF, analiza opisów)")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--processes", type=int, default=API_PROCESSES, help="procesy obsługujące port (0 = liczba CPU)")
+    parser.add_argument("--no-warm-up", action="store_true", help="bez rozgrzewania szablonów i zdjęć przy starcie")
+    args = parser.parse_args()
+
+    if not args.no_warm_up:
+        print(f"Rozgrzewanie: {warm_up():.2f} s")
+    listening_sockets = tornado.netutil.bind_sockets(args.port, args.host)
+    if args.processes != 1:
+        # Procesy potomne dzielą gniazdo; pule wątków i połączenia są tworzone po fork
+        tornado.process.fork_processes(args.processes)
+    asyncio.run(serve(listening_sockets))
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime
+
+import streamlit as st
+import pandas as pd
+from offer_archive import ARCHIVE_PAGE_SIZE, OFFER_ARCHIVE_ENABLED, get_offer_archive
+from offer_engine import get_product_type
+
+def _format_date(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+def _reset_pages():
+    # Zmiana filtrów - wracamy na pierwszą stronę
+    st.session_state.archive_cursors = [None]
+
+def _show_offer(archive, offer_id):
+    offer = archive.get(offer_id)
+    if offer is None:
+        st.warning("Oferta nie istnieje w archiwum.")
+        return
+
+    data = offer["data"]
+    product_type = get_product_type(offer["product_type"])
+    quote = offer["quote"]
+    st.subheader(f"📄 Oferta {offer['number']} (#{offer['id']})")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"**Data:** {_format_date(offer['created_at'])}")
+        st.write(f"**Typ:** {data.get('type', '')}")
+        st.write(f"**Model:** {data.get('model', '')}")
+        if data.get("furnace"):
+            st.write(f"**Piec:** {data['furnace']}")
+        if data.get("addons"):
+            st.write(f"**Dodatki:** {', '.join(data['addons'])}")
+        st.write(f"**Malowanie:** {data.get('paint', '')}")
+    with col2:
+        st.write(f"**Lokalizacja:** {data.get('location', '')}")
+        st.write(f"**Odległość:** {offer['delivery_info'].get('distance_km', 0)} km")
+        st.write(f"**Cena całkowita:** {quote.get('total_price', 0):,.2f} zł")
+        st.write(f"**Rozmiar PDF:** {offer['pdf_size'] / 1024:.0f} KB")
+
+    with st.expander("Ceny i konfiguracja"):
+        st.code(json.dumps({"konfiguracja": data, "ceny": quote}, ensure_ascii=False, indent=2), language="json")
+    if offer["input_text"]:
+        with st.expander("Opis klienta"):
+            st.write(offer["input_text"])
+
+    st.download_button(
+        label="📥 Pobierz PDF",
+        data=archive.get_pdf(offer_id),
+        file_name=product_type.filename(data),
+        mime="application/pdf",
+        type="primary",
+        key=f"archive_download_{offer_id}",
+    )
+
+def archive_interface():
+    st.title("Archiwum ofert")
+    if not OFFER_ARCHIVE_ENABLED:
+        st.warning("Archiwum ofert jest wyłączone (OFFER_ARCHIVE_ENABLED=0).")
+        return
+
+    archive = get_offer_archive()
+    if "archive_cursors" not in st.session_state:
+        _reset_pages()
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        text = st.text_input("Szukaj", placeholder="np. Warszawa, Ankel, opis klienta", on_change=_reset_pages)
+    with col2:
+        model = st.selectbox("Model", [""] + archive.models(), format_func=lambda m: m or "Wszystkie", on_change=_reset_pages)
+
+    cursors = st.session_state.archive_cursors
+    # Jeden wiersz więcej, żeby wiedzieć, czy istnieje następna strona
+    rows = archive.search(text, model, before_id=cursors[-1], limit=ARCHIVE_PAGE_SIZE + 1)
+    has_next = len(rows) > ARCHIVE_PAGE_SIZE
+    rows = rows[:ARCHIVE_PAGE_SIZE]
+
+    if not rows:
+        st.info("Brak ofert spełniających kryteria.")
+        return
+
+    table = pd.DataFrame([
+        {
+            "id": row["id"],
+            "data": _format_date(row["created_at"]),
+            "numer": row["number"],
+            "produkt": row["product_type"],
+            "model": row["model"],
+            "piec": row["furnace"],
+            "lokalizacja": row["location"],
+            "km": row["distance_km"],
+            "cena zł": row["total_price"],
+            "źródło": row["source"],
+        }
+        for row in rows
+    ])
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        if st.button("⬅️ Nowsze", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Starsze ➡️", disabled=not has_next):
+            cursors.append(rows[-1]["id"])
+            st.rerun()
+    with col3:
+        st.caption(f"Strona {len(cursors)}")
+
+    offer_id = st.selectbox(
+        "Szczegóły oferty",
+        [row["id"] for row in rows],
+        format_func=lambda i: next(f"#{r['id']} {r['number']} - {r['model']}, {r['location']}" for r in rows if r["id"] == i),
+    )
+    _show_offer(archive, offer_id)
+
+if __name__ == "__main__":
+    archive_interface()
@@ -0,0 +1,129 @@
+"""
+Wspólny dla procesu cache plików graficznych oraz url_fetcher dla WeasyPrint.
+
+Szablon odwołuje się do zdjęć przez logiczne adresy (asset://gallery/<typ>/<profil>/<model>/<n>,
+asset://option/<typ>/<profil>/<rodzaj>/<nazwa>, asset://logo/<profil>), a bajty są podawane WeasyPrint
+bezpośrednio z pamięci - bez base64 i bez kopiowania całego zdjęcia do HTML.
+"""
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from urllib.parse import quote, unquote
+
+from metrics import register_collector
+
+ASSET_SCHEME = "asset://"
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class AssetCache:
+    """Cache LRU zawartości plików ograniczony łącznym rozmiarem, unieważniany po mtime."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[bytes]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+
+        try:
+            with open(path, "rb") as asset_file:
+                data = asset_file.read()
+        except OSError:
+            return None
+
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(path, None)
+            if previous:
+                self.current_bytes -= len(previous[2])
+            # Pliki większe niż cały limit serwujemy bez zapamiętywania
+            if len(data) <= self.max_bytes:
+                self._entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+                self.current_bytes += len(data)
+                while self.current_bytes > self.max_bytes:
+                    _, (_, _, evicted) = self._entries.popitem(last=False)
+                    self.current_bytes -= len(evicted)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+asset_cache = AssetCache(ASSET_CACHE_MAX_BYTES)
+register_collector("asset_cache", asset_cache.stats)
+
+_resolvers: Dict[str, Callable[..., Optional[str]]] = {}
+
+
+def register_asset_resolver(kind: str, resolver: Callable[..., Optional[str]]) -> None:
+    """Rejestruje funkcję zamieniającą części adresu asset://<kind>/... na ścieżkę pliku."""
+    _resolvers[kind] = resolver
+
+
+def asset_url(kind: str, *parts) -> str:
+    return ASSET_SCHEME + "/".join([kind] + [quote(str(part), safe="") for part in parts])
+
+
+def resolve_asset_path(url: str) -> Optional[str]:
+    if not url.startswith(ASSET_SCHEME):
+        return None
+    kind, *parts = url[len(ASSET_SCHEME):].split("/")
+    resolver = _resolvers.get(kind)
+    if resolver is None:
+        return None
+    try:
+        return resolver(*[unquote(part) for part in parts])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def load_asset(url: str) -> Optional[bytes]:
+    """Zwraca bajty zasobu spod adresu asset:// (z cache procesu)."""
+    path = resolve_asset_path(url)
+    return asset_cache.get(path) if path else None
+
+
+def asset_url_fetcher(url, timeout=10, ssl_context=None, http_headers=None):
+    """url_fetcher dla WeasyPrint: asset:// z pamięci, pozostałe adresy domyślnie."""
+    if url.startswith(ASSET_SCHEME):
+        path = resolve_asset_path(url)
+        data = asset_cache.get(path) if path else None
+        if data is None:
+            raise ValueError(f"Nie znaleziono zasobu: {url}")
+        return {
+            "string": data,
+            "mime_type": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "redirected_url": url,
+        }
+
+    from weasyprint import default_url_fetcher
+    return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context, http_headers=http_headers)
@@ -0,0 +1,207 @@
+"""
+Wsadowe generowanie ofert PDF z pliku CSV lub JSONL.
+
+Każdy wiersz to konfiguracja w tym samym formacie co dla generate_sauna_offer
+(type, model, location, custom_delivery, furnace, paint). Lokalizacje są
+geokodowane raz na unikalny adres, kilka naraz i z limitem czasu (wiersz,
+którego lokalizacji geokoder nie ustalił, trafia do raportu jako błąd),
+a PDF-y renderowane równolegle w puli procesów z rozgrzanymi szablonami i zdjęciami.
+
+Przykład: python batch_offers.py targi.csv -o oferty/ --workers 4 --profile print
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from data.normalize import normalize_address
+from offer_engine import get_delivery_info_timed
+from pdf_profiles import PDF_PROFILE, PDF_PROFILES
+
+SAUNA_FIELDS = ("type", "model", "location", "custom_delivery", "furnace", "paint")
+# Lokalizacje geokodowane jednocześnie
+BATCH_GEOCODE_WORKERS = int(os.getenv("BATCH_GEOCODE_WORKERS", "8"))
+
+
+def read_rows(path: str) -> List[Tuple[int, Optional[Dict[str, str]], str]]:
+    """
+    Wczytuje wiersze pliku .csv lub .jsonl. Niepoprawny wiersz (zły JSON, wartość
+    inna niż obiekt) nie przerywa wczytywania - trafia na listę z opisem błędu.
+
+    Returns:
+        List[Tuple[int, Optional[Dict[str, str]], str]]: Numer wiersza (w .jsonl -
+        numer linii pliku), konfiguracja albo None oraz opis błędu ("" gdy poprawny)
+    """
+    rows = []
+    with open(path, encoding="utf-8-sig") as source:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    rows.append((line_number, None, f"Niepoprawny JSON: {e}"))
+                    continue
+                if not isinstance(row, dict):
+                    rows.append((line_number, None, f"Oczekiwano obiektu JSON, jest {type(row).__name__}"))
+                    continue
+                rows.append((line_number, row, ""))
+        else:
+            rows.extend((row_number, row, "") for row_number, row in enumerate(csv.DictReader(source), start=1))
+    return [
+        (row_number, {field: str(row.get(field) or "").strip() for field in SAUNA_FIELDS} if row is not None else None, error)
+        for row_number, row, error in rows
+    ]
+
+
+def read_configurations(path: str) -> List[Dict[str, str]]:
+    """Wczytuje poprawne konfiguracje z pliku .csv lub .jsonl (niepoprawne wiersze są wypisywane i pomijane)"""
+    configurations = []
+    for row_number, sauna_data, error in read_rows(path):
+        if sauna_data is None:
+            print(f"Pominięto wiersz {row_number}: {error}")
+        else:
+            configurations.append(sauna_data)
+    return configurations
+
+
+def resolve_deliveries(configurations: List[Dict[str, str]]) -> Dict[str, dict]:
+    """
+    Geokoduje każdą unikalną (po normalizacji) lokalizację tylko raz, kilka naraz.
+    Lokalizacja, której geokoder nie ustalił w limicie czasu albo zgłosił błąd,
+    dostaje dane zastępcze z degraded=True (patrz offer_engine.get_delivery_info_timed).
+
+    Returns:
+        Dict[str, dict]: Znormalizowana lokalizacja -> dane dostawy
+    """
+    locations = {}
+    for sauna_data in configurations:
+        locations.setdefault(normalize_address(sauna_data["location"]), sauna_data["location"])
+    with ThreadPoolExecutor(max_workers=BATCH_GEOCODE_WORKERS, thread_name_prefix="batch-geocode") as executor:
+        return dict(zip(locations, executor.map(get_delivery_info_timed, locations.values())))
+
+
+def assign_filenames(configurations: List[Dict[str, str]], row_numbers: Optional[List[int]] = None) -> List[str]:
+    from pdf_template import get_pdf_filename
+
+    filenames, used = [], set()
+    for row_number, sauna_data in zip(row_numbers or range(1, len(configurations) + 1), configurations):
+        filename = get_pdf_filename(sauna_data)
+        if filename in used:
+            stem, extension = os.path.splitext(filename)
+            filename = f"{stem}_{row_number:03d}{extension}"
+        used.add(filename)
+        filenames.append(filename)
+    return filenames
+
+
+def _init_worker(profile: Optional[str]) -> None:
+    """Rozgrzewa szablony, fonty i cache zdjęć (w jakości profilu PDF) w procesie roboczym"""
+    from offer_engine import warm_up_assets
+    from render_env import warm_up
+
+    warm_up()
+    warm_up_assets(profile)
+
+
+def _render_one(sauna_data: dict, delivery_info: dict, output_path: str, profile: Optional[str]) -> dict:
+    from pdf_template import generate_sauna_offer_details
+
+    started = time.perf_counter()
+    offer = generate_sauna_offer_details(sauna_data, delivery_info=delivery_info, profile=profile)
+    with open(output_path, "wb") as pdf_file:
+        pdf_file.write(offer["pdf_bytes"])
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "bytes": len(offer["pdf_bytes"]),
+        "profile": offer["profile"],
+        # Oferta ponad limit profilu została wyrenderowana w mniejszym profilu zastępczym
+        "over_limit": offer["profile"] != offer["requested_profile"],
+    }
+
+
+def run_batch(input_path: str, output_dir: str, workers: int, profile: Optional[str] = None) -> List[dict]:
+    """
+    Generuje oferty dla wszystkich wierszy pliku wejściowego.
+
+    Błąd pojedynczej oferty, niepoprawny wiersz pliku ani lokalizacja, której
+    nie udało się geokodować, nie przerywa całego przebiegu - trafia do raportu.
+
+    Args:
+        profile (str, optional): Profil PDF (email, print, preview); domyślnie PDF_PROFILE
+
+    Returns:
+        List[dict]: Raport dla każdego wiersza (status, czas, rozmiar lub błąd)
+    """
+    rows = read_rows(input_path)
+    invalid = [
+        {"row": row_number, "model": "", "file": "", "status": "error", "error": error}
+        for row_number, sauna_data, error in rows if sauna_data is None
+    ]
+    for entry in invalid:
+        print(f"[{entry['row']:>3}] {entry['status']:<5} {entry['error']}")
+    row_numbers = [row_number for row_number, sauna_data, _ in rows if sauna_data is not None]
+    configurations = [sauna_data for _, sauna_data, _ in rows if sauna_data is not None]
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    deliveries = resolve_deliveries(configurations)
+    geocoding_seconds = time.perf_counter() - started
+    print(f"Geokodowanie: {len(deliveries)} unikalnych lokalizacji w {geocoding_seconds:.2f} s")
+
+    filenames = assign_filenames(configurations, row_numbers)
+    report = [None] * len(configurations)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile,)) as executor:
+        futures = {}
+        for index, sauna_data in enumerate(configurations):
+            delivery_info = deliveries[normalize_address(sauna_data["location"])]
+            if delivery_info.get("degraded"):
+                # Bez odległości koszt dostawy byłby "do ustalenia" - oferta do ponowienia
+                report[index] = {
+                    "row": row_numbers[index], "model": sauna_data["model"], "file": filenames[index],
+                    "status": "error", "error": delivery_info["message"],
+                }
+                print(f"[{row_numbers[index]:>3}] error {filenames[index]} {delivery_info['message']}")
+                continue
+            output_path = os.path.join(output_dir, filenames[index])
+            futures[executor.submit(_render_one, sauna_data, delivery_info, output_path, profile)] = index
+
+        for future in as_completed(futures):
+            index = futures[future]
+            entry = {"row": row_numbers[index], "model": configurations[index]["model"], "file": filenames[index]}
+            try:
+                entry.update(status="ok", **future.result())
+            except Exception as e:
+                entry.update(status="error", error=f"{type(e).__name__}: {e}")
+            report[index] = entry
+            print(f"[{entry['row']:>3}] {entry['status']:<5} {entry['file']} {entry.get('seconds', '')} {entry.get('error', '')}")
+
+    total_seconds = time.perf_counter() - started
+    report = sorted(report + invalid, key=lambda entry: entry["row"])
+    failed = sum(1 for entry in report if entry["status"] != "ok")
+    over_limit = sum(1 for entry in report if entry.get("over_limit"))
+    if over_limit:
+        print(f"Uwaga: {over_limit} ofert przekroczyło limit rozmiaru profilu PDF (zapisane w mniejszym profilu)")
+    print(f"Gotowe: {len(report) - failed}/{len(report)} ofert w {total_seconds:.2f} s ({failed} błędów)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wsadowe generowanie ofert PDF")
+    parser.add_argument("input", help="plik .csv lub .jsonl z konfiguracjami saun")
+    parser.add_argument("-o", "--output-dir", default="oferty", help="katalog na pliki PDF")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="liczba procesów renderujących")
+    parser.add_argument("--report", help="zapisz raport JSON do pliku")
+    parser.add_argument("--profile", choices=list(PDF_PROFILES), default=PDF_PROFILE, help="profil PDF")
+    args = parser.parse_args()
+
+    batch_report = run_batch(args.input, args.output_dir, args.workers, args.profile)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            json.dump(batch_report, report_file, ensure_ascii=False, indent=2)
+    sys.exit(1 if any(entry["status"] != "ok" for entry in batch_report) else 0)
@@ -0,0 +1,206 @@
+"""
+Benchmark HTTP API ofert (api_server.py) - przepustowość wycen.
+
+Serwer startuje w osobnym procesie na 127.0.0.1 (geokodowanie offline,
+LLM = StubBackend), a wątki klienta wysyłają po swoich połączeniach
+keep-alive zapytania GET /api/quote z konfiguracjami z katalogu. Drugi
+przebieg powtarza te same zapytania z If-None-Match (odpowiedzi 304).
+Na koniec kilka równoczesnych ofert PDF sprawdza limit renderów w toku.
+
+Kod wyjścia 1, gdy wyceny/s są poniżej --min-rps albo odpowiedzi są błędne:
+
+    python -m benchmarks.bench_api --threads 8 --requests 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+import numpy as np
+
+BENCH_LOCATIONS = ("Warszawa", "Kraków", "Gdańsk", "Poznań", "Wrocław", "Szczecin", "Lublin", "Białystok")
+SERVER_START_TIMEOUT_S = 60.0
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(port: int, processes: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("GEOCODER_MODE", "offline")
+    env.setdefault("LLM_BACKEND", "stub")
+    env.setdefault("GEOCODE_CACHE_PATH", "cache/benchmarks/geocode.sqlite3")
+    env.setdefault("OFFER_ARCHIVE_PATH", "cache/benchmarks/archive.sqlite3")
+    server = subprocess.Popen(
+        [sys.executable, "api_server.py", "--host", "127.0.0.1", "--port", str(port), "--processes", str(processes)],
+        env=env,
+        # Osobna grupa procesów - przy --processes > 1 kończymy też procesy potomne serwera
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/healthz")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError(f"Serwer API nie wystartował w {SERVER_START_TIMEOUT_S:.0f} s")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    os.killpg(server.pid, signal.SIGTERM)
+    server.wait(timeout=10)
+
+
+def quote_paths() -> List[str]:
+    """Adresy GET /api/quote dla kombinacji model x piec x lokalizacja"""
+    from data.catalog import get_catalog
+
+    catalog = get_catalog()
+    return [
+        "/api/quote?" + urlencode({"model": model.name, "furnace": furnace.name, "location": location, "paint": "1"})
+        for model, furnace, location in product(catalog.models, catalog.furnaces, BENCH_LOCATIONS)
+    ]
+
+
+def _run_clients(port: int, paths: List[str], threads: int, requests: int, etags: Optional[Dict[str, str]]) -> dict:
+    """Każdy wątek ma jedno połączenie keep-alive; etags - wysyłaj If-None-Match"""
+    barrier = threading.Barrier(threads)
+    per_thread = requests // threads
+    latencies = [[] for _ in range(threads)]
+    statuses: Dict[int, int] = {}
+    seen_etags: Dict[str, str] = {}
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        barrier.wait()
+        for number in range(per_thread):
+            path = paths[(index * per_thread + number) % len(paths)]
+            headers = {"If-None-Match": etags[path]} if etags and path in etags else {}
+            started = time.perf_counter()
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            latencies[index].append(time.perf_counter() - started)
+            with lock:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if response.getheader("ETag"):
+                    seen_etags[path] = response.getheader("ETag")
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    seconds = time.perf_counter() - started
+    all_latencies = np.concatenate([np.asarray(values) for values in latencies]) * 1000
+    return {
+        "requests": per_thread * threads,
+        "seconds": round(seconds, 3),
+        "requests_per_s": round(per_thread * threads / seconds, 1),
+        "latency_ms": {
+            "p50": round(float(np.percentile(all_latencies, 50)), 2),
+            "p95": round(float(np.percentile(all_latencies, 95)), 2),
+            "max": round(float(all_latencies.max()), 2),
+        },
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "etags": seen_etags,
+    }
+
+
+def _bench_offers(port: int, count: int) -> dict:
+    """count równoczesnych ofert PDF: ile gotowych, ile odrzuconych (503) przez limit renderów w toku"""
+    from data.catalog import get_catalog
+
+    model = get_catalog().models[0].name
+
+    def request_offer(index: int) -> int:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        query = urlencode({"model": model, "location": BENCH_LOCATIONS[index % len(BENCH_LOCATIONS)]})
+        connection.request("GET", f"/api/offer.pdf?{query}")
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        statuses = list(executor.map(request_offer, range(count)))
+    return {
+        "offers": count,
+        "seconds": round(time.perf_counter() - started, 3),
+        "statuses": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+    }
+
+
+def run_benchmark(threads: int, requests: int, processes: int, offers: int) -> dict:
+    port = _free_port()
+    paths = quote_paths()
+    server = start_server(port, processes)
+    try:
+        # Rozgrzanie cache geokodowania serwera - mierzymy API, nie geokoder
+        _run_clients(port, paths, threads, len(paths), None)
+        quotes = _run_clients(port, paths, threads, requests, None)
+        conditional = _run_clients(port, paths, threads, requests, quotes.pop("etags"))
+        conditional.pop("etags")
+        results = {"threads": threads, "processes": processes, "quotes": quotes, "conditional": conditional}
+        if offers:
+            results["offers"] = _bench_offers(port, offers)
+    finally:
+        stop_server(server)
+    return results
+
+
+def check(results: dict, min_rps: float) -> List[str]:
+    """Warunki poprawności i przepustowości; zwraca opisy niespełnionych"""
+    problems = []
+    quotes, conditional = results["quotes"], results["conditional"]
+    if quotes["statuses"] != {"200": quotes["requests"]}:
+        problems.append(f"wyceny: odpowiedzi {quotes['statuses']}")
+    if conditional["statuses"] != {"304": conditional["requests"]}:
+        problems.append(f"If-None-Match: odpowiedzi {conditional['statuses']}")
+    if quotes["requests_per_s"] < min_rps:
+        problems.append(f"przepustowość: {quotes['requests_per_s']} wycen/s (minimum {min_rps})")
+    offers = results.get("offers")
+    if offers and set(offers["statuses"]) - {"200", "503"}:
+        problems.append(f"oferty PDF: odpowiedzi {offers['statuses']}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTTP API ofert (wyceny na sekundę)")
+    parser.add_argument("--threads", type=int, default=8, help="równoczesne połączenia klienta")
+    parser.add_argument("--requests", type=int, default=2000, help="zapytania na przebieg")
+    parser.add_argument("--processes", type=int, default=1, help="procesy serwera")
+    parser.add_argument("--offers", type=int, default=4, help="równoczesne oferty PDF (0 = pomiń)")
+    parser.add_argument("--min-rps", type=float, default=200.0, help="minimalna liczba wycen/s")
+    parser.add_argument("-o", "--output", help="zapisz wyniki JSON do pliku")
+    args = parser.parse_args()
+
+    bench_results = run_benchmark(args.threads, args.requests, args.processes, args.offers)
+    print(json.dumps(bench_results, ensure_ascii=False, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(bench_results, output_file, ensure_ascii=False, indent=2)
+
+    found_problems = check(bench_results, args.min_rps)
+    for problem in found_problems:
+        print(f"Błąd: {problem}")
+    sys.exit(1 if found_problems else 0)
@@ -0,0 +1,242 @@
+"""
+Benchmark klienta Nominatim (data/nominatim.py) na lokalnej atrapie serwera.
+
+Atrapa (ThreadingHTTPServer na 127.0.0.1) odpowiada jak /search Nominatim
+współrzędnymi z offline'owego spisu miejscowości, z zadanym opóźnieniem i
+co N-tym zapytaniem kończącym się 503. Zapisuje czas każdego zapytania i
+port klienta, więc po przebiegu można sprawdzić:
+
+- limit zapytań - w żadnym oknie 1 s nie ma więcej niż burst + rate zapytań,
+- single-flight - wątki pytające naraz o te same adresy wysyłają jedno zapytanie na adres,
+- sprawiedliwość - wątki z różnymi adresami czekają podobnie długo (indeks Jaina),
+- pulę połączeń - liczba połączeń TCP nie przekracza rozmiaru puli,
+- ponowienia - zapytania z odpowiedzią 503 kończą się wynikiem po ponowieniu.
+
+Kod wyjścia 1, gdy którykolwiek warunek nie jest spełniony:
+
+    python -m benchmarks.bench_nominatim --rate 10 --threads 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from data.gazetteer import GAZETTEER_LOCALITIES_PATH, offline_geocode
+from data.nominatim import NominatimClient
+
+# Tolerancja zegara między wątkiem serwera a kubełkiem tokenów klienta
+RATE_TOLERANCE_S = 0.02
+
+
+class StandInNominatim:
+    """Lokalna atrapa /search Nominatim z rejestrem zapytań."""
+
+    def __init__(self, latency_s: float = 0.02, fail_every: int = 0):
+        self.latency_s = latency_s
+        self.fail_every = fail_every
+        self.requests: List[Tuple[float, str, int, int]] = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="nominatim-stand-in", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/search":
+                    self.send_error(404)
+                    return
+                query = parse_qs(url.query).get("q", [""])[0]
+                with stand_in._lock:
+                    number = len(stand_in.requests) + 1
+                    failed = bool(stand_in.fail_every) and number % stand_in.fail_every == 0
+                    stand_in.requests.append((time.monotonic(), query, self.client_address[1], 503 if failed else 200))
+                time.sleep(stand_in.latency_s)
+
+                if failed:
+                    body = b'{"error": "Service Unavailable"}'
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                else:
+                    coords = offline_geocode(query)
+                    answer = [{"lat": str(coords[0]), "lon": str(coords[1])}] if coords else []
+                    body = json.dumps(answer).encode("utf-8")
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_addresses(count: int) -> List[str]:
+    with open(GAZETTEER_LOCALITIES_PATH, encoding="utf-8") as source:
+        return [row["name"] for _, row in zip(range(count), csv.DictReader(source))]
+
+
+def _run_threads(client: NominatimClient, address_lists: List[List[str]]) -> List[List[float]]:
+    """Każdy wątek geokoduje swoją listę adresów; start wszystkich naraz. Zwraca czasy odpowiedzi."""
+    barrier = threading.Barrier(len(address_lists))
+    latencies = [[] for _ in address_lists]
+    failures = []
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        for address in address_lists[index]:
+            started = time.monotonic()
+            coords, definitive = client.search(address)
+            latencies[index].append(time.monotonic() - started)
+            if not definitive:
+                failures.append(address)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(address_lists))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        print(f"Nierozstrzygnięte zapytania: {len(failures)}")
+    return latencies
+
+
+def max_requests_per_window(times: List[float], window_s: float) -> int:
+    ordered = np.sort(np.asarray(times))
+    if len(ordered) == 0:
+        return 0
+    ends = np.searchsorted(ordered, ordered + window_s - RATE_TOLERANCE_S, side="left")
+    return int((ends - np.arange(len(ordered))).max())
+
+
+def jain_index(values: List[float]) -> float:
+    """Indeks sprawiedliwości Jaina: 1.0 = wszyscy jednakowo, 1/n = jeden dostaje wszystko."""
+    array = np.asarray(values, dtype=np.float64)
+    return float(array.sum() ** 2 / (len(array) * (array ** 2).sum())) if array.any() else 1.0
+
+
+def run_benchmark(rate: float, burst: int, threads: int, addresses: int, latency_s: float, fail_every: int, pool_size: int) -> dict:
+    results = {}
+    names = bench_addresses(addresses * threads)
+
+    # 1) Wszystkie wątki pytają o te same adresy w tej samej kolejności - single-flight
+    with StandInNominatim(latency_s) as server:
+        client = NominatimClient(base_url=server.base_url, rate=rate, burst=burst, pool_size=pool_size, backoff=0.05)
+        started = time.monotonic()
+        _run_threads(client, [names[:addresses]] * threads)
+        seconds = time.monotonic() - started
+        stats = client.stats()
+        results["coalescing"] = {
+            "lookups": stats["lookups"],
+            "unique_addresses": addresses,
+            "upstream_requests": len(server.requests),
+            "coalesced": stats["coalesced"],
+            "seconds": round(seconds, 3),
+        }
+
+    # 2) Każdy wątek ma własne adresy - limit zapytań, sprawiedliwość, pula połączeń, ponowienia
+    with StandInNominatim(latency_s, fail_every) as server:
+        client = NominatimClient(base_url=server.base_url, rate=rate, burst=burst, pool_size=pool_size, backoff=0.05)
+        started = time.monotonic()
+        latencies = _run_threads(client, [names[index * addresses:(index + 1) * addresses] for index in range(threads)])
+        seconds = time.monotonic() - started
+        stats = client.stats()
+        times = [request[0] for request in server.requests]
+        per_thread_mean = [float(np.mean(values)) for values in latencies]
+        all_latencies = np.concatenate([np.asarray(values) for values in latencies]) * 1000
+        results["fairness"] = {
+            "lookups": stats["lookups"],
+            "upstream_requests": len(server.requests),
+            "failed_upstream": sum(1 for request in server.requests if request[3] != 200),
+            "retries": stats["retries"],
+            "failures": stats["failures"],
+            "seconds": round(seconds, 3),
+            "requests_per_s": round(len(times) / seconds, 2),
+            "max_requests_per_s_window": max_requests_per_window(times, 1.0),
+            "allowed_per_s_window": burst + int(rate),
+            "connections": len({request[2] for request in server.requests}),
+            "pool_size": pool_size,
+            "latency_ms": {
+                "p50": round(float(np.percentile(all_latencies, 50)), 1),
+                "p95": round(float(np.percentile(all_latencies, 95)), 1),
+                "max": round(float(all_latencies.max()), 1),
+            },
+            "thread_mean_latency_ms": [round(value * 1000, 1) for value in per_thread_mean],
+            "jain_index": round(jain_index(per_thread_mean), 4),
+        }
+    return results
+
+
+def check(results: dict) -> List[str]:
+    """Warunki poprawności klienta; zwraca opisy niespełnionych"""
+    problems = []
+    coalescing, fairness = results["coalescing"], results["fairness"]
+    if coalescing["upstream_requests"] > coalescing["unique_addresses"]:
+        problems.append(
+            f"single-flight: {coalescing['upstream_requests']} zapytań na {coalescing['unique_addresses']} adresów"
+        )
+    if fairness["max_requests_per_s_window"] > fairness["allowed_per_s_window"]:
+        problems.append(
+            f"limit: {fairness['max_requests_per_s_window']} zapytań w oknie 1 s (dozwolone {fairness['allowed_per_s_window']})"
+        )
+    if fairness["connections"] > fairness["pool_size"]:
+        problems.append(f"pula: {fairness['connections']} połączeń przy puli {fairness['pool_size']}")
+    if fairness["failures"]:
+        problems.append(f"ponowienia: {fairness['failures']} zapytań bez wyniku")
+    if fairness["jain_index"] < 0.9:
+        problems.append(f"sprawiedliwość: indeks Jaina {fairness['jain_index']}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark klienta Nominatim na lokalnej atrapie serwera")
+    parser.add_argument("--rate", type=float, default=10.0, help="limit zapytań/s (produkcyjnie 1)")
+    parser.add_argument("--burst", type=int, default=1, help="pojemność kubełka tokenów")
+    parser.add_argument("--threads", type=int, default=8, help="równoczesne sesje")
+    parser.add_argument("--addresses", type=int, default=6, help="adresy na wątek")
+    parser.add_argument("--latency", type=float, default=0.02, help="opóźnienie odpowiedzi atrapy (s)")
+    parser.add_argument("--fail-every", type=int, default=7, help="co N-te zapytanie kończy się 503 (0 = nigdy)")
+    parser.add_argument("--pool-size", type=int, default=4, help="rozmiar puli połączeń")
+    parser.add_argument("-o", "--output", help="zapisz wyniki JSON do pliku")
+    args = parser.parse_args()
+
+    bench_results = run_benchmark(
+        args.rate, args.burst, args.threads, args.addresses, args.latency, args.fail_every, args.pool_size
+    )
+    print(json.dumps(bench_results, ensure_ascii=False, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(bench_results, output_file, ensure_ascii=False, indent=2)
+
+    found_problems = check(bench_results)
+    for problem in found_problems:
+        print(f"Błąd: {problem}")
+    sys.exit(1 if found_problems else 0)
@@ -0,0 +1,437 @@
+"""
+Benchmark generowania ofert PDF bez dostępu do sieci.
+
+Nominatim jest zastąpiony odpowiedzią z offline'owego spisu miejscowości
+(z symulowanym opóźnieniem), a model językowy - lokalnym StubBackend.
+Dla każdej kombinacji model x piec mierzone są osobno etapy: wczytanie zdjęć,
+geokodowanie, wycena, szablon Jinja i layout/zapis WeasyPrint, a do tego
+czas całej oferty, rozmiar PDF i szczytowe RSS procesu. Przebieg skalowania
+pokazuje przepustowość dla 1/10/100 ofert po kolei i dla N procesów.
+Dla każdego profilu PDF (pdf_profiles) mierzony jest rozmiar i czas renderu;
+oferta większa niż max_bytes profilu (renderowana wtedy w mniejszym profilu)
+kończy benchmark kodem 1.
+Przebieg fragmentów porównuje render całej oferty z ofertą składaną z gotowych
+stron stałych (pdf_fragments): pierwszą dla danego model x piec i kolejne.
+
+Wynik trafia do pliku JSON i może być porównany z zapisanym punktem odniesienia:
+
+    python -m benchmarks.bench_offers --update-baseline     # nowy punkt odniesienia
+    python -m benchmarks.bench_offers --threshold 0.2       # kod wyjścia 1 przy regresji
+"""
+import os
+
+# Konfiguracja modułów aplikacji jest czytana przy imporcie - ustawiamy ją przed nimi
+os.environ.setdefault("OFFER_CACHE_ENABLED", "0")
+os.environ.setdefault("GEOCODER_MODE", "online")
+os.environ.setdefault("GEOCODE_CACHE_PATH", "cache/benchmarks/geocode.sqlite3")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("LLM_CACHE_PATH", "cache/benchmarks/llm.sqlite3")
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import data.prices as prices
+from data.gazetteer import offline_geocode
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+RESULTS_PATH = "cache/benchmarks/latest.json"
+BENCH_LOCATIONS = ("Warszawa", "Kraków", "Gdańsk", "Poznań", "Wrocław", "Szczecin", "Lublin", "Białystok")
+STAGES = ("assets", "geocode", "pricing", "template", "layout", "total")
+# Różnice czasu poniżej tego progu (ms) to szum pomiaru, nie regresja
+MIN_DELTA_MS = 5.0
+
+_geocode_latency_s = 0.0
+
+
+def _stub_query_nominatim(address: str):
+    """Odpowiedź "Nominatim" z lokalnego spisu miejscowości, z opóźnieniem sieci"""
+    time.sleep(_geocode_latency_s)
+    return offline_geocode(address), True
+
+
+def install_stubs(geocode_latency_s: float) -> None:
+    """Odcina benchmark od sieci: geokoder z lokalnego spisu, LLM = StubBackend (LLM_BACKEND)"""
+    global _geocode_latency_s
+    _geocode_latency_s = geocode_latency_s
+    prices._query_nominatim = _stub_query_nominatim
+
+
+def _init_worker(geocode_latency_s: float) -> None:
+    from render_env import warm_up
+
+    install_stubs(geocode_latency_s)
+    warm_up()
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # Na Linuksie ru_maxrss jest w KB, na macOS w bajtach
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _summary(values: List[float], scale: float = 1000.0) -> dict:
+    array = np.asarray(values, dtype=np.float64) * scale
+    return {
+        "mean": round(float(array.mean()), 3),
+        "p50": round(float(np.percentile(array, 50)), 3),
+        "p95": round(float(np.percentile(array, 95)), 3),
+        "max": round(float(array.max()), 3),
+    }
+
+
+def bench_configurations() -> List[dict]:
+    """Wszystkie kombinacje model x piec z katalogu, z kolejnymi lokalizacjami testowymi"""
+    from data.catalog import get_catalog
+
+    catalog = get_catalog()
+    return [
+        {
+            "type": model.type,
+            "model": model.name,
+            "location": BENCH_LOCATIONS[index % len(BENCH_LOCATIONS)],
+            "custom_delivery": "",
+            "furnace": furnace.name,
+            "paint": "1",
+        }
+        for index, (model, furnace) in enumerate(product(catalog.models, catalog.furnaces))
+    ]
+
+
+def _clear_caches() -> None:
+    from assets import asset_cache
+    from data.geocache import get_geocode_cache
+
+    asset_cache.clear()
+    get_geocode_cache().clear()
+
+
+def bench_offer(sauna_data: dict) -> dict:
+    """Mierzy etapy jednej oferty (z zimnymi cache zdjęć i geokodowania procesu)"""
+    from data.pricing_engine import quote_offer
+    from offer_engine import gather_offer_inputs
+    from pdf_template import SAUNA, generate_sauna_offer
+    from render_env import render_timings
+
+    _clear_caches()
+    started = time.perf_counter()
+    gather_offer_inputs(SAUNA, sauna_data, delivery_info={"distance_km": 0.0, "delivery_cost": 0.0, "message": ""})
+    assets_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    delivery_info = prices.get_delivery_info(sauna_data["location"])
+    geocode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    quote_offer(sauna_data, delivery_info["distance_km"])
+    pricing_s = time.perf_counter() - started
+
+    _clear_caches()
+    started = time.perf_counter()
+    pdf_bytes = generate_sauna_offer(sauna_data)
+    total_s = time.perf_counter() - started
+    timings = render_timings()
+
+    return {
+        "model": sauna_data["model"],
+        "furnace": sauna_data["furnace"],
+        "assets": assets_s,
+        "geocode": geocode_s,
+        "pricing": pricing_s,
+        "template": timings["last_template_s"],
+        "layout": timings["last_layout_s"],
+        "total": total_s,
+        "pdf_bytes": len(pdf_bytes),
+    }
+
+
+def bench_profiles(configurations: List[dict]) -> Dict[str, dict]:
+    """Rozmiar i czas renderu ofert w każdym profilu PDF oraz liczba ofert ponad limit profilu"""
+    from pdf_profiles import PDF_PROFILES
+    from pdf_profiles import PdfTooLargeError
+    from pdf_template import generate_sauna_offer_details
+
+    results = {}
+    for profile in PDF_PROFILES.values():
+        seconds, sizes, over_limit = [], [], 0
+        for sauna_data in configurations:
+            started = time.perf_counter()
+            try:
+                offer = generate_sauna_offer_details(sauna_data, profile=profile)
+                # Ponad limit: oferta wyrenderowana ponownie w mniejszym profilu
+                over_limit += offer["profile"] != profile.name
+                sizes.append(len(offer["pdf_bytes"]))
+            except PdfTooLargeError as e:
+                over_limit += 1
+                sizes.append(e.size)
+            seconds.append(time.perf_counter() - started)
+        results[profile.name] = {
+            "render_ms": _summary(seconds),
+            "pdf_bytes": _summary(sizes, scale=1.0),
+            "max_bytes": profile.max_bytes,
+            "over_limit": over_limit,
+        }
+    return results
+
+
+def bench_fragments(configurations: List[dict]) -> dict:
+    """Czas oferty renderowanej w całości i składanej z fragmentów (pierwsza i kolejna dla tej samej konfiguracji)"""
+    import offer_engine
+    from pdf_fragments import get_fragment_cache
+    from pdf_template import generate_sauna_offer
+
+    def timed(sauna_data: dict) -> float:
+        started = time.perf_counter()
+        generate_sauna_offer(sauna_data)
+        return time.perf_counter() - started
+
+    enabled = offer_engine.OFFER_FRAGMENTS_ENABLED
+    get_fragment_cache().clear()
+    try:
+        offer_engine.OFFER_FRAGMENTS_ENABLED = False
+        full = [timed(sauna_data) for sauna_data in configurations]
+        offer_engine.OFFER_FRAGMENTS_ENABLED = True
+        cold = [timed(sauna_data) for sauna_data in configurations]
+        # Ta sama konfiguracja w innej lokalizacji - zmieniają się tylko strony zmienne
+        warm = [
+            timed(dict(sauna_data, location=BENCH_LOCATIONS[(BENCH_LOCATIONS.index(sauna_data["location"]) + 1) % len(BENCH_LOCATIONS)]))
+            for sauna_data in configurations
+        ]
+    finally:
+        offer_engine.OFFER_FRAGMENTS_ENABLED = enabled
+    return {
+        "full_ms": _summary(full),
+        "first_ms": _summary(cold),
+        "warm_ms": _summary(warm),
+        "warm_to_full": round(float(np.median(warm) / np.median(full)), 3),
+        "cache": get_fragment_cache().stats(),
+    }
+
+
+def _render_offer(sauna_data: dict) -> int:
+    from pdf_template import generate_sauna_offer
+
+    return len(generate_sauna_offer(sauna_data))
+
+
+def bench_sequential(configurations: List[dict], count: int) -> dict:
+    started = time.perf_counter()
+    for index in range(count):
+        _render_offer(configurations[index % len(configurations)])
+    seconds = time.perf_counter() - started
+    return {
+        "offers": count,
+        "seconds": round(seconds, 3),
+        "offers_per_s": round(count / seconds, 2),
+        "seconds_per_offer": round(seconds / count, 4),
+    }
+
+
+def bench_parallel(configurations: List[dict], workers: int, count: int, geocode_latency_s: float) -> dict:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(geocode_latency_s,)) as executor:
+        # Rozruch procesów (import, fonty) nie wlicza się do przepustowości
+        list(executor.map(_render_offer, configurations[:workers]))
+        started = time.perf_counter()
+        list(executor.map(_render_offer, (configurations[index % len(configurations)] for index in range(count))))
+        seconds = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "offers": count,
+        "seconds": round(seconds, 3),
+        "offers_per_s": round(count / seconds, 2),
+        "seconds_per_offer": round(seconds / count, 4),
+        "peak_worker_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_benchmark(
+    geocode_latency_s: float = 0.05,
+    repeat: int = 1,
+    sequential_counts=(1, 10, 100),
+    worker_counts=(1, 2, 4),
+    parallel_offers: int = 40,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    Wykonuje pełny benchmark.
+
+    Args:
+        geocode_latency_s (float): Symulowane opóźnienie odpowiedzi geokodera
+        repeat (int): Ile razy zmierzyć każdą kombinację model x piec
+        sequential_counts: Liczby ofert generowanych po kolei w przebiegu skalowania
+        worker_counts: Liczby procesów w przebiegu równoległym
+        parallel_offers (int): Liczba ofert na każdy przebieg równoległy
+        limit (int, optional): Ogranicza liczbę kombinacji (szybki przebieg)
+
+    Returns:
+        dict: Wyniki gotowe do zapisu w JSON
+    """
+    from render_env import warm_up
+
+    install_stubs(geocode_latency_s)
+    configurations = bench_configurations()[:limit]
+
+    warm_up_s = warm_up()
+
+    offers = [bench_offer(sauna_data) for _ in range(repeat) for sauna_data in configurations]
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "geocode_latency_s": geocode_latency_s,
+            "combinations": len(configurations),
+            "repeat": repeat,
+        },
+        "warm_up_s": round(warm_up_s, 3),
+        "stages_ms": {stage: _summary([offer[stage] for offer in offers]) for stage in STAGES},
+        "pdf_bytes": _summary([offer["pdf_bytes"] for offer in offers], scale=1.0),
+        "offers": offers,
+        "profiles": bench_profiles(configurations),
+        "fragments": bench_fragments(configurations),
+        "scaling": {
+            "sequential": [bench_sequential(configurations, count) for count in sequential_counts],
+            "parallel": [
+                bench_parallel(configurations, workers, parallel_offers, geocode_latency_s)
+                for workers in worker_counts
+            ],
+        },
+    }
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+def _comparable_metrics(results: dict) -> Dict[str, float]:
+    """Metryki porównywane z punktem odniesienia - wszystkie "mniej znaczy lepiej" """
+    metrics = {f"stages_ms.{stage}.p50": summary["p50"] for stage, summary in results["stages_ms"].items()}
+    metrics["pdf_bytes.mean"] = results["pdf_bytes"]["mean"]
+    for name, profile in results.get("profiles", {}).items():
+        metrics[f"profile.{name}.pdf_bytes.mean"] = profile["pdf_bytes"]["mean"]
+        metrics[f"profile.{name}.render_ms.p50"] = profile["render_ms"]["p50"]
+    if "fragments" in results:
+        metrics["fragments.warm_ms.p50"] = results["fragments"]["warm_ms"]["p50"]
+    for run in results["scaling"]["sequential"]:
+        metrics[f"sequential.{run['offers']}.ms_per_offer"] = run["seconds_per_offer"] * 1000
+    for run in results["scaling"]["parallel"]:
+        metrics[f"parallel.{run['workers']}.ms_per_offer"] = run["seconds_per_offer"] * 1000
+    return metrics
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Porównuje wyniki z punktem odniesienia.
+
+    Returns:
+        List[str]: Opisy metryk gorszych o więcej niż threshold (np. 0.2 = 20%)
+    """
+    current, reference = _comparable_metrics(results), _comparable_metrics(baseline)
+    regressions = []
+    for name, value in current.items():
+        base_value = reference.get(name)
+        if not base_value:
+            continue
+        change = (value - base_value) / base_value
+        is_time = "ms" in name
+        marker = ""
+        if change > threshold and not (is_time and value - base_value < MIN_DELTA_MS):
+            marker = "  <-- regresja"
+            regressions.append(f"{name}: {base_value:.3f} -> {value:.3f} ({change:+.0%})")
+        print(f"{name:<32} {base_value:>12.3f} {value:>12.3f} {change:>+8.1%}{marker}")
+    return regressions
+
+
+def _print_summary(results: dict) -> None:
+    print(f"Kombinacje: {results['meta']['combinations']}, rozgrzewanie: {results['warm_up_s']} s")
+    print(f"{'etap':<10} {'średnio ms':>11} {'p50':>9} {'p95':>9} {'max':>9}")
+    for stage, summary in results["stages_ms"].items():
+        print(f"{stage:<10} {summary['mean']:>11.2f} {summary['p50']:>9.2f} {summary['p95']:>9.2f} {summary['max']:>9.2f}")
+    print(f"PDF: średnio {results['pdf_bytes']['mean'] / 1024:.0f} KB, max {results['pdf_bytes']['max'] / 1024:.0f} KB")
+    print(f"Szczytowe RSS: {results['peak_rss_mb']} MB")
+    for name, profile in results["profiles"].items():
+        print(
+            f"Profil {name:<8} PDF średnio {profile['pdf_bytes']['mean'] / 1024:>6.0f} KB, "
+            f"max {profile['pdf_bytes']['max'] / 1024:>6.0f} KB (limit {profile['max_bytes'] / 1024:.0f} KB), "
+            f"render p50 {profile['render_ms']['p50']:.1f} ms"
+        )
+    fragments = results["fragments"]
+    print(
+        f"Fragmenty: cała oferta p50 {fragments['full_ms']['p50']:.1f} ms, pierwsza z fragmentem "
+        f"{fragments['first_ms']['p50']:.1f} ms, kolejna {fragments['warm_ms']['p50']:.1f} ms "
+        f"({fragments['warm_to_full']:.0%} czasu całej)"
+    )
+    for run in results["scaling"]["sequential"]:
+        print(f"Po kolei {run['offers']:>4} ofert: {run['seconds']:>7.2f} s ({run['offers_per_s']} ofert/s)")
+    for run in results["scaling"]["parallel"]:
+        print(
+            f"{run['workers']:>2} procesów, {run['offers']} ofert: {run['seconds']:>7.2f} s "
+            f"({run['offers_per_s']} ofert/s, RSS procesu do {run['peak_worker_rss_mb']} MB)"
+        )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generowania ofert PDF (bez sieci)")
+    parser.add_argument("-o", "--output", default=RESULTS_PATH, help="plik JSON z wynikami")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="plik JSON z punktem odniesienia")
+    parser.add_argument("--update-baseline", action="store_true", help="zapisz wyniki jako nowy punkt odniesienia")
+    parser.add_argument("--threshold", type=float, default=0.2, help="dopuszczalne pogorszenie (0.2 = 20%%)")
+    parser.add_argument("--geocode-latency", type=float, default=0.05, help="symulowane opóźnienie geokodera (s)")
+    parser.add_argument("--repeat", type=int, default=1, help="pomiary na kombinację model x piec")
+    parser.add_argument("--limit", type=int, help="ogranicz liczbę kombinacji")
+    parser.add_argument("--sequential", type=_int_list, default=[1, 10, 100], help="np. 1,10,100")
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4], help="np. 1,2,4")
+    parser.add_argument("--parallel-offers", type=int, default=40, help="oferty na przebieg równoległy")
+    args = parser.parse_args()
+
+    bench_results = run_benchmark(
+        geocode_latency_s=args.geocode_latency,
+        repeat=args.repeat,
+        sequential_counts=args.sequential,
+        worker_counts=args.workers,
+        parallel_offers=args.parallel_offers,
+        limit=args.limit,
+    )
+    _print_summary(bench_results)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(bench_results, output_file, ensure_ascii=False, indent=2)
+    print(f"Wyniki zapisane w {args.output}")
+
+    oversized = {name: profile["over_limit"] for name, profile in bench_results["profiles"].items() if profile["over_limit"]}
+    if oversized:
+        for name, count in oversized.items():
+            print(f"Profil {name}: {count} ofert ponad limit {bench_results['profiles'][name]['max_bytes'] / 1024:.0f} KB")
+        sys.exit(1)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(bench_results, baseline_file, ensure_ascii=False, indent=2)
+        print(f"Zapisano punkt odniesienia {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"Brak punktu odniesienia ({args.baseline}) - uruchom z --update-baseline")
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline_results = json.load(baseline_file)
+    found_regressions = compare_with_baseline(bench_results, baseline_results, args.threshold)
+    if found_regressions:
+        print(f"Regresje wydajności (próg {args.threshold:.0%}):")
+        for regression in found_regressions:
+            print(f"  {regression}")
+    sys.exit(1 if found_regressions else 0)
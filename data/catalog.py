@@ -0,0 +1,298 @@
+"""
+Katalog produktów (modele, piece, dodatki) z pliku JSON - data/catalog.json
+dla saun, data/domki_catalog.json dla domków.
+
+Plik jest kompilowany raz do niezmiennej struktury: produkty z SKU, indeksy
+po nazwie, SKU i znormalizowanej nazwie/aliasie (bez polskich znaków,
+kolejności słów i jednostek - "Ankel 1.8 m mini" trafia w "Ankel Mini 1,8m")
+oraz gotowe listy zdjęć galerii i pieców. Z katalogu czytają ceny, szablon
+PDF, formularz w sauny.py i prompt LLM. Zmiana pliku jest wykrywana po mtime
+(sprawdzanym co CATALOG_RELOAD_INTERVAL s) i katalog kompiluje się ponownie.
+
+Podgląd: python -m data.catalog "ankel medium open" [--path data/domki_catalog.json]
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+from data.normalize import fold_text
+from metrics import inc, register_collector
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", "data/catalog.json")
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "2"))
+# Minimalne podobieństwo (difflib) dla nazw spoza katalogu i aliasów
+CATALOG_FUZZY_CUTOFF = 0.85
+CATALOG_FUZZY_MEMO_SIZE = 1024
+
+IMAGES_PATH = "images/"
+FURNACE_IMAGES_PATH = "images/Piece/"
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg")
+
+MODEL = "model"
+FURNACE = "furnace"
+ADDON = "addon"
+KINDS = (MODEL, FURNACE, ADDON)
+KIND_LABELS = {MODEL: "model", FURNACE: "piec", ADDON: "dodatek"}
+
+_KEY_TOKEN_RE = re.compile(r"\d+[.,]\d+|[a-z0-9]+")
+# Jednostki i słowa, które nie odróżniają produktów
+_KEY_NOISE = {"m", "metr", "metry", "sauna", "piec", "kw"}
+_KEY_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+@dataclass(frozen=True)
+class Product:
+    sku: str
+    kind: str
+    name: str
+    price: float
+    type: str = ""
+    paint_price: float = 0.0
+    aliases: Tuple[str, ...] = ()
+    # Zdjęcia galerii modelu (posortowane) albo jedno zdjęcie pieca/dodatku
+    images: Tuple[str, ...] = ()
+
+
+class UnknownProductError(ValueError):
+    """Nazwa produktu spoza katalogu - konfiguracji nie da się wycenić."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        super().__init__(f"Nieznany {KIND_LABELS.get(kind, kind)} w katalogu: {name}")
+
+    def __reduce__(self):
+        # Błąd wraca z procesów roboczych (batch_offers) - odtwarzany z rodzaju i nazwy
+        return type(self), (self.kind, self.name)
+
+
+def catalog_key(text: str) -> str:
+    """Klucz porównania nazw: bez wielkości liter, polskich znaków, jednostek i kolejności słów."""
+    tokens = {token.replace(",", ".") for token in _KEY_TOKEN_RE.findall(fold_text(text))}
+    return " ".join(sorted(tokens - _KEY_NOISE))
+
+
+def _key_numbers(key: str) -> FrozenSet[float]:
+    """Liczby w kluczu porównania (długość sauny, numer pieca) - "3,0" to to samo co "3"."""
+    return frozenset(float(token) for token in key.split() if _KEY_NUMBER_RE.fullmatch(token))
+
+
+def list_model_images(folder_path: str) -> Tuple[str, ...]:
+    """Posortowane zdjęcia w folderze modelu (pusta krotka, gdy folderu nie ma)."""
+    if not os.path.isdir(folder_path):
+        return ()
+    files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return tuple(os.path.join(folder_path, f) for f in files)
+
+
+class Catalog:
+    """Skompilowany, niezmienny katalog; wszystkie wyszukiwania poza rozmytym to odczyt ze słownika."""
+
+    def __init__(self, data: dict, version: str = ""):
+        self.version = version
+        images_path = data.get("images_path", IMAGES_PATH)
+        option_images_path = data.get("option_images_path", FURNACE_IMAGES_PATH)
+        self.types: Tuple[str, ...] = tuple(data.get("types", ()))
+        self.models: Tuple[Product, ...] = tuple(
+            Product(
+                sku=item["sku"], kind=MODEL, name=item["name"], price=float(item["price"]),
+                type=item.get("type", item["name"].split()[0]),
+                paint_price=float(item.get("paint_price", 0)),
+                aliases=tuple(item.get("aliases", ())),
+                images=list_model_images(os.path.join(images_path, item["images"])) if item.get("images") else (),
+            )
+            for item in data.get("models", ())
+        )
+        self.furnaces: Tuple[Product, ...] = self._options(data.get("furnaces", ()), FURNACE, option_images_path)
+        self.addons: Tuple[Product, ...] = self._options(data.get("addons", ()), ADDON, option_images_path)
+
+        by_sku: Dict[str, Product] = {}
+        by_name: Dict[Tuple[str, str], Product] = {}
+        by_key: Dict[Tuple[str, str], Product] = {}
+        for product in self.models + self.furnaces + self.addons:
+            if product.sku in by_sku:
+                raise ValueError(f"Powtórzony SKU w katalogu: {product.sku}")
+            by_sku[product.sku] = product
+            by_name[(product.kind, product.name)] = product
+            for text in (product.name,) + product.aliases:
+                key = catalog_key(text)
+                other = by_key.setdefault((product.kind, key), product)
+                if other is not product:
+                    raise ValueError(f"Nazwa \"{text}\" pasuje do {other.sku} i {product.sku}")
+
+        self._by_sku: Mapping[str, Product] = MappingProxyType(by_sku)
+        self._by_name: Mapping[Tuple[str, str], Product] = MappingProxyType(by_name)
+        self._by_key: Mapping[Tuple[str, str], Product] = MappingProxyType(by_key)
+        self._keys = {kind: tuple(key for key_kind, key in by_key if key_kind == kind) for kind in KINDS}
+        self.models_by_type: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+            sauna_type: tuple(product.name for product in self.models if product.type == sauna_type)
+            for sauna_type in self.types
+        })
+        self.model_names: Tuple[str, ...] = tuple(product.name for product in self.models)
+        self.furnace_names: Tuple[str, ...] = tuple(product.name for product in self.furnaces)
+        self.addon_names: Tuple[str, ...] = tuple(product.name for product in self.addons)
+        # Wyniki dopasowań rozmytych - ta sama literówka z LLM nie jest liczona drugi raz
+        self._fuzzy_memo: Dict[Tuple[str, str], Optional[Product]] = {}
+        self._fuzzy_lock = threading.Lock()
+
+    @staticmethod
+    def _options(items, kind: str, images_path: str) -> Tuple[Product, ...]:
+        return tuple(
+            Product(
+                sku=item["sku"], kind=kind, name=item["name"], price=float(item["price"]),
+                aliases=tuple(item.get("aliases", ())),
+                images=(os.path.join(images_path, item["image"]),) if item.get("image") else (),
+            )
+            for item in items
+        )
+
+    def by_sku(self, sku: str) -> Optional[Product]:
+        return self._by_sku.get(sku)
+
+    def _fuzzy(self, kind: str, key: str) -> Optional[Product]:
+        memo_key = (kind, key)
+        with self._fuzzy_lock:
+            if memo_key in self._fuzzy_memo:
+                return self._fuzzy_memo[memo_key]
+        # Literówka nie zmienia rozmiaru - "Ankel Large 3,6m" to nie "Ankel Large 3,0m"
+        numbers = _key_numbers(key)
+        ranked = sorted(
+            (
+                (difflib.SequenceMatcher(None, key, candidate).ratio(), candidate) for candidate in self._keys[kind]
+                if not numbers or _key_numbers(candidate) == numbers
+            ),
+            reverse=True,
+        )
+        product = None
+        if ranked and ranked[0][0] >= CATALOG_FUZZY_CUTOFF:
+            best = self._by_key[(kind, ranked[0][1])]
+            # Dwa różne produkty równie podobne (np. "Toone 2,4" - Open czy Close?) - nie zgadujemy
+            tied = [candidate for score, candidate in ranked[1:] if score == ranked[0][0]]
+            if all(self._by_key[(kind, candidate)] is best for candidate in tied):
+                product = best
+        with self._fuzzy_lock:
+            if len(self._fuzzy_memo) >= CATALOG_FUZZY_MEMO_SIZE:
+                self._fuzzy_memo.clear()
+            self._fuzzy_memo[memo_key] = product
+        return product
+
+    def resolve(self, kind: str, text: str) -> Optional[Product]:
+        """
+        Produkt z nazwy: dokładnej, znormalizowanej/aliasu, a na końcu z literówką.
+
+        Args:
+            kind (str): MODEL, FURNACE albo ADDON
+            text (str): Nazwa, np. z formularza albo odpowiedzi LLM
+
+        Returns:
+            Optional[Product]: Produkt lub None, gdy nazwa jest nieznana lub niejednoznaczna
+        """
+        if not text:
+            return None
+        product = self._by_name.get((kind, text))
+        if product is not None:
+            return product
+        key = catalog_key(text)
+        product = self._by_key.get((kind, key))
+        if product is None and key:
+            product = self._fuzzy(kind, key)
+        if product is None:
+            inc("catalog_unresolved_total", kind=kind)
+        return product
+
+    def require(self, kind: str, text: str) -> Optional[Product]:
+        """Jak resolve, ale niepusta nazwa spoza katalogu zgłasza UnknownProductError."""
+        product = self.resolve(kind, text)
+        if product is None and text:
+            raise UnknownProductError(kind, text)
+        return product
+
+    def model(self, name: str) -> Optional[Product]:
+        return self.resolve(MODEL, name)
+
+    def furnace(self, name: str) -> Optional[Product]:
+        return self.resolve(FURNACE, name)
+
+    def addon(self, name: str) -> Optional[Product]:
+        return self.resolve(ADDON, name)
+
+
+def _read_catalog(path: str) -> Catalog:
+    with open(path, "rb") as source:
+        raw = source.read()
+    return Catalog(json.loads(raw.decode("utf-8")), version=hashlib.sha256(raw).hexdigest()[:16])
+
+
+# Ścieżka pliku -> (katalog, mtime pliku, czas ostatniego sprawdzenia)
+_catalogs: Dict[str, Tuple[Catalog, Optional[int], float]] = {}
+_reloads = 0
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(path: str = CATALOG_PATH) -> Catalog:
+    """
+    Zwraca skompilowany katalog; po zmianie pliku (mtime) kompiluje go ponownie.
+    Błędny plik nie zastępuje działającego katalogu - błąd jest tylko wypisywany.
+    """
+    global _reloads
+    now = time.monotonic()
+    entry = _catalogs.get(path)
+    if entry is not None and now - entry[2] < CATALOG_RELOAD_INTERVAL:
+        return entry[0]
+    with _catalog_lock:
+        entry = _catalogs.get(path)
+        if entry is not None and now - entry[2] < CATALOG_RELOAD_INTERVAL:
+            return entry[0]
+        catalog, catalog_mtime = entry[:2] if entry is not None else (None, None)
+        mtime = None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if catalog is None or mtime != catalog_mtime:
+                reloaded = _read_catalog(path)
+                if catalog is not None:
+                    _reloads += 1
+                catalog = reloaded
+        except (OSError, ValueError, KeyError) as e:
+            if catalog is None:
+                raise
+            # Ten sam błędny plik nie jest wczytywany ponownie - dopiero jego kolejna zmiana
+            print(f"Nie można przeładować katalogu {path}: {e}")
+        _catalogs[path] = (catalog, mtime, now)
+    return catalog
+
+
+def _catalog_stats() -> dict:
+    entries = list(_catalogs.values())
+    return {
+        "files": len(entries),
+        "products": sum(len(c.models) + len(c.furnaces) + len(c.addons) for c, _, _ in entries),
+        "reloads": _reloads,
+    }
+
+
+register_collector("catalog", _catalog_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Katalog produktów")
+    parser.add_argument("name", nargs="*", help="nazwa do rozpoznania (model, piec albo dodatek)")
+    parser.add_argument("--path", default=CATALOG_PATH, help="plik katalogu")
+    args = parser.parse_args()
+
+    catalog = get_catalog(args.path)
+    if args.name:
+        text = " ".join(args.name)
+        for kind in KINDS:
+            product = catalog.resolve(kind, text)
+            print(f"{kind}: {product.sku + ' - ' + product.name if product else 'brak'}")
+    else:
+        for product in catalog.models + catalog.furnaces + catalog.addons:
+            print(f"{product.sku:<20} {product.price:>9.2f} zł  {product.name} ({len(product.images)} zdjęć)")
@@ -0,0 +1,296 @@
+"""
+Offline geokoder: spis miejscowości i kodów pocztowych skompilowany do tablic
+NumPy (GAZETTEER_INDEX_DIR), mapowanych do pamięci przy starcie procesu.
+
+Przebudowa indeksu: python -m data.gazetteer --build
+"""
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.normalize import normalize_address
+
+GAZETTEER_LOCALITIES_PATH = os.getenv("GAZETTEER_LOCALITIES_PATH", "data/gazetteer_localities.csv")
+GAZETTEER_POSTCODES_PATH = os.getenv("GAZETTEER_POSTCODES_PATH", "data/gazetteer_postcodes.csv")
+GAZETTEER_INDEX_DIR = os.getenv("GAZETTEER_INDEX_DIR", "cache/gazetteer")
+
+_ARRAYS = (
+    "names_blob", "names_offsets", "labels_blob", "labels_offsets",
+    "lat", "lng", "postcode_from", "postcode_to", "postcode_lat", "postcode_lng",
+)
+_MAX_NGRAM = 4
+_POSTCODE_RE = re.compile(r"\b(\d{2})-?(\d{3})\b")
+# Część adresu z ulicą/placem/osiedlem, np. "ul. Gdańska 5" - nie jest miejscowością
+_STREET_RE = re.compile(r"^\s*(ul|ulica|al|aleja|aleje|os|osiedle|pl|plac)\b\.?", re.IGNORECASE)
+# Numer domu/lokalu, np. "5", "12a", "7/3" - za nim może stać miejscowość ("ul. Długa 5 Poznań")
+_HOUSE_NUMBER_RE = re.compile(r"\b\d+[a-z]?(?:/\d+[a-z]?)?\b", re.IGNORECASE)
+
+
+def _postcode_to_int(postcode: str) -> int:
+    return int(postcode.replace("-", ""))
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(item) for item in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def _source_fingerprint(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def build_index(
+    localities_path: str = GAZETTEER_LOCALITIES_PATH,
+    postcodes_path: str = GAZETTEER_POSTCODES_PATH,
+    index_dir: str = GAZETTEER_INDEX_DIR,
+) -> None:
+    """Kompiluje pliki CSV do tablic .npy w katalogu indeksu."""
+    entries = {}
+    with open(localities_path, encoding="utf-8") as source:
+        for row in csv.DictReader(source):
+            key = normalize_address(row["name"])
+            # Przy powtarzających się nazwach wygrywa pierwsza (większa) miejscowość
+            if key and key not in entries:
+                entries[key] = (row["name"], float(row["lat"]), float(row["lng"]))
+
+    names = sorted(entries)
+    names_blob, names_offsets = _pack_strings(names)
+    labels_blob, labels_offsets = _pack_strings([entries[name][0] for name in names])
+
+    with open(postcodes_path, encoding="utf-8") as source:
+        ranges = sorted(
+            (_postcode_to_int(row["from"]), _postcode_to_int(row["to"]), float(row["lat"]), float(row["lng"]))
+            for row in csv.DictReader(source)
+        )
+
+    arrays = {
+        "names_blob": names_blob,
+        "names_offsets": names_offsets,
+        "labels_blob": labels_blob,
+        "labels_offsets": labels_offsets,
+        "lat": np.array([entries[name][1] for name in names], dtype=np.float32),
+        "lng": np.array([entries[name][2] for name in names], dtype=np.float32),
+        "postcode_from": np.array([r[0] for r in ranges], dtype=np.int32),
+        "postcode_to": np.array([r[1] for r in ranges], dtype=np.int32),
+        "postcode_lat": np.array([r[2] for r in ranges], dtype=np.float32),
+        "postcode_lng": np.array([r[3] for r in ranges], dtype=np.float32),
+    }
+
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+    with open(os.path.join(index_dir, "source.json"), "w", encoding="utf-8") as stamp:
+        json.dump({"fingerprint": _source_fingerprint(localities_path, postcodes_path)}, stamp)
+
+
+def _index_is_current(index_dir: str, localities_path: str, postcodes_path: str) -> bool:
+    try:
+        with open(os.path.join(index_dir, "source.json"), encoding="utf-8") as stamp:
+            fingerprint = json.load(stamp)["fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return False
+    if any(not os.path.exists(os.path.join(index_dir, f"{name}.npy")) for name in _ARRAYS):
+        return False
+    return fingerprint == _source_fingerprint(localities_path, postcodes_path)
+
+
+def _levenshtein_within(a: str, b: str, limit: int) -> int:
+    """Odległość edycyjna a-b lub limit + 1, gdy przekracza limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class GazetteerIndex:
+    """Indeks miejscowości i kodów pocztowych oparty o (mapowane) tablice NumPy."""
+
+    def __init__(self, arrays: dict):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self._size = len(self.names_offsets) - 1
+        self._positions = range(self._size)
+
+    @classmethod
+    def load(cls, index_dir: str = GAZETTEER_INDEX_DIR) -> "GazetteerIndex":
+        return cls({name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS})
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _name(self, position: int) -> str:
+        start, end = self.names_offsets[position], self.names_offsets[position + 1]
+        return bytes(self.names_blob[start:end]).decode("utf-8")
+
+    def _label(self, position: int) -> str:
+        start, end = self.labels_offsets[position], self.labels_offsets[position + 1]
+        return bytes(self.labels_blob[start:end]).decode("utf-8")
+
+    def _coords(self, position: int) -> Tuple[float, float]:
+        return round(float(self.lat[position]), 5), round(float(self.lng[position]), 5)
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self._positions, prefix, key=self._name)
+        end = bisect.bisect_left(self._positions, prefix + "\uffff", lo=start, key=self._name)
+        return start, end
+
+    def find_exact(self, name: str) -> Optional[int]:
+        position = bisect.bisect_left(self._positions, name, key=self._name)
+        if position < self._size and self._name(position) == name:
+            return position
+        return None
+
+    def find_fuzzy(self, name: str) -> Optional[int]:
+        """Najbliższa nazwa o tym samym pierwszym znaku w granicy 1-2 literówek."""
+        if len(name) < 4:
+            return None
+        limit = 1 if len(name) <= 6 else 2
+        best, best_distance = None, limit + 1
+        start, end = self._prefix_range(name[0])
+        for position in range(start, end):
+            distance = _levenshtein_within(name, self._name(position), limit)
+            if distance < best_distance:
+                best, best_distance = position, distance
+        return best
+
+    def find_postcode(self, postcode: int) -> Optional[Tuple[float, float]]:
+        position = bisect.bisect_right(self.postcode_from, postcode) - 1
+        if position >= 0 and postcode <= self.postcode_to[position]:
+            return round(float(self.postcode_lat[position]), 5), round(float(self.postcode_lng[position]), 5)
+        return None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Podpowiedzi nazw miejscowości zaczynających się od prefiksu."""
+        start, end = self._prefix_range(normalize_address(prefix))
+        return [self._label(position) for position in range(start, min(end, start + limit))]
+
+    def canonical_name(self, phrase: str) -> Optional[str]:
+        """Nazwa miejscowości z odmiany/literówki, np. "do Warszawy" -> "Warszawa"."""
+        normalized = normalize_address(phrase)
+        if not normalized:
+            return None
+        position = self.find_exact(normalized)
+        if position is None:
+            position = self.find_fuzzy(normalized)
+        return self._label(position) if position is not None else None
+
+    @staticmethod
+    def _locality(address: str) -> str:
+        """
+        Część adresu z miejscowością: ostatni segment po przecinku, który nie
+        jest ulicą ("ul. Gdańska 5, Wąchock" -> "Wąchock"). W segmencie z ulicą
+        bez przecinka miejscowością jest tekst za numerem domu.
+        """
+        for segment in reversed((address or "").split(",")):
+            if not normalize_address(segment):
+                continue
+            if _STREET_RE.match(segment):
+                numbers = list(_HOUSE_NUMBER_RE.finditer(segment))
+                if numbers and normalize_address(segment[numbers[-1].end():]):
+                    return segment[numbers[-1].end():]
+                continue
+            return segment
+        return ""
+
+    def _candidates(self, address: str) -> List[str]:
+        # Tylko słowa segmentu z miejscowością - nazwa ulicy ("Gdańska") nie może
+        # trafić w inną miejscowość. Od najdłuższych fraz ("zielona gora" przed "gora")
+        words = [word for word in normalize_address(self._locality(address)).split() if not word[0].isdigit()]
+        candidates = []
+        for end in range(len(words), 0, -1):
+            for length in range(min(_MAX_NGRAM, end), 0, -1):
+                candidates.append(" ".join(words[end - length:end]))
+        return candidates
+
+    def lookup(self, address: str) -> Optional[Tuple[float, float]]:
+        """
+        Geokoduje adres offline.
+
+        Kolejność: kod pocztowy, dokładna nazwa miejscowości, nazwa z literówką.
+        Dopasowywany jest tylko segment z miejscowością (patrz _locality), więc
+        miejscowość spoza spisu daje None (np. dla geokodowania online), a nie
+        miejscowość z nazwy ulicy.
+
+        Returns:
+            Optional[Tuple[float, float]]: Krotka (lat, lng) lub None
+        """
+        match = _POSTCODE_RE.search(address or "")
+        if match:
+            coords = self.find_postcode(int(match.group(1) + match.group(2)))
+            if coords is not None:
+                return coords
+
+        candidates = self._candidates(address)
+        for candidate in candidates:
+            position = self.find_exact(candidate)
+            if position is not None:
+                return self._coords(position)
+
+        for candidate in candidates:
+            position = self.find_fuzzy(candidate)
+            if position is not None:
+                return self._coords(position)
+        return None
+
+
+_index: Optional[GazetteerIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_gazetteer() -> Optional[GazetteerIndex]:
+    """Zwraca indeks (budując go przy pierwszym użyciu, jeśli dane się zmieniły)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    if not _index_is_current(GAZETTEER_INDEX_DIR, GAZETTEER_LOCALITIES_PATH, GAZETTEER_POSTCODES_PATH):
+                        build_index()
+                    _index = GazetteerIndex.load()
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Nie można załadować offline geokodera: {e}")
+                    return None
+    return _index
+
+
+def offline_geocode(address: str) -> Optional[Tuple[float, float]]:
+    """Geokodowanie bez sieci; None gdy adresu nie ma w spisie."""
+    index = get_gazetteer()
+    if index is None or not address:
+        return None
+    return index.lookup(address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline geokoder miejscowości w Polsce")
+    parser.add_argument("--build", action="store_true", help="przebuduj indeks z plików CSV")
+    parser.add_argument("address", nargs="*", help="adres do sprawdzenia")
+    args = parser.parse_args()
+
+    if args.build:
+        build_index()
+        print(f"Zbudowano indeks w {GAZETTEER_INDEX_DIR}")
+    if args.address:
+        print(offline_geocode(" ".join(args.address)))
@@ -0,0 +1,38 @@
+import os
+import threading
+from typing import Optional
+
+from data.sqlite_cache import SqliteTTLCache
+from metrics import register_collector
+
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "cache/geocode.sqlite3")
+GEOCODE_CACHE_TTL_DAYS = float(os.getenv("GEOCODE_CACHE_TTL_DAYS", "90"))
+GEOCODE_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL_HOURS", "24"))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "20000"))
+
+_cache: Optional[SqliteTTLCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> SqliteTTLCache:
+    """Zwraca współdzielony w procesie cache geokodowania (tworzony leniwie)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SqliteTTLCache(
+                    GEOCODE_CACHE_PATH,
+                    table="geocode",
+                    ttl_seconds=GEOCODE_CACHE_TTL_DAYS * 86400,
+                    negative_ttl_seconds=GEOCODE_CACHE_NEGATIVE_TTL_HOURS * 3600,
+                    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+                )
+    return _cache
+
+
+def geocode_cache_stats() -> dict:
+    """Liczniki trafień/chybień cache geokodowania w bieżącym procesie."""
+    return get_geocode_cache().stats()
+
+
+register_collector("geocode_cache", lambda: _cache.stats() if _cache is not None else {})
@@ -0,0 +1,295 @@
+"""
+Klient Nominatim (OpenStreetMap) współdzielony przez cały proces.
+
+- jedna requests.Session z pulą połączeń keep-alive (NOMINATIM_POOL_SIZE),
+- kubełek tokenów pilnujący zasady 1 zapytanie/s (NOMINATIM_RATE) dla
+  wszystkich sesji i wątków procesu; kolejność oczekujących jest zachowana
+  (każdy rezerwuje kolejny wolny termin),
+- single-flight: równoczesne zapytania o ten sam (znormalizowany) adres
+  czekają na jedno zapytanie w locie zamiast wysyłać własne,
+- ponowienia (NOMINATIM_RETRIES) po błędach sieci, 429 i 5xx z wykładniczym
+  opóźnieniem z losowym rozrzutem; Retry-After z odpowiedzi ma pierwszeństwo,
+  a dłuższy niż NOMINATIM_MAX_WAIT kończy zapytanie jako nierozstrzygnięte.
+
+Adres serwera (NOMINATIM_URL) można podmienić na lokalną atrapę - patrz
+benchmarks/bench_nominatim.py. Limit dotyczy jednego procesu: pule procesów
+(batch_offers) geokodują w procesie głównym.
+"""
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from data.normalize import normalize_address
+from metrics import inc, observe, register_collector
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "SaunaOffersApp/1.0")
+NOMINATIM_RATE = float(os.getenv("NOMINATIM_RATE", "1"))
+NOMINATIM_BURST = int(os.getenv("NOMINATIM_BURST", "1"))
+NOMINATIM_TIMEOUT = float(os.getenv("NOMINATIM_TIMEOUT", "10"))
+NOMINATIM_RETRIES = int(os.getenv("NOMINATIM_RETRIES", "2"))
+NOMINATIM_BACKOFF = float(os.getenv("NOMINATIM_BACKOFF", "0.5"))
+NOMINATIM_POOL_SIZE = int(os.getenv("NOMINATIM_POOL_SIZE", "4"))
+# Dłuższe oczekiwanie w kolejce do limitu niż to = zapytanie nierozstrzygnięte (jak błąd sieci)
+NOMINATIM_MAX_WAIT = float(os.getenv("NOMINATIM_MAX_WAIT", "30"))
+
+Coordinates = Optional[Tuple[float, float]]
+
+
+class TokenBucket:
+    """
+    Kubełek tokenów z rezerwacją: token może być "pożyczony" z przyszłości,
+    a wywołujący śpi do swojego terminu. Kolejni wywołujący dostają kolejne
+    terminy, więc nikt nie jest wyprzedzany przez późniejsze zapytania.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Pobiera token, czekając na swój termin.
+
+        Args:
+            max_wait (float, optional): Najdłuższe dopuszczalne oczekiwanie w s
+
+        Returns:
+            Optional[float]: Czas oczekiwania w s albo None, gdy przekroczyłby max_wait
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.capacity), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Równoczesne wywołania z tym samym kluczem dzielą jeden wynik."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        Returns:
+            Tuple[object, bool]: Wynik fn oraz True, gdy wynik pochodzi z cudzego wywołania
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class _RetryableResponse(Exception):
+    def __init__(self, status_code: int, retry_after: Optional[float]):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        # Retry-After w formie daty HTTP - wtedy zwykłe opóźnienie
+        return None
+
+
+class NominatimClient:
+    """Klient /search Nominatim z pulą połączeń, limitem zapytań, single-flight i ponowieniami."""
+
+    def __init__(
+        self,
+        base_url: str = NOMINATIM_URL,
+        rate: float = NOMINATIM_RATE,
+        burst: int = NOMINATIM_BURST,
+        timeout: float = NOMINATIM_TIMEOUT,
+        retries: int = NOMINATIM_RETRIES,
+        backoff: float = NOMINATIM_BACKOFF,
+        pool_size: int = NOMINATIM_POOL_SIZE,
+        max_wait: float = NOMINATIM_MAX_WAIT,
+        user_agent: str = NOMINATIM_USER_AGENT,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_wait = max_wait
+        self.user_agent = user_agent
+        self.bucket = TokenBucket(rate, burst)
+        self._flights = SingleFlight()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats = {"lookups": 0, "requests": 0, "retries": 0, "coalesced": 0, "failures": 0, "rate_wait_s": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def session(self):
+        if self._session is None:
+            # requests ładujemy dopiero przy pierwszym zapytaniu - nie spowalnia startu aplikacji
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # pool_block - ponad pool_size wątek czeka na wolne połączenie zamiast otwierać nowe
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers["User-Agent"] = self.user_agent
+                    self._session = session
+        return self._session
+
+    def search(self, address: str) -> Tuple[Coordinates, bool]:
+        """
+        Geokoduje adres (limit do jednego wyniku w Polsce).
+
+        Args:
+            address (str): Adres do geokodowania
+
+        Returns:
+            Tuple[Optional[Tuple[float, float]], bool]: Współrzędne (lub None) oraz
+            informacja, czy wynik jest rozstrzygający (False przy błędach sieci).
+        """
+        self._count("lookups")
+        result, shared = self._flights.do(normalize_address(address) or address, lambda: self._search(address))
+        if shared:
+            self._count("coalesced")
+            inc("nominatim_coalesced_total")
+        return result
+
+    def _search(self, address: str) -> Tuple[Coordinates, bool]:
+        import requests
+
+        params = {"q": address, "format": "json", "limit": 1, "countrycodes": "pl"}
+        for attempt in range(self.retries + 1):
+            waited = self.bucket.acquire(self.max_wait)
+            if waited is None:
+                print(f"Geokodowanie adresu {address} pominięte - kolejka do Nominatim dłuższa niż {self.max_wait} s")
+                inc("nominatim_requests_total", status="queue_timeout")
+                self._count("failures")
+                return None, False
+            self._count("rate_wait_s", waited)
+            observe("nominatim_rate_wait_seconds", waited)
+
+            delay = None
+            try:
+                self._count("requests")
+                response = self.session().get(f"{self.base_url}/search", params=params, timeout=self.timeout)
+                inc("nominatim_requests_total", status=response.status_code)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _RetryableResponse(response.status_code, _retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                data = response.json()
+                if data:
+                    return (float(data[0]["lat"]), float(data[0]["lon"])), True
+                print(f"Nie znaleziono współrzędnych dla adresu: {address}")
+                return None, True
+            except _RetryableResponse as e:
+                error, delay = e, e.retry_after
+            except (requests.ConnectionError, requests.Timeout) as e:
+                inc("nominatim_requests_total", status=type(e).__name__)
+                error = e
+            except requests.RequestException as e:
+                # 4xx inne niż 429 - ponowienie nic nie zmieni
+                print(f"Błąd podczas geokodowania adresu {address}: {e}")
+                self._count("failures")
+                return None, False
+            except (KeyError, ValueError, IndexError) as e:
+                print(f"Błąd parsowania odpowiedzi dla adresu {address}: {e}")
+                self._count("failures")
+                return None, False
+
+            if attempt == self.retries:
+                break
+            if delay is not None and delay > self.max_wait:
+                # Nie blokujemy wątku (i oferty) na czas wskazany przez serwer - wynik nierozstrzygnięty
+                print(f"Geokodowanie adresu {address} pominięte - Retry-After {delay:.0f} s dłuższe niż {self.max_wait} s")
+                inc("nominatim_requests_total", status="retry_after_too_long")
+                self._count("failures")
+                return None, False
+            self._count("retries")
+            # Wykładniczo rosnące opóźnienie z rozrzutem - ponowienia wielu wątków się nie zbiegają
+            time.sleep(delay if delay is not None else self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+        print(f"Błąd podczas geokodowania adresu {address}: {error}")
+        self._count("failures")
+        return None, False
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+_client: Optional[NominatimClient] = None
+_client_lock = threading.Lock()
+
+
+def get_nominatim_client() -> NominatimClient:
+    """Zwraca współdzielonego w procesie klienta Nominatim (tworzony leniwie)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NominatimClient()
+    return _client
+
+
+def _reset_client():
+    # Połączenia puli nie mogą być współdzielone z procesem potomnym (fork)
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client)
+
+register_collector("nominatim", lambda: _client.stats() if _client is not None else {})
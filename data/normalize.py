@@ -0,0 +1,49 @@
+import re
+import unicodedata
+
+# Znaki, które nie rozkładają się w NFKD na literę bazową + znak diakrytyczny
+_SPECIAL_FOLDS = str.maketrans({"ł": "l", "Ł": "l", "ø": "o", "Ø": "o", "æ": "ae", "ß": "ss"})
+
+# Skróty i słowa, które nie zmieniają wyniku geokodowania
+_ADDRESS_NOISE = {
+    "ul", "ulica", "al", "aleja", "aleje", "pl", "plac", "os", "osiedle",
+    "woj", "wojewodztwo", "gm", "gmina", "pow", "powiat", "m", "miasto",
+    "polska", "poland",
+}
+
+
+def fold_text(text: str) -> str:
+    """
+    Sprowadza tekst do postaci porównywalnej: małe litery, bez polskich znaków
+    i z pojedynczymi spacjami.
+
+    Args:
+        text (str): Dowolny tekst
+
+    Returns:
+        str: Tekst po normalizacji, np. "Poznań " -> "poznan"
+    """
+    text = (text or "").translate(_SPECIAL_FOLDS)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalizuje adres na potrzeby klucza cache geokodowania.
+
+    Usuwa wielkość liter, polskie znaki, interpunkcję oraz "szum" typu
+    "ul.", "woj.", "gm.", dzięki czemu "ul. Długa 5, Poznań" i
+    "dluga 5 poznan" trafiają w ten sam wpis.
+
+    Args:
+        address (str): Adres wpisany przez użytkownika
+
+    Returns:
+        str: Znormalizowany adres
+    """
+    folded = fold_text(address)
+    # Kody pocztowe zostają w całości ("60-101"), reszta interpunkcji to separator
+    tokens = re.findall(r"\d{2}-\d{3}|[a-z0-9]+", folded)
+    return " ".join(token for token in tokens if token not in _ADDRESS_NOISE)
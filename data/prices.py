@@ -1,40 +1,13 @@
-import requests
 import math
+import os
 from typing import Optional, Tuple
 
-base_prices = {
-    "Ankel Mini 1,8m": 10800,
-    "Ankel Medium Open 2,4m": 11580,
-    "Ankel Medium Close 2,4m": 13160,
-    "Ankel Large 3,0m": 13800,
-    "Ankel XL 3,6m": 14480,
-    "Toone Mini 1,8m":  9180,
-    "Toone 2,4 Open": 9900,
-    "Toone 2,4 Close": 11500,
-    "Toone 3,0 Close": 12200,
-    "Toone 3,6 Close": 12900,
-    "Toone 3,6 Open": 12900,
-}
-
-base_paint_prices = {
-    "Ankel Mini 1,8m": 750,
-    "Ankel Medium Open 2,4m": 800,
-    "Ankel Medium Close 2,4m": 800,
-    "Ankel Large 3,0m": 850,
-    "Ankel XL 3,6m": 900,
-    "Toone Mini 1,8m":  750,
-    "Toone 2,4 Open": 800,
-    "Toone 2,4 Close": 800,
-    "Toone 3,0 Close": 850,
-    "Toone 3,6 Close": 900,
-    "Toone 3,6 Open": 900,
-}
-
-furnace_prices = {
-    "Piec Harvia z kominem i kamieniami. Spalinowy, ładowany od wewnątrz": 3850,
-    "Piec do sauny opalany drewnem - STOVEMAN 13-LS z kominem i kamieniami – ładowany od zewnątrz": 4500,
-    "Piec elektryczny NARVI 9 kW": 1800,
-}
+from data.gazetteer import offline_geocode
+from data.geocache import get_geocode_cache
+from data.nominatim import get_nominatim_client
+from data.normalize import normalize_address
+from data.routing import road_distance_from_depot
+from metrics import inc, span
 
 START_POINT = {
     "lat": 52.34916,  
@@ -42,10 +15,25 @@ START_POINT = {
     "address": "Zasutowo"  
 }
 
+# "online" - Nominatim (z cache), "offline" - tylko lokalny spis miejscowości,
+# "hybrid" - najpierw spis miejscowości, Nominatim tylko gdy adresu w nim nie ma
+GEOCODER_MODE = os.getenv("GEOCODER_MODE", "online")
+# "haversine" - odległość w linii prostej, "road" - drogą wg offline grafu dróg (data/routing.py);
+# bez zbudowanego grafu tryb "road" wraca do linii prostej
+DELIVERY_DISTANCE_MODE = os.getenv("DELIVERY_DISTANCE_MODE", "haversine")
+# Cena za przejechany km (dostawa liczona w obie strony)
+DELIVERY_PRICE_PER_KM = 2.5
+
 
 def get_coordinates_from_address(address: str) -> Optional[Tuple[float, float]]:
     """
     Pobiera współrzędne geograficzne dla podanego adresu używając Nominatim API (OpenStreetMap).
+
+    Wyniki (również negatywne) są zapamiętywane w trwałym cache SQLite
+    pod znormalizowanym adresem, więc kolejne zapytania o ten sam adres
+    nie wychodzą do sieci. W trybie "offline"/"hybrid" (GEOCODER_MODE) najpierw
+    pytany jest lokalny spis miejscowości; przy braku sieci jest on też
+    ostatnią deską ratunku w trybie "online".
     
     Args:
         address (str): Adres do geokodowania
@@ -53,38 +41,53 @@ def get_coordinates_from_address(address: str) -> Optional[Tuple[float, float]]:
     Returns:
         Optional[Tuple[float, float]]: Krotka (lat, lng) lub None jeśli nie znaleziono
     """
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            "q": address,
-            "format": "json",
-            "limit": 1,
-            "countrycodes": "pl"  
-        }
-        
-        headers = {
-            "User-Agent": "SaunaOffersApp/1.0"  
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if data and len(data) > 0:
-            lat = float(data[0]["lat"])
-            lng = float(data[0]["lon"])
-            return (lat, lng)
-        else:
-            print(f"Nie znaleziono współrzędnych dla adresu: {address}")
-            return None
-            
-    except requests.RequestException as e:
-        print(f"Błąd podczas geokodowania adresu {address}: {e}")
-        return None
-    except (KeyError, ValueError, IndexError) as e:
-        print(f"Błąd parsowania odpowiedzi dla adresu {address}: {e}")
-        return None
+    return geocode_address(address)[0]
+
+def geocode_address(address: str) -> Tuple[Optional[Tuple[float, float]], bool]:
+    """
+    Jak get_coordinates_from_address, ale z informacją, czy wynik jest rozstrzygający.
+
+    Returns:
+        Tuple[Optional[Tuple[float, float]], bool]: Współrzędne (lub None) oraz
+        False, gdy Nominatim nie odpowiedział i wynik pochodzi z zastępczego
+        spisu miejscowości (albo go brak) - taki wynik może się zmienić przy
+        następnym zapytaniu.
+    """
+    if GEOCODER_MODE in ("offline", "hybrid"):
+        coords = offline_geocode(address)
+        if coords is not None or GEOCODER_MODE == "offline":
+            inc("geocode_lookups_total", source="offline")
+            return coords, True
+
+    cache = get_geocode_cache()
+    cache_key = normalize_address(address)
+
+    found, cached_coords = cache.get(cache_key)
+    if found:
+        inc("geocode_lookups_total", source="cache")
+        return (tuple(cached_coords) if cached_coords is not None else None), True
+
+    with span("nominatim_request"):
+        coords, is_definitive = _query_nominatim(address)
+    # Błędów sieci nie zapamiętujemy - tylko odpowiedzi, które faktycznie przyszły z API
+    if is_definitive:
+        inc("geocode_lookups_total", source="nominatim")
+        cache.set(cache_key, list(coords) if coords is not None else None)
+    elif GEOCODER_MODE == "online":
+        inc("geocode_lookups_total", source="offline_fallback")
+        return offline_geocode(address), False
+    return coords, is_definitive
+
+def _query_nominatim(address: str) -> Tuple[Optional[Tuple[float, float]], bool]:
+    """
+    Wykonuje zapytanie do Nominatim przez współdzielonego klienta procesu
+    (pula połączeń, limit 1 zapytanie/s, single-flight, ponowienia - data/nominatim.py).
+
+    Returns:
+        Tuple[Optional[Tuple[float, float]], bool]: Współrzędne (lub None) oraz
+        informacja, czy wynik jest rozstrzygający (False przy błędach sieci).
+    """
+    return get_nominatim_client().search(address)
 
 def calculate_distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     ray_of_the_earth = 6371.0
@@ -105,34 +108,49 @@ def calculate_distance_km(lat1: float, lng1: float, lat2: float, lng2: float) ->
     return round(distance, 2)
 
 def get_distance_to_location(destination_address: str) -> Tuple[float, str]:
+    distance, message, _ = _distance_to_location(destination_address)
+    return distance, message
+
+def _distance_to_location(destination_address: str) -> Tuple[float, str, bool]:
     if not destination_address or destination_address.strip() == "":
-        return 0.0, "Brak adresu"
+        return 0.0, "Brak adresu", True
     
-    destination_coords = get_coordinates_from_address(destination_address)
+    destination_coords, is_definitive = geocode_address(destination_address)
     
     if destination_coords is None:
-        return 0.0, f"Nie można znaleźć lokalizacji: {destination_address}"
+        return 0.0, f"Nie można znaleźć lokalizacji: {destination_address}", is_definitive
     
     destination_lat, destination_lng = destination_coords
+
+    if DELIVERY_DISTANCE_MODE == "road":
+        road_distance = road_distance_from_depot(destination_lat, destination_lng, (START_POINT["lat"], START_POINT["lng"]))
+        if road_distance is not None:
+            inc("delivery_distance_total", mode="road")
+            return road_distance, f"Odległość drogowa od {START_POINT['address']} do {destination_address}: {road_distance} km", is_definitive
+        inc("delivery_distance_total", mode="haversine_fallback")
     
     distance = calculate_distance_km(
         START_POINT["lat"], START_POINT["lng"],
         destination_lat, destination_lng
     )
     
-    return distance, f"Odległość od {START_POINT['address']} do {destination_address}: {distance} km"
+    return distance, f"Odległość od {START_POINT['address']} do {destination_address}: {distance} km", is_definitive
 
 def calculate_delivery_cost(distance_km: float) -> float:
     transport_price = 0
-    transport_price += (distance_km * 2) * 2.5
+    transport_price += (distance_km * 2) * DELIVERY_PRICE_PER_KM
     return transport_price
 
 def get_delivery_info(location: str) -> dict:
-    distance, message = get_distance_to_location(location)
+    distance, message, is_definitive = _distance_to_location(location)
     delivery_cost = calculate_delivery_cost(distance)
     
-    return {
+    delivery_info = {
         "distance_km": distance,
         "delivery_cost": delivery_cost,
         "message": message,
-    }
\ No newline at end of file
+    }
+    if not is_definitive:
+        # Geokoder online nie odpowiedział - odległość może się jeszcze zmienić (nie trafia do cache ofert)
+        delivery_info["provisional"] = True
+    return delivery_info
@@ -0,0 +1,208 @@
+"""
+Wektorowy silnik cen: cały katalog (model x piec x malowanie x odległość)
+liczony jednym przebiegiem NumPy, eksport cennika do CSV/Parquet oraz
+wycena pojedynczej oferty na tych samych tablicach.
+
+Przykład: python -m data.pricing_engine --export cennik.csv
+"""
+import argparse
+import re
+import threading
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from data.catalog import FURNACE, MODEL, Catalog, get_catalog
+from data.prices import calculate_delivery_cost
+
+PAINT_MULTIPLIERS = (0, 1, 2, 3)
+# Progi odległości (km) używane w cennikach dla dealerów
+DISTANCE_BANDS_KM = (0, 50, 100, 150, 200, 250, 300, 400, 500, 600, 700)
+
+
+def parse_paint_multiplier(paint) -> int:
+    """Wyciąga krotność malowania z tekstu typu "2", "2x krotne" ("" -> 0)"""
+    match = re.search(r"\d+", str(paint or ""))
+    return int(match.group()) if match else 0
+
+
+def parse_custom_delivery_cost(custom_delivery) -> float:
+    """Kwota niestandardowego rozładunku z tekstu typu "1000zł", "1,000" ("" -> 0)"""
+    if not custom_delivery:
+        return 0.0
+    try:
+        return float(str(custom_delivery).replace("zł", "").replace(",", ""))
+    except ValueError:
+        return 0.0
+
+
+class PriceCatalog:
+    """Ceny z katalogu produktów jako tablice NumPy (z indeksem nazwa -> pozycja)."""
+
+    def __init__(self, model_prices: dict, paint_prices: dict, furnace_price_table: dict):
+        self.models = tuple(model_prices)
+        self.furnaces = tuple(furnace_price_table)
+        self.model_index = {name: i for i, name in enumerate(self.models)}
+        self.furnace_index = {name: i for i, name in enumerate(self.furnaces)}
+        self.model_price = np.array([model_prices[name] for name in self.models], dtype=np.float64)
+        self.paint_price = np.array([paint_prices.get(name, 0) for name in self.models], dtype=np.float64)
+        self.furnace_price = np.array([furnace_price_table[name] for name in self.furnaces], dtype=np.float64)
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> "PriceCatalog":
+        return cls(
+            {model.name: model.price for model in catalog.models},
+            {model.name: model.paint_price for model in catalog.models},
+            {furnace.name: furnace.price for furnace in catalog.furnaces},
+        )
+
+    def price_matrix(
+        self,
+        distances_km: Iterable[float] = DISTANCE_BANDS_KM,
+        paint_multipliers: Iterable[int] = PAINT_MULTIPLIERS,
+    ) -> np.ndarray:
+        """Cena końcowa o kształcie (modele, piece, krotności malowania, odległości)."""
+        distances = np.asarray(distances_km, dtype=np.float64)
+        multipliers = np.asarray(paint_multipliers, dtype=np.float64)
+        delivery = calculate_delivery_cost(distances)
+        return (
+            self.model_price[:, None, None, None]
+            + self.furnace_price[None, :, None, None]
+            + (self.paint_price[:, None] * multipliers[None, :])[:, None, :, None]
+            + delivery[None, None, None, :]
+        )
+
+    def price_list(
+        self,
+        distances_km: Iterable[float] = DISTANCE_BANDS_KM,
+        paint_multipliers: Iterable[int] = PAINT_MULTIPLIERS,
+    ) -> "pd.DataFrame":
+        """Pełny cennik w postaci tabeli (jeden wiersz na konfigurację i próg odległości)."""
+        # pandas jest potrzebny tylko do cenników - wycena pojedynczej oferty go nie ładuje
+        import pandas as pd
+
+        distances = np.asarray(distances_km, dtype=np.float64)
+        multipliers = np.asarray(paint_multipliers, dtype=np.int64)
+        totals = self.price_matrix(distances, multipliers)
+
+        m, f, p, d = np.meshgrid(
+            np.arange(len(self.models)), np.arange(len(self.furnaces)),
+            np.arange(len(multipliers)), np.arange(len(distances)),
+            indexing="ij",
+        )
+        m, f, p, d = m.ravel(), f.ravel(), p.ravel(), d.ravel()
+        return pd.DataFrame({
+            "model": np.array(self.models, dtype=object)[m],
+            "furnace": np.array(self.furnaces, dtype=object)[f],
+            "paint_multiplier": multipliers[p],
+            "distance_km": distances[d],
+            "model_price": self.model_price[m],
+            "furnace_price": self.furnace_price[f],
+            "paint_cost": self.paint_price[m] * multipliers[p],
+            "delivery_cost": calculate_delivery_cost(distances)[d],
+            "total": totals.ravel(),
+        })
+
+    def cheapest(self, max_total: float, max_distance_km: float, limit: int = 10) -> "pd.DataFrame":
+        """
+        Najtańsze konfiguracje, których cena przy dostawie na max_distance_km
+        (najgorszy przypadek w promieniu) nie przekracza max_total.
+        """
+        prices = self.price_list(distances_km=[max_distance_km])
+        matching = prices[prices["total"] <= max_total]
+        return matching.sort_values(["total", "model", "furnace"]).head(limit).reset_index(drop=True)
+
+    def quote(
+        self,
+        model: str,
+        furnace: str,
+        paint_multiplier: int = 0,
+        distance_km: float = 0.0,
+        custom_delivery_cost: float = 0.0,
+    ) -> dict:
+        """
+        Wycena pojedynczej konfiguracji - te same tablice co w cenniku.
+        Nazwy muszą być katalogowe (patrz quote_offer, który odrzuca nazwy spoza
+        katalogu); pusta nazwa modelu lub pieca wyceniana jest na 0 zł.
+        """
+        model_position = self.model_index.get(model)
+        furnace_position = self.furnace_index.get(furnace)
+        model_price = float(self.model_price[model_position]) if model_position is not None else 0.0
+        paint_price = float(self.paint_price[model_position]) if model_position is not None else 0.0
+        furnace_price = float(self.furnace_price[furnace_position]) if furnace_position is not None else 0.0
+        delivery_cost = float(calculate_delivery_cost(np.float64(distance_km)))
+        paint_cost = paint_price * paint_multiplier
+        return {
+            "model_price": model_price,
+            "base_paint_price": paint_price,
+            "paint_cost": paint_cost,
+            "furnace_price": furnace_price,
+            "delivery_cost": delivery_cost,
+            "custom_delivery_cost": custom_delivery_cost,
+            "total_price": model_price + furnace_price + delivery_cost + custom_delivery_cost + paint_cost,
+        }
+
+
+_price_catalog: Optional[PriceCatalog] = None
+_price_catalog_source: Optional[Catalog] = None
+_price_catalog_lock = threading.Lock()
+
+
+def get_price_catalog() -> PriceCatalog:
+    """Zwraca tablice cen, przebudowywane po przeładowaniu katalogu produktów."""
+    global _price_catalog, _price_catalog_source
+    catalog = get_catalog()
+    if _price_catalog_source is not catalog:
+        with _price_catalog_lock:
+            if _price_catalog_source is not catalog:
+                _price_catalog = PriceCatalog.from_catalog(catalog)
+                _price_catalog_source = catalog
+    return _price_catalog
+
+
+def quote_offer(sauna_data: dict, distance_km: float) -> dict:
+    """
+    Wycena konfiguracji w formacie generate_sauna_offer (nazwy spoza katalogu są rozpoznawane).
+
+    Raises:
+        UnknownProductError: Model lub piec nie pasuje do żadnej pozycji katalogu
+    """
+    catalog = get_catalog()
+    model = catalog.require(MODEL, sauna_data.get("model", ""))
+    furnace = catalog.require(FURNACE, sauna_data.get("furnace", ""))
+    return get_price_catalog().quote(
+        model.name if model else "",
+        furnace.name if furnace else "",
+        parse_paint_multiplier(sauna_data.get("paint")),
+        distance_km,
+        parse_custom_delivery_cost(sauna_data.get("custom_delivery")),
+    )
+
+
+def export_price_list(path: str, distances_km: Iterable[float] = DISTANCE_BANDS_KM) -> "pd.DataFrame":
+    """Zapisuje pełny cennik do .csv lub .parquet (po rozszerzeniu pliku)."""
+    prices = get_price_catalog().price_list(distances_km)
+    if path.lower().endswith(".parquet"):
+        prices.to_parquet(path, index=False)
+    else:
+        prices.to_csv(path, index=False)
+    return prices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cennik wszystkich konfiguracji saun")
+    parser.add_argument("--export", help="zapisz cennik do pliku .csv lub .parquet")
+    parser.add_argument("--distances", help="progi odległości w km, np. 0,50,100")
+    parser.add_argument("--cheapest", type=float, help="pokaż konfiguracje tańsze niż podana kwota")
+    parser.add_argument("--within", type=float, default=0.0, help="odległość dostawy dla --cheapest (km)")
+    args = parser.parse_args()
+
+    bands = [float(value) for value in args.distances.split(",")] if args.distances else DISTANCE_BANDS_KM
+    if args.export:
+        exported = export_price_list(args.export, bands)
+        print(f"Zapisano {len(exported)} pozycji cennika do {args.export}")
+    if args.cheapest is not None:
+        print(get_price_catalog().cheapest(args.cheapest, args.within).to_string())
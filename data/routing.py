@@ -0,0 +1,390 @@
+"""
+Offline odległości drogowe z magazynu (START_POINT) do klienta.
+
+Graf dróg (wyciąg OSM w formacie .osm lub para plików CSV węzły/krawędzie)
+jest kompilowany do tablic CSR w ROUTING_GRAPH_DIR i mapowany do pamięci.
+Przy budowie liczona jest tablica odległości magazyn -> każdy węzeł (Dijkstra),
+więc wycena to przyciągnięcie punktu do najbliższego węzła i jeden odczyt
+z tablicy. Dowolne trasy punkt-punkt liczy A* z punktami orientacyjnymi (ALT).
+
+Wyciąg dla całej Polski warto najpierw zawęzić do głównych dróg, np.:
+    osmium tags-filter poland.osm.pbf w/highway=motorway,trunk,primary,secondary,tertiary \
+        -o drogi.osm --overwrite  (oraz _link i unclassified/residential wg potrzeb)
+    python -m data.routing --build drogi.osm
+"""
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROUTING_GRAPH_DIR = os.getenv("ROUTING_GRAPH_DIR", "cache/routing")
+ROUTING_LANDMARKS = int(os.getenv("ROUTING_LANDMARKS", "8"))
+# Punkt dalej niż tyle od najbliższego węzła grafu jest poza zasięgiem wyciągu
+ROUTING_MAX_SNAP_KM = float(os.getenv("ROUTING_MAX_SNAP_KM", "15"))
+
+ROUTABLE_HIGHWAYS = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified", "residential",
+    "living_street", "service", "road",
+}
+_ARRAYS = (
+    "lat", "lng", "indptr", "indices", "weights", "rev_indptr", "rev_indices", "rev_weights",
+    "depot_distance", "landmark_from", "landmark_to", "cell_keys", "cell_order",
+)
+# Siatka do przyciągania punktów do węzłów (~5 km)
+_CELL_DEG = 0.05
+_CELL_STRIDE = 100000
+
+
+def _haversine_km(lat1, lng1, lat2, lng2):
+    """Odległość po kole wielkim (km); działa też element po elemencie na tablicach NumPy."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cell_key(lat, lng):
+    return (np.floor(np.asarray(lat) / _CELL_DEG).astype(np.int64) * _CELL_STRIDE
+            + np.floor(np.asarray(lng) / _CELL_DEG).astype(np.int64))
+
+
+def _read_osm(path: str) -> Tuple[Dict[int, Tuple[float, float]], List[Tuple[int, int, bool]]]:
+    """Węzły i odcinki dróg przejezdnych z pliku .osm (XML)."""
+    coords = {}
+    segments = []
+    for _, element in ElementTree.iterparse(path, events=("end",)):
+        if element.tag == "node":
+            coords[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            if tags.get("highway") in ROUTABLE_HIGHWAYS:
+                refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                oneway = tags.get("oneway", "")
+                if oneway == "-1":
+                    refs.reverse()
+                is_oneway = oneway in ("yes", "1", "true", "-1") or tags.get("junction") == "roundabout"
+                segments.extend((a, b, is_oneway) for a, b in zip(refs, refs[1:]))
+        else:
+            continue
+        element.clear()
+    return coords, segments
+
+
+def _read_csv(nodes_path: str, edges_path: str):
+    """Węzły (id, lat, lng) i krawędzie (from, to[, oneway]) z plików CSV."""
+    with open(nodes_path, encoding="utf-8") as source:
+        coords = {int(row["id"]): (float(row["lat"]), float(row["lng"])) for row in csv.DictReader(source)}
+    with open(edges_path, encoding="utf-8") as source:
+        segments = [
+            (int(row["from"]), int(row["to"]), str(row.get("oneway") or "").lower() in ("1", "yes", "true"))
+            for row in csv.DictReader(source)
+        ]
+    return coords, segments
+
+
+def _to_csr(n: int, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32), weights[order].astype(np.float32)
+
+
+def _dijkstra(indptr, indices, weights, source: int) -> np.ndarray:
+    """Odległości z jednego węzła do wszystkich (inf - nieosiągalne)."""
+    indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+    distance = [math.inf] * (len(indptr) - 1)
+    distance[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > distance[node]:
+            continue
+        for edge in range(indptr[node], indptr[node + 1]):
+            candidate = d + weights[edge]
+            target = indices[edge]
+            if candidate < distance[target]:
+                distance[target] = candidate
+                heapq.heappush(heap, (candidate, target))
+    return np.array(distance, dtype=np.float32)
+
+
+def _snap(lat, lng, cell_keys, cell_order, node_lat, node_lng, max_rings: int = 3) -> Tuple[Optional[int], float]:
+    """Najbliższy węzeł w sąsiednich komórkach siatki oraz odległość do niego (km)."""
+    center = int(_cell_key(lat, lng))
+    for rings in range(1, max_rings + 1):
+        candidates = []
+        for d_lat in range(-rings, rings + 1):
+            for d_lng in range(-rings, rings + 1):
+                key = center + d_lat * _CELL_STRIDE + d_lng
+                start = np.searchsorted(cell_keys, key, side="left")
+                end = np.searchsorted(cell_keys, key, side="right")
+                if end > start:
+                    candidates.append(cell_order[start:end])
+        if candidates:
+            nodes = np.concatenate(candidates)
+            distances = _haversine_km(lat, lng, node_lat[nodes], node_lng[nodes])
+            best = int(np.argmin(distances))
+            return int(nodes[best]), float(distances[best])
+    return None, math.inf
+
+
+def _select_landmarks(indptr, indices, weights, depot_distance: np.ndarray, count: int) -> List[int]:
+    """Punkty orientacyjne wybierane kolejno jako najdalsze od magazynu i już wybranych."""
+    landmarks, closest = [], None
+    reachable = np.where(np.isfinite(depot_distance), depot_distance, -1.0)
+    for _ in range(count):
+        score = reachable if closest is None else np.minimum(reachable, closest)
+        candidate = int(np.argmax(score))
+        if score[candidate] <= 0:
+            break
+        landmarks.append(candidate)
+        from_candidate = _dijkstra(indptr, indices, weights, candidate)
+        closest = from_candidate if closest is None else np.minimum(closest, from_candidate)
+    return landmarks
+
+
+def _source_fingerprint(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_graph(
+    source_path: str,
+    depot: Tuple[float, float],
+    edges_path: Optional[str] = None,
+    index_dir: str = ROUTING_GRAPH_DIR,
+    landmarks: int = ROUTING_LANDMARKS,
+) -> dict:
+    """
+    Kompiluje graf dróg do tablic .npy w katalogu grafu.
+
+    Args:
+        source_path (str): Wyciąg .osm albo plik CSV z węzłami (id, lat, lng)
+        depot (Tuple[float, float]): Współrzędne magazynu, z którego liczona jest tablica odległości
+        edges_path (str, optional): Plik CSV z krawędziami (from, to, oneway), gdy źródłem są CSV
+        index_dir (str): Katalog wynikowy
+        landmarks (int): Liczba punktów orientacyjnych dla A*
+
+    Returns:
+        dict: Metadane grafu (liczba węzłów i krawędzi, węzeł magazynu, ...)
+    """
+    if edges_path:
+        coords, segments = _read_csv(source_path, edges_path)
+    else:
+        coords, segments = _read_osm(source_path)
+
+    # Tylko węzły leżące na drogach, ponumerowane od 0
+    used = sorted({node for a, b, _ in segments for node in (a, b) if node in coords})
+    position = {node_id: i for i, node_id in enumerate(used)}
+    lat = np.array([coords[node_id][0] for node_id in used], dtype=np.float64)
+    lng = np.array([coords[node_id][1] for node_id in used], dtype=np.float64)
+
+    pairs = np.array(
+        [(position[a], position[b], oneway) for a, b, oneway in segments if a in position and b in position and a != b],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    length = _haversine_km(lat[pairs[:, 0]], lng[pairs[:, 0]], lat[pairs[:, 1]], lng[pairs[:, 1]])
+    both_ways = pairs[:, 2] == 0
+    sources = np.concatenate([pairs[:, 0], pairs[both_ways, 1]])
+    targets = np.concatenate([pairs[:, 1], pairs[both_ways, 0]])
+    weights = np.concatenate([length, length[both_ways]])
+
+    n = len(used)
+    indptr, indices, csr_weights = _to_csr(n, sources, targets, weights)
+    rev_indptr, rev_indices, rev_weights = _to_csr(n, targets, sources, weights)
+
+    cell_keys = _cell_key(lat, lng)
+    cell_order = np.argsort(cell_keys, kind="stable").astype(np.int32)
+    cell_keys = cell_keys[cell_order]
+
+    depot_node, depot_snap_km = _snap(depot[0], depot[1], cell_keys, cell_order, lat, lng, max_rings=20)
+    if depot_node is None:
+        raise ValueError("Magazyn leży poza obszarem grafu dróg")
+    depot_distance = _dijkstra(indptr, indices, csr_weights, depot_node)
+
+    chosen = _select_landmarks(indptr, indices, csr_weights, depot_distance, landmarks)
+    landmark_from = np.array([_dijkstra(indptr, indices, csr_weights, node) for node in chosen], dtype=np.float32).reshape(-1, n)
+    landmark_to = np.array([_dijkstra(rev_indptr, rev_indices, rev_weights, node) for node in chosen], dtype=np.float32).reshape(-1, n)
+
+    arrays = {
+        "lat": lat.astype(np.float32), "lng": lng.astype(np.float32),
+        "indptr": indptr, "indices": indices, "weights": csr_weights,
+        "rev_indptr": rev_indptr, "rev_indices": rev_indices, "rev_weights": rev_weights,
+        "depot_distance": depot_distance, "landmark_from": landmark_from, "landmark_to": landmark_to,
+        "cell_keys": cell_keys, "cell_order": cell_order,
+    }
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+
+    meta = {
+        "nodes": n,
+        "edges": int(len(indices)),
+        "depot": list(depot),
+        "depot_node": depot_node,
+        "depot_snap_km": round(depot_snap_km, 3),
+        "reachable_from_depot": int(np.isfinite(depot_distance).sum()),
+        "landmarks": chosen,
+        "fingerprint": _source_fingerprint(*(p for p in (source_path, edges_path) if p)),
+    }
+    with open(os.path.join(index_dir, "graph.json"), "w", encoding="utf-8") as stamp:
+        json.dump(meta, stamp)
+    return meta
+
+
+class RoadGraph:
+    """Graf dróg w tablicach CSR (mapowanych do pamięci) z tablicą odległości od magazynu."""
+
+    def __init__(self, meta: dict, arrays: dict):
+        self.meta = meta
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.depot = tuple(meta["depot"])
+
+    @classmethod
+    def load(cls, index_dir: str = ROUTING_GRAPH_DIR) -> "RoadGraph":
+        with open(os.path.join(index_dir, "graph.json"), encoding="utf-8") as stamp:
+            meta = json.load(stamp)
+        arrays = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        return cls(meta, arrays)
+
+    def snap(self, lat: float, lng: float) -> Tuple[Optional[int], float]:
+        """Najbliższy węzeł drogi i odległość do niego w linii prostej (km)."""
+        node, distance = _snap(lat, lng, self.cell_keys, self.cell_order, self.lat, self.lng)
+        if node is None or distance > ROUTING_MAX_SNAP_KM:
+            return None, distance
+        return node, distance
+
+    def distance_from_depot(self, lat: float, lng: float) -> Optional[float]:
+        """
+        Odległość drogowa z magazynu (km): odczyt z tablicy + dojazd od najbliższego węzła.
+
+        Returns:
+            Optional[float]: None, gdy punkt jest poza grafem lub nieosiągalny
+        """
+        node, access_km = self.snap(lat, lng)
+        if node is None:
+            return None
+        distance = float(self.depot_distance[node])
+        if not math.isfinite(distance):
+            return None
+        return distance + access_km + self.meta["depot_snap_km"]
+
+    def _heuristic(self, node: int, target: int) -> float:
+        """Dolne ograniczenie odległości node -> target z nierówności trójkąta (ALT)."""
+        with np.errstate(invalid="ignore"):
+            bounds = np.concatenate([
+                self.landmark_from[:, target] - self.landmark_from[:, node],
+                self.landmark_to[:, node] - self.landmark_to[:, target],
+            ])
+        bounds = bounds[~np.isnan(bounds)]
+        return max(0.0, float(bounds.max())) if len(bounds) else 0.0
+
+    def shortest_path_km(self, source: int, target: int) -> Optional[float]:
+        """Najkrótsza trasa między węzłami (km) - A* z punktami orientacyjnymi."""
+        if source == target:
+            return 0.0
+        best = {source: 0.0}
+        heap = [(self._heuristic(source, target), 0.0, source)]
+        closed = set()
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if node == target:
+                return distance
+            if node in closed:
+                continue
+            closed.add(node)
+            start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+            for neighbour, weight in zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()):
+                candidate = distance + weight
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    estimate = self._heuristic(neighbour, target)
+                    if math.isfinite(estimate):
+                        heapq.heappush(heap, (candidate + estimate, candidate, neighbour))
+        return None
+
+    def route_km(self, origin: Tuple[float, float], destination: Tuple[float, float]) -> Optional[float]:
+        """Odległość drogowa między dowolnymi punktami (km) lub None poza grafem."""
+        source, source_access = self.snap(*origin)
+        target, target_access = self.snap(*destination)
+        if source is None or target is None:
+            return None
+        distance = self.shortest_path_km(source, target)
+        return None if distance is None else distance + source_access + target_access
+
+
+_graph: Optional[RoadGraph] = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+
+
+def get_road_graph() -> Optional[RoadGraph]:
+    """Zwraca graf dróg albo None, gdy nie został zbudowany (python -m data.routing --build)."""
+    global _graph, _graph_loaded
+    if not _graph_loaded:
+        with _graph_lock:
+            if not _graph_loaded:
+                try:
+                    _graph = RoadGraph.load()
+                except FileNotFoundError:
+                    _graph = None
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Nie można załadować grafu dróg: {e}")
+                    _graph = None
+                _graph_loaded = True
+    return _graph
+
+
+def road_distance_from_depot(lat: float, lng: float, depot: Tuple[float, float]) -> Optional[float]:
+    """
+    Odległość drogowa od magazynu albo None (brak grafu, graf dla innego magazynu,
+    punkt poza grafem) - wtedy wywołujący liczy odległość w linii prostej.
+    """
+    graph = get_road_graph()
+    if graph is None:
+        return None
+    if _haversine_km(graph.depot[0], graph.depot[1], depot[0], depot[1]) > 0.5:
+        print("Graf dróg został zbudowany dla innego magazynu - przebuduj go (python -m data.routing --build)")
+        return None
+    distance = graph.distance_from_depot(lat, lng)
+    return None if distance is None else round(distance, 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline odległości drogowe od magazynu")
+    parser.add_argument("--build", metavar="ŹRÓDŁO", help="zbuduj graf z pliku .osm albo węzłów .csv")
+    parser.add_argument("--edges", help="plik .csv z krawędziami (gdy --build wskazuje węzły .csv)")
+    parser.add_argument("--landmarks", type=int, default=ROUTING_LANDMARKS, help="liczba punktów orientacyjnych A*")
+    parser.add_argument("address", nargs="*", help="adres do sprawdzenia odległości drogowej")
+    args = parser.parse_args()
+
+    from data.prices import START_POINT
+
+    if args.build:
+        graph_meta = build_graph(args.build, (START_POINT["lat"], START_POINT["lng"]), args.edges, landmarks=args.landmarks)
+        print(f"Zbudowano graf w {ROUTING_GRAPH_DIR}: {graph_meta['nodes']} węzłów, {graph_meta['edges']} krawędzi, "
+              f"{graph_meta['reachable_from_depot']} osiągalnych z magazynu")
+    if args.address:
+        from data.prices import get_coordinates_from_address
+
+        destination = get_coordinates_from_address(" ".join(args.address))
+        if destination is None:
+            print("Nie znaleziono adresu")
+        else:
+            road_km = road_distance_from_depot(destination[0], destination[1], (START_POINT["lat"], START_POINT["lng"]))
+            straight_km = float(_haversine_km(START_POINT["lat"], START_POINT["lng"], *destination))
+            road_text = f"{road_km} km" if road_km is not None else "brak (poza grafem)"
+            print(f"W linii prostej: {straight_km:.1f} km, drogą: {road_text}")
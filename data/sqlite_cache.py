@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+
+class SqliteTTLCache:
+    """
+    Trwały cache klucz -> wartość (JSON) w SQLite z TTL i wypieraniem LRU.
+
+    Plik bazy może być współdzielony przez kilka procesów Streamlit:
+    baza działa w trybie WAL, a zapisy idą w transakcjach BEGIN IMMEDIATE
+    z timeoutem na blokadę. Wartość None jest zapamiętywana jako wynik
+    negatywny (osobny, zwykle krótszy TTL).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        ttl_seconds: float,
+        max_entries: int,
+        negative_ttl_seconds: Optional[float] = None,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Niepoprawna nazwa tabeli: {table}")
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = ttl_seconds if negative_ttl_seconds is None else negative_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table}(last_used)"
+                )
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Zwraca (True, wartość) dla aktualnego wpisu lub (False, None) przy braku.
+        Wynik negatywny to (True, None).
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                self._count(hit=False)
+                return False, None
+            conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Błąd odczytu cache {self.path}: {e}")
+            self._count(hit=False)
+            return False, None
+
+        self._count(hit=True)
+        return True, (json.loads(row[0]) if row[0] is not None else None)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        now = time.time()
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds if value is not None else self.negative_ttl_seconds
+        encoded = json.dumps(value, ensure_ascii=False) if value is not None else None
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, encoded, now + ttl_seconds, now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Błąd zapisu cache {self.path}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        try:
+            self._connection().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            print(f"Błąd czyszczenia cache {self.path}: {e}")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
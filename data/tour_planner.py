@@ -0,0 +1,248 @@
+"""
+Wspólna trasa dostaw z magazynu (START_POINT) do kilku klientów naraz.
+
+Zamiast osobnego kursu tam i z powrotem do każdego klienta
+(calculate_delivery_cost) jedna ciężarówka objeżdża wszystkich:
+
+1. macierz odległości magazyn + przystanki liczona naraz (haversine w NumPy),
+2. trasa: najbliższy sąsiad, potem 2-opt (dla każdej krawędzi wszystkie
+   zamiany sprawdzane jednym wyrażeniem na tablicach),
+3. koszt trasy dzielony proporcjonalnie do kosztu osobnej dostawy każdego
+   klienta - każdy płaci tę samą część swojej ceny standardowej.
+
+Kilkaset przystanków planuje się w ułamku sekundy.
+
+    python -m data.tour_planner Gniezno Konin Września Słupca
+    python -m data.tour_planner --file targi.csv
+    python -m data.tour_planner --random 500      # pomiar czasu na losowych punktach
+"""
+import argparse
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data.prices import DELIVERY_PRICE_PER_KM, START_POINT, calculate_delivery_cost, get_coordinates_from_address
+from metrics import span
+
+# Limit przebiegów 2-opt - zwykle trasa przestaje się poprawiać dużo wcześniej
+TWO_OPT_MAX_PASSES = 50
+_EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass(frozen=True)
+class TourStop:
+    label: str
+    location: str
+    lat: float
+    lng: float
+    # Odległość z magazynu w linii prostej i koszt osobnej dostawy (tam i z powrotem)
+    distance_km: float
+    standalone_cost: float
+    prorated_cost: float
+
+
+@dataclass(frozen=True)
+class TourPlan:
+    # Przystanki w kolejności objazdu (trasa zaczyna się i kończy w magazynie)
+    stops: Tuple[TourStop, ...]
+    # Lokalizacje, których nie udało się zgeokodować - poza trasą
+    unresolved: Tuple[str, ...]
+    total_km: float
+    total_cost: float
+    standalone_cost: float
+
+    @property
+    def savings(self) -> float:
+        return self.standalone_cost - self.total_cost
+
+
+def haversine_matrix(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """
+    Macierz odległości po kole wielkim (km) między wszystkimi punktami naraz.
+
+    Args:
+        lat (np.ndarray): Szerokości geograficzne (stopnie), kształt (n,)
+        lng (np.ndarray): Długości geograficzne (stopnie), kształt (n,)
+
+    Returns:
+        np.ndarray: Symetryczna macierz (n, n)
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    dlat = lat[None, :] - lat[:, None]
+    dlng = lng[None, :] - lng[:, None]
+    cos_lat = np.cos(lat)
+    a = np.sin(dlat / 2) ** 2 + np.outer(cos_lat, cos_lat) * np.sin(dlng / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def nearest_neighbour_tour(matrix: np.ndarray) -> np.ndarray:
+    """Trasa z punktu 0 zawsze do najbliższego nieodwiedzonego; zwraca kolejność bez powrotu do 0."""
+    n = len(matrix)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    tour = np.empty(n, dtype=np.int64)
+    tour[0] = current = 0
+    for position in range(1, n):
+        distances = np.where(visited, np.inf, matrix[current])
+        current = int(np.argmin(distances))
+        visited[current] = True
+        tour[position] = current
+    return tour
+
+
+def two_opt(tour: np.ndarray, matrix: np.ndarray, max_passes: int = TWO_OPT_MAX_PASSES) -> np.ndarray:
+    """
+    Poprawia zamkniętą trasę (powrót do tour[0]) ruchami 2-opt: odwraca odcinek
+    tour[i:j+1], gdy skraca to trasę. Dla danego i wszystkie j liczone są naraz.
+    """
+    route = np.append(tour, tour[0])
+    n = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            c, d = route[i + 1:n], route[i + 2:n + 1]
+            delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = i + 1 + best
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route[:-1]
+
+
+def tour_length_km(tour: np.ndarray, matrix: np.ndarray) -> float:
+    """Długość zamkniętej trasy (z powrotem do punktu startowego)."""
+    return float(matrix[tour, np.roll(tour, -1)].sum())
+
+
+def solve_tour(lat: Sequence[float], lng: Sequence[float], depot: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kolejność objazdu przystanków z magazynu.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indeksy przystanków w kolejności objazdu
+        oraz macierz odległości (indeks 0 = magazyn, przystanek k = k + 1)
+    """
+    matrix = haversine_matrix(np.concatenate(([depot[0]], lat)), np.concatenate(([depot[1]], lng)))
+    tour = two_opt(nearest_neighbour_tour(matrix), matrix)
+    return tour[1:] - 1, matrix
+
+
+def plan_tour(locations: Sequence[str], labels: Optional[Sequence[str]] = None) -> TourPlan:
+    """
+    Planuje wspólną trasę dostaw i dzieli jej koszt między klientów.
+
+    Args:
+        locations (Sequence[str]): Adresy dostaw (np. z oczekujących ofert)
+        labels (Sequence[str], optional): Opisy przystanków (np. model lub numer oferty)
+
+    Returns:
+        TourPlan: Przystanki w kolejności objazdu z kosztami przed i po podziale
+    """
+    labels = list(labels) if labels is not None else list(locations)
+    resolved, unresolved = [], []
+    for label, location in zip(labels, locations):
+        coords = get_coordinates_from_address(location)
+        if coords is None:
+            unresolved.append(location)
+        else:
+            resolved.append((label, location, coords))
+
+    if not resolved:
+        return TourPlan(stops=(), unresolved=tuple(unresolved), total_km=0.0, total_cost=0.0, standalone_cost=0.0)
+
+    with span("tour_plan"):
+        lat = np.array([coords[0] for _, _, coords in resolved])
+        lng = np.array([coords[1] for _, _, coords in resolved])
+        order, matrix = solve_tour(lat, lng, (START_POINT["lat"], START_POINT["lng"]))
+
+    total_km = tour_length_km(np.concatenate(([0], order + 1)), matrix)
+    total_cost = total_km * DELIVERY_PRICE_PER_KM
+    depot_km = matrix[0, 1:]
+    standalone = np.array([calculate_delivery_cost(distance) for distance in depot_km])
+    standalone_total = float(standalone.sum())
+    # Każdy płaci tę samą część swojej ceny standardowej (przystanek w magazynie: 0 zł)
+    shares = standalone / standalone_total if standalone_total > 0 else np.full(len(standalone), 1 / len(standalone))
+    stops = tuple(
+        TourStop(
+            label=resolved[index][0],
+            location=resolved[index][1],
+            lat=float(lat[index]),
+            lng=float(lng[index]),
+            distance_km=round(float(depot_km[index]), 2),
+            standalone_cost=round(float(standalone[index]), 2),
+            prorated_cost=round(float(total_cost * shares[index]), 2),
+        )
+        for index in order
+    )
+    return TourPlan(
+        stops=stops,
+        unresolved=tuple(unresolved),
+        total_km=round(total_km, 2),
+        total_cost=round(total_cost, 2),
+        standalone_cost=round(standalone_total, 2),
+    )
+
+
+def _print_plan(plan: TourPlan) -> None:
+    print(f"Trasa z {START_POINT['address']}: {len(plan.stops)} przystanków, {plan.total_km:.0f} km")
+    for number, stop in enumerate(plan.stops, start=1):
+        print(
+            f"{number:>3}. {stop.label:<30} {stop.distance_km:>7.1f} km  "
+            f"{stop.standalone_cost:>9.2f} zł -> {stop.prorated_cost:>9.2f} zł"
+        )
+    print(f"Koszt trasy: {plan.total_cost:.2f} zł (osobno: {plan.standalone_cost:.2f} zł, oszczędność {plan.savings:.2f} zł)")
+    for location in plan.unresolved:
+        print(f"Nie znaleziono lokalizacji: {location}")
+
+
+def _benchmark(count: int, seed: int = 0) -> None:
+    """Czas planowania dla losowych punktów w Polsce (bez geokodowania)."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(49.5, 54.5, count)
+    lng = rng.uniform(14.5, 23.5, count)
+    depot = (START_POINT["lat"], START_POINT["lng"])
+
+    started = time.perf_counter()
+    matrix = haversine_matrix(np.concatenate(([depot[0]], lat)), np.concatenate(([depot[1]], lng)))
+    matrix_s = time.perf_counter() - started
+    started = time.perf_counter()
+    tour = nearest_neighbour_tour(matrix)
+    nearest_s = time.perf_counter() - started
+    nearest_km = tour_length_km(tour, matrix)
+    started = time.perf_counter()
+    tour = two_opt(tour, matrix)
+    two_opt_s = time.perf_counter() - started
+    print(
+        f"{count} przystanków: macierz {matrix_s * 1000:.1f} ms, najbliższy sąsiad {nearest_s * 1000:.1f} ms "
+        f"({nearest_km:.0f} km), 2-opt {two_opt_s * 1000:.1f} ms ({tour_length_km(tour, matrix):.0f} km)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wspólna trasa dostaw z podziałem kosztu")
+    parser.add_argument("locations", nargs="*", help="adresy dostaw")
+    parser.add_argument("--file", help="plik .csv lub .jsonl z konfiguracjami (jak dla batch_offers.py)")
+    parser.add_argument("--random", type=int, help="pomiar czasu dla N losowych punktów")
+    args = parser.parse_args()
+
+    if args.random:
+        _benchmark(args.random)
+    else:
+        locations, stop_labels = list(args.locations), list(args.locations)
+        if args.file:
+            from batch_offers import read_configurations
+
+            for row in read_configurations(args.file):
+                if row["location"]:
+                    locations.append(row["location"])
+                    stop_labels.append(f"{row['model']} ({row['location']})")
+        if not locations:
+            parser.error("podaj adresy, --file albo --random")
+        _print_plan(plan_tour(locations, stop_labels))
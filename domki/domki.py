@@ -1,8 +1,92 @@
-import streamlit as st 
+import streamlit as st
+from domki.domki_offer import DOMEK, generate_domek_offer_details
+from offer_archive import archive_offer
+from offer_ui import pdf_profile_select, show_offer_job, submit_offer_job
+from metrics import span
+
+def _render_domek_offer(report, house_data, profile=None):
+    report("Generowanie PDF")
+    offer = generate_domek_offer_details(house_data, profile=profile)
+    archive_id = archive_offer(offer, source="domki")
+    return {
+        "data": offer["data"],
+        "pdf_bytes": offer["pdf_bytes"],
+        "profile": offer["profile"],
+        "requested_profile": offer["requested_profile"],
+        "delivery_info": offer["delivery_info"],
+        "filename": DOMEK.filename(offer["data"]),
+        "archive_id": archive_id,
+    }
+
+def _show_domek_summary(house_data):
+    st.subheader("📋 Podsumowanie oferty:")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.write(f"**Typ:** {house_data.get('type', 'Nieznany')}")
+        st.write(f"**Model:** {house_data.get('model', 'Nieznany')}")
+        st.write(f"**Lokalizacja:** {house_data.get('location') or 'Do uzgodnienia'}")
+
+    with col2:
+        addons = house_data.get('addons') or []
+        st.write(f"**Dodatki:** {', '.join(addons) if addons else 'Brak'}")
+        paint = str(house_data.get('paint') or "")
+        if paint:
+            st.write(f"**Malowanie:** {paint}x krotne" if paint.isdigit() else f"**Malowanie:** {paint}")
+        if house_data.get('custom_delivery'):
+            st.write(f"**Dodatkowy rozładunek:** {house_data.get('custom_delivery')}")
+
+def domki_config():
+    st.subheader("Konfiguracja")
+    catalog = DOMEK.catalog()
+    type = st.selectbox("Typ domku", catalog.types, index=0)
+    model = st.radio(f"Wybierz model ({type}):", catalog.models_by_type[type])
+
+    location = st.text_input("Lokalizacja dostawy", value="", placeholder="Warszawa", key="domki_location")
+
+    if location:
+        try:
+            from data.prices import get_delivery_info
+            with span("delivery_preview"):
+                delivery_info = get_delivery_info(location)
+
+            if delivery_info["distance_km"] > 0:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.info(f"📏 Odległość: **{delivery_info['distance_km']} km**")
+                with col2:
+                    st.warning(f"🚚 Koszt dostawy: **{delivery_info['delivery_cost']} zł**")
+            else:
+                st.warning(f"⚠️ {delivery_info['message']} - koszt dostawy do ustalenia")
+        except Exception as e:
+            st.error(f"Nie można obliczyć odległości: {e}")
+
+    custom_delivery = st.text_input("Niestandardowy rozładunek", value="", placeholder="1000zł", key="domki_custom_delivery")
+
+    addons = st.multiselect("Dodatki", catalog.addon_names)
+
+    paint = st.text_input("Malowanie", value="", placeholder="1x krotne", key="domki_paint")
+
+    profile = pdf_profile_select("domki_pdf_profile")
+
+    if st.button("Generuj ofertę PDF", key="domki_pdf_button"):
+        house_data = {
+            "type": type,
+            "model": model,
+            "location": location,
+            "custom_delivery": custom_delivery,
+            "addons": addons,
+            "paint": paint
+        }
+        submit_offer_job("domki_offer_job", f"Oferta {model}", _render_domek_offer, house_data, profile)
+
+    show_offer_job("domki_offer_job", "Sprawdź czy wszystkie wymagane biblioteki są zainstalowane.", _show_domek_summary)
 
 def domki_interface():
-    st.title("Domki SOON")
+    st.title("Generator ofert - Domki")
+    if DOMEK.draft:
+        st.warning("⚠️ Ceny domków są wstępne, do potwierdzenia przez dział sprzedaży - oferty są oznaczone jako PROJEKT i nie trafiają do archiwum.")
+    domki_config()
 
 if __name__ == "__main__":
     domki_interface()
-
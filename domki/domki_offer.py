@@ -0,0 +1,67 @@
+"""
+Oferty domków - wtyczka typu produktu "domek" dla silnika ofert (offer_engine).
+
+Katalog: data/domki_catalog.json (modele i dodatki), szablon:
+templates/domki_offer.html ze stylami ofert saun. Ceny: model + dodatki
++ malowanie + dostawa (offer_engine.quote_from_catalog).
+
+Ceny w katalogu domków są wstępne, do weryfikacji przez dział sprzedaży -
+dopóki DOMKI_PRICES_CONFIRMED nie jest ustawione na 1, oferty są robocze:
+oznaczone w PDF jako projekt i nie trafiają do archiwum.
+"""
+import os
+
+from data.catalog import ADDON
+from offer_engine import ProductType, format_price, generate_offer_details, quote_from_catalog, register_product_type
+
+DOMKI_CATALOG_PATH = os.getenv("DOMKI_CATALOG_PATH", "data/domki_catalog.json")
+DOMKI_PRICES_CONFIRMED = os.getenv("DOMKI_PRICES_CONFIRMED", "0") == "1"
+
+
+class DomekOffer(ProductType):
+    name = "domek"
+    label = "Domki"
+    number_prefix = "DOM"
+    template = "domki_offer.html"
+    stylesheets = ["sauna_offer.css"]
+    catalog_path = DOMKI_CATALOG_PATH
+    printed_fields = ("type", "model", "location", "custom_delivery", "addons", "paint")
+    option_fields = {"addons": ADDON}
+    list_fields = ("addons",)
+    filename_label = "oferta_domku"
+    draft = not DOMKI_PRICES_CONFIRMED
+
+    def quote(self, data, distance_km):
+        return quote_from_catalog(self, data, distance_km)
+
+    def template_context(self, data, quote):
+        return {
+            "house": data,
+            "addons": [
+                {"name": option["name"], "price": format_price(option["price"])}
+                for option in quote["options"]
+            ],
+            "model_price": format_price(quote["model_price"]),
+            "delivery_cost": format_price(quote["delivery_cost"]),
+            "paint_cost": format_price(quote["paint_cost"]),
+            "custom_delivery_cost": format_price(quote["custom_delivery_cost"]),
+            "base_price": format_price(quote["total_price"]),
+        }
+
+
+DOMEK = register_product_type(DomekOffer())
+
+
+def generate_domek_offer_details(house_data, delivery_info=None, profile=None):
+    """
+    Generuje ofertę PDF domku.
+
+    Args:
+        house_data (dict): Konfiguracja (type, model, location, custom_delivery, addons, paint)
+        delivery_info (dict, optional): Gotowy wynik get_delivery_info dla lokalizacji
+        profile (str | PdfProfile, optional): Profil PDF (patrz pdf_profiles)
+
+    Returns:
+        dict: pdf_bytes, data, profile, requested_profile, number, delivery_info, quote
+    """
+    return generate_offer_details(DOMEK, house_data, delivery_info, profile)
@@ -0,0 +1,182 @@
+"""
+Pomniejszone kopie zdjęć używane w PDF zamiast oryginałów z aparatu.
+
+Rozmiary odpowiadają ramkom z CSS szablonu (galeria 2 kolumny x 200px,
+piec max 400x300px, logo 200px szerokości) przemnożonym przez
+DERIVATIVE_SCALE (albo image_scale profilu PDF). Pliki trafiają do IMAGE_CACHE_DIR pod nazwą będącą
+skrótem zawartości źródła i parametrów, więc zmiana pliku źródłowego
+automatycznie daje nową pochodną.
+
+Rozgrzanie cache dla wszystkich modeli: python -m image_derivatives
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "cache/images")
+# 2.0 ~ 192 DPI przy rozmiarach z CSS, wystarczające do druku zdjęć poglądowych
+DERIVATIVE_SCALE = float(os.getenv("DERIVATIVE_SCALE", "2.0"))
+DERIVATIVE_JPEG_QUALITY = int(os.getenv("DERIVATIVE_JPEG_QUALITY", "82"))
+# Zmiana algorytmu przetwarzania = nowa wersja = nowe nazwy plików w cache
+DERIVATIVE_VERSION = 1
+
+# Ramki w pikselach CSS: (szerokość, wysokość, przycinanie jak object-fit: cover)
+DERIVATIVE_BOXES = {
+    "gallery": (285, 200, True),
+    "furnace": (400, 300, False),
+    "logo": (200, 200, False),
+}
+
+_source_hashes: Dict[str, Tuple[int, int, str]] = {}
+_source_hashes_lock = threading.Lock()
+
+
+def content_hash(source_path: str) -> str:
+    """Skrót zawartości pliku, liczony ponownie tylko gdy zmieni się mtime/rozmiar."""
+    stat = os.stat(source_path)
+    with _source_hashes_lock:
+        cached = _source_hashes.get(source_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as source:
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            digest.update(chunk)
+    source_hash = digest.hexdigest()
+    with _source_hashes_lock:
+        _source_hashes[source_path] = (stat.st_mtime_ns, stat.st_size, source_hash)
+    return source_hash
+
+
+def _has_transparency(image: Image.Image) -> bool:
+    if image.mode in ("RGBA", "LA"):
+        return image.getchannel("A").getextrema()[0] < 255
+    return image.mode == "P" and "transparency" in image.info
+
+
+def render_derivative(
+    source_path: str, kind: str, scale: float = DERIVATIVE_SCALE, quality: int = DERIVATIVE_JPEG_QUALITY
+) -> Tuple[bytes, str]:
+    """
+    Tworzy pomniejszoną wersję zdjęcia dla danej ramki szablonu.
+
+    Args:
+        source_path (str): Ścieżka do oryginału
+        kind (str): Rodzaj ramki z DERIVATIVE_BOXES ("gallery", "furnace", "logo")
+        scale (float): Mnożnik rozdzielczości względem pikseli CSS
+        quality (int): Jakość JPEG
+
+    Returns:
+        Tuple[bytes, str]: Zawartość pliku i rozszerzenie ("jpg" lub "png")
+    """
+    width, height, crop = DERIVATIVE_BOXES[kind]
+    target = (round(width * scale), round(height * scale))
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if crop:
+            image = ImageOps.fit(image, target, method=Image.Resampling.LANCZOS)
+        else:
+            image = image.copy()
+            image.thumbnail(target, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        if _has_transparency(image):
+            image.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "png"
+
+        image.convert("RGB").save(
+            output, format="JPEG", quality=quality, optimize=True, progressive=True
+        )
+        return output.getvalue(), "jpg"
+
+
+def get_derivative_path(
+    source_path: str, kind: str, scale: float = DERIVATIVE_SCALE, quality: int = DERIVATIVE_JPEG_QUALITY
+) -> Optional[str]:
+    """
+    Zwraca ścieżkę do pochodnej zdjęcia, tworząc ją przy pierwszym użyciu.
+
+    Gdy źródła nie ma zwraca None; gdy Pillow nie potrafi go przetworzyć,
+    zwraca ścieżkę do oryginału, żeby oferta nadal się wygenerowała.
+    """
+    try:
+        source_hash = content_hash(source_path)
+    except OSError:
+        return None
+
+    key = hashlib.sha256(f"{source_hash}:{kind}:{scale}:{quality}:{DERIVATIVE_VERSION}".encode()).hexdigest()
+    for extension in ("jpg", "png"):
+        cached_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.{extension}")
+        if os.path.exists(cached_path):
+            return cached_path
+
+    try:
+        payload, extension = render_derivative(source_path, kind, scale, quality)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Nie można przetworzyć zdjęcia {source_path}: {e}")
+        return source_path
+
+    # Małe, już zoptymalizowane pliki (np. logo) potrafią urosnąć po ponownym zapisie
+    source_extension = os.path.splitext(source_path)[1].lower().lstrip(".").replace("jpeg", "jpg")
+    if source_extension == extension and len(payload) >= os.path.getsize(source_path):
+        with open(source_path, "rb") as source:
+            payload = source.read()
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    cached_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.{extension}")
+    # Zapis przez plik tymczasowy - równoległe procesy nie zobaczą połowy pliku
+    fd, tmp_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(payload)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+
+def warm_cache(profile_names: Optional[List[str]] = None) -> Dict[str, int]:
+    """Tworzy pochodne dla galerii wszystkich modeli, pieców/dodatków i logo (każdy typ produktu i profil PDF)."""
+    from offer_engine import LOGO_PATH, product_types
+    from pdf_profiles import PDF_PROFILES
+
+    gallery, options = set(), set()
+    for product_type in product_types():
+        catalog = product_type.catalog()
+        # Modele mogą dzielić folder (np. Toone 3,6 Open/Close) - każde zdjęcie raz
+        for model in catalog.models:
+            gallery.update(model.images[:product_type.max_gallery_images])
+        for option in catalog.furnaces + catalog.addons:
+            options.update(option.images)
+
+    counts = {"gallery": 0, "furnace": 0, "logo": 0}
+    for profile_name in profile_names or list(PDF_PROFILES):
+        profile = PDF_PROFILES[profile_name]
+        derivative = {"scale": profile.image_scale, "quality": profile.jpeg_quality}
+        for image_path in sorted(gallery) if profile.include_gallery else ():
+            if get_derivative_path(image_path, "gallery", **derivative):
+                counts["gallery"] += 1
+        for image_path in sorted(options):
+            if get_derivative_path(image_path, "furnace", **derivative):
+                counts["furnace"] += 1
+        if get_derivative_path(LOGO_PATH, "logo", **derivative):
+            counts["logo"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pochodne zdjęć do ofert PDF")
+    parser.add_argument("--clear", action="store_true", help="usuń cache przed rozgrzaniem")
+    parser.add_argument("--profile", action="append", help="profil PDF (domyślnie wszystkie), można powtórzyć")
+    args = parser.parse_args()
+
+    if args.clear and os.path.isdir(IMAGE_CACHE_DIR):
+        shutil.rmtree(IMAGE_CACHE_DIR)
+    counts = warm_cache(args.profile)
+    print(f"Przygotowano pochodne w {IMAGE_CACHE_DIR}: {counts}")
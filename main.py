@@ -1,8 +1,69 @@
+import os
+import threading
 import streamlit as st 
+from dotenv import load_dotenv
+
+import startup_profile
+
+# Ustawienia z .env (LLM_BACKEND, GEOCODER_MODE, ...) muszą być znane przed importem stron
+load_dotenv()
+
+# Po load_dotenv, żeby STARTUP_PROFILE działało także z pliku .env
+if os.getenv("STARTUP_PROFILE", "0") == "1":
+    startup_profile.install()
+
+def _warm_up_offer_pipeline():
+    """Ładuje WeasyPrint, szablony, fonty, spis miejscowości i zdjęcia, zanim będą potrzebne"""
+    try:
+        from offer_engine import warm_up_assets, weasyprint_available
+        if weasyprint_available():
+            # Fonty i CSS są osobne dla każdego wątku - rozgrzewają się wątki kolejki renderu
+            from render_env import compile_templates
+            from render_queue import get_render_service
+            compile_templates()
+            get_render_service().start_workers()
+        warm_up_assets()
+        # Zdjęcia w jakości podglądu na żywo (sauny_config)
+        from offer_preview import OFFER_PREVIEW_PROFILE
+        warm_up_assets(OFFER_PREVIEW_PROFILE)
+
+        from data.gazetteer import get_gazetteer
+        get_gazetteer()
+
+        from data.prices import DELIVERY_DISTANCE_MODE
+        if DELIVERY_DISTANCE_MODE == "road":
+            from data.routing import get_road_graph
+            get_road_graph()
+    except Exception as e:
+        print(f"Nie udało się rozgrzać generatora ofert: {e}")
+
+@st.cache_resource(show_spinner=False)
+def start_background_warm_up():
+    """Jednorazowo (na proces) rozgrzewa generator ofert w tle - pierwsza strona nie czeka na WeasyPrint"""
+    if os.getenv("OFFER_PREWARM", "1") != "1":
+        return None
+    thread = threading.Thread(target=_warm_up_offer_pipeline, name="offer-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_export():
+    """Endpoint /metrics (METRICS_PORT) i zapis do pliku (METRICS_EXPORT_PATH) - raz na proces"""
+    try:
+        from metrics import start_metrics_export
+        return start_metrics_export()
+    except Exception as e:
+        print(f"Nie udało się uruchomić eksportu metryk: {e}")
+        return None
 
 sauny_page = st.Page("sauny/sauny.py", title="Ofertownik Sauny", icon=":material/add_circle:")
 domki_page = st.Page("domki/domki.py", title="Ofertownik Domki", icon=":material/add_circle:")
+archive_page = st.Page("archiwum/archiwum.py", title="Archiwum ofert", icon=":material/inventory_2:")
+admin_page = st.Page("admin/admin.py", title="Metryki", icon=":material/monitoring:")
 
-pg = st.navigation([sauny_page, domki_page])
+pg = st.navigation([sauny_page, domki_page, archive_page, admin_page])
 st.set_page_config(page_title="Data manager", page_icon=":material/edit:")
-pg.run()
\ No newline at end of file
+start_background_warm_up()
+start_metrics_export()
+pg.run()
+startup_profile.report()
@@ -0,0 +1,275 @@
+"""
+Lekkie metryki procesu: liczniki, histogramy i pomiar etapów (span).
+
+Każdy etap oferty (analiza opisu, OpenAI, Nominatim, zdjęcia, szablon,
+WeasyPrint) mierzony jest przez `with span("nazwa", etykieta=...)`, co daje
+histogram czasu `nazwa_seconds` i licznik błędów `nazwa_errors_total`.
+Percentyle liczone są z ostatnich METRICS_RESERVOIR_SIZE pomiarów, a kubełki
+histogramu eksportowane w formacie tekstowym Prometheusa (plik lub endpoint).
+
+Przy METRICS_ENABLED=0 span zwraca gotowy, pusty kontekst, a inc/observe
+kończą się na pierwszym warunku - narzut jest pomijalny.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", "1024"))
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_PREFIX = "offer_generator_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Kubełki w stylu Prometheusa + okno ostatnich pomiarów do percentyli."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=METRICS_RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(f"{self.name}_seconds", time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None:
+            self.registry.inc(f"{self.name}_errors_total", error=exc_type.__name__, **self.labels)
+        return False
+
+
+_NOOP_SPAN = nullcontext()
+
+
+class MetricsRegistry:
+    """Rejestr liczników i histogramów współdzielony przez wszystkie wątki procesu."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def span(self, name: str, **labels):
+        """Mierzy czas bloku (histogram name_seconds) i liczy wyjątki (name_errors_total)."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, labels)
+
+    def register_collector(self, prefix: str, collector: Callable[[], dict]) -> None:
+        """Dołącza liczniki modułu (np. offer_cache_stats) jako wskaźniki prefix_klucz."""
+        self._collectors[prefix] = collector
+
+    def gauges(self) -> Dict[str, float]:
+        values = {}
+        for prefix, collector in list(self._collectors.items()):
+            try:
+                stats = collector() or {}
+            except Exception as e:
+                print(f"Nie można odczytać metryk {prefix}: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[f"{prefix}_{key}"] = float(value)
+        return values
+
+    def snapshot(self) -> dict:
+        """Stan rejestru do wyświetlenia: histogramy z percentylami, liczniki i wskaźniki."""
+        with self._lock:
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "mean": histogram.total / histogram.count if histogram.count else None,
+                    "p50": histogram.percentile(0.5),
+                    "p95": histogram.percentile(0.95),
+                    "p99": histogram.percentile(0.99),
+                    "max": max(histogram.recent) if histogram.recent else None,
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"histograms": histograms, "counters": counters, "gauges": self.gauges()}
+
+    def prometheus_text(self) -> str:
+        """Wszystkie metryki w formacie tekstowym Prometheusa (text/plain; version=0.0.4)."""
+        lines: List[str] = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = METRICS_PREFIX + name
+                declare(metric, "counter")
+                lines.append(f"{metric}{_format_labels(labels)} {value!r}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = METRICS_PREFIX + name
+                declare(metric, "histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+        for name, value in sorted(self.gauges().items()):
+            metric = METRICS_PREFIX + name
+            declare(metric, "gauge")
+            lines.append(f"{metric} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        key + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+registry = MetricsRegistry(enabled=METRICS_ENABLED)
+
+inc = registry.inc
+observe = registry.observe
+span = registry.span
+register_collector = registry.register_collector
+prometheus_text = registry.prometheus_text
+
+
+def write_prometheus(path: str = METRICS_EXPORT_PATH) -> None:
+    """Zapisuje metryki do pliku (atomowo), np. dla node_exporter textfile collector."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+        tmp_file.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def _metrics_handler():
+    # http.server ładowany tylko, gdy endpoint jest włączony
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_export(port: int = METRICS_PORT, path: str = METRICS_EXPORT_PATH) -> List[threading.Thread]:
+    """
+    Uruchamia w tle endpoint /metrics (gdy METRICS_PORT) i okresowy zapis do pliku
+    (gdy METRICS_EXPORT_PATH). Wywoływane raz na proces.
+
+    Returns:
+        List[threading.Thread]: Uruchomione wątki eksportu
+    """
+    threads = []
+    if not METRICS_ENABLED:
+        return threads
+
+    if port:
+        from http.server import ThreadingHTTPServer
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), _metrics_handler())
+        threads.append(threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True))
+
+    if path:
+        def export_loop():
+            while True:
+                try:
+                    write_prometheus(path)
+                except OSError as e:
+                    print(f"Nie można zapisać metryk do {path}: {e}")
+                time.sleep(METRICS_EXPORT_INTERVAL)
+
+        threads.append(threading.Thread(target=export_loop, name="metrics-file", daemon=True))
+
+    for thread in threads:
+        thread.start()
+    return threads
@@ -0,0 +1,332 @@
+"""
+Archiwum wygenerowanych ofert: PDF, konfiguracja, ceny i odległość w SQLite.
+
+PDF jest dzielony na fragmenty na granicach strumieni (stream ... endstream):
+duże strumienie - w praktyce osadzone zdjęcia galerii, pieca i logo - są
+zapisywane raz pod skrótem sha256 i współdzielone przez wszystkie oferty,
+a reszta pliku trafia do skompresowanych (zlib) fragmentów "klejących".
+Złożenie fragmentów daje bajt w bajt ten sam PDF.
+
+Wyszukiwanie idzie przez indeks FTS5 (lokalizacja, model, opis klienta -
+bez polskich znaków), a stronicowanie po kluczu (id < ostatnie_id), więc
+kolejne strony są tak samo szybkie przy 100 tys. ofert.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+from data.normalize import fold_text
+from metrics import register_collector
+
+OFFER_ARCHIVE_PATH = os.getenv("OFFER_ARCHIVE_PATH", "archive/offers.sqlite3")
+OFFER_ARCHIVE_ENABLED = os.getenv("OFFER_ARCHIVE_ENABLED", "1") == "1"
+# Strumienie PDF mniejsze niż to nie są deduplikowane (narzut wpisu > zysk)
+ARCHIVE_DEDUP_MIN_BYTES = int(os.getenv("ARCHIVE_DEDUP_MIN_BYTES", str(8 * 1024)))
+ARCHIVE_PAGE_SIZE = 25
+
+_STREAM_START_RE = re.compile(rb"stream\r?\n")
+_FTS_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS offers (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    number TEXT NOT NULL,
+    product_type TEXT NOT NULL DEFAULT 'sauna',
+    type TEXT, model TEXT, furnace TEXT, location TEXT,
+    distance_km REAL, total_price REAL,
+    source TEXT,
+    config_json TEXT NOT NULL,
+    prices_json TEXT NOT NULL,
+    delivery_json TEXT NOT NULL,
+    input_text TEXT,
+    pdf_size INTEGER NOT NULL,
+    pdf_chunks TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_model_id ON offers(model, id);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS offers_fts USING fts5(location, model, input_text);
+"""
+
+
+def split_pdf(pdf_bytes: bytes, min_stream_bytes: int = ARCHIVE_DEDUP_MIN_BYTES) -> List[bytes]:
+    """
+    Dzieli PDF na fragmenty: duże strumienie osobno, wszystko pomiędzy w jednym kawałku.
+    Podział jest bezstratny - b"".join(fragmenty) == pdf_bytes.
+    """
+    parts, glue_start, position = [], 0, 0
+    while True:
+        match = _STREAM_START_RE.search(pdf_bytes, position)
+        if match is None:
+            break
+        end = pdf_bytes.find(b"endstream", match.end())
+        if end == -1:
+            break
+        if end - match.end() >= min_stream_bytes:
+            if match.end() > glue_start:
+                parts.append(pdf_bytes[glue_start:match.end()])
+            parts.append(pdf_bytes[match.end():end])
+            glue_start = end
+        position = end + len(b"endstream")
+    parts.append(pdf_bytes[glue_start:])
+    return [part for part in parts if part]
+
+
+def fts_query(text: str) -> str:
+    """Zapytanie FTS5 z tekstu użytkownika: każde słowo jako prefiks, wszystkie wymagane."""
+    return " AND ".join(f'"{token}"*' for token in _FTS_TOKEN_RE.findall(fold_text(text)))
+
+
+class OfferArchive:
+    """Archiwum ofert w jednym pliku SQLite (WAL, połączenie na wątek)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(offers)")}
+                    # Archiwa sprzed ofert domków - wszystkie wpisy to sauny
+                    if "product_type" not in columns:
+                        conn.execute("ALTER TABLE offers ADD COLUMN product_type TEXT NOT NULL DEFAULT 'sauna'")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _store_chunks(self, conn: sqlite3.Connection, parts: List[bytes]) -> List[str]:
+        hashes = []
+        for part in parts:
+            digest = hashlib.sha256(part).hexdigest()
+            updated = conn.execute("UPDATE chunks SET refs = refs + 1 WHERE hash = ?", (digest,)).rowcount
+            if not updated:
+                packed = zlib.compress(part, 6)
+                compressed = len(packed) < len(part)
+                conn.execute(
+                    "INSERT INTO chunks (hash, compressed, size, refs, data) VALUES (?, ?, ?, 1, ?)",
+                    (digest, int(compressed), len(part), packed if compressed else part),
+                )
+            hashes.append(digest)
+        return hashes
+
+    def add(
+        self,
+        data: dict,
+        pdf_bytes: bytes,
+        number: str,
+        delivery_info: dict,
+        quote: dict,
+        input_text: str = "",
+        source: str = "",
+        product_type: str = "sauna",
+    ) -> int:
+        """
+        Zapisuje ofertę w archiwum.
+
+        Returns:
+            int: Identyfikator oferty w archiwum
+        """
+        parts = split_pdf(pdf_bytes)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            hashes = self._store_chunks(conn, parts)
+            cursor = conn.execute(
+                "INSERT INTO offers (created_at, number, product_type, type, model, furnace, location, distance_km,"
+                " total_price, source, config_json, prices_json, delivery_json, input_text, pdf_size, pdf_chunks)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    time.time(), number, product_type,
+                    data.get("type", ""), data.get("model", ""), data.get("furnace", ""),
+                    data.get("location", ""),
+                    delivery_info.get("distance_km"), quote.get("total_price"),
+                    source,
+                    json.dumps(data, ensure_ascii=False),
+                    json.dumps(quote, ensure_ascii=False),
+                    json.dumps(delivery_info, ensure_ascii=False),
+                    input_text, len(pdf_bytes), json.dumps(hashes),
+                ),
+            )
+            offer_id = cursor.lastrowid
+            conn.execute(
+                "INSERT INTO offers_fts (rowid, location, model, input_text) VALUES (?, ?, ?, ?)",
+                (offer_id, fold_text(data.get("location", "")), fold_text(data.get("model", "")),
+                 fold_text(input_text)),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return offer_id
+
+    def search(
+        self,
+        text: str = "",
+        model: str = "",
+        before_id: Optional[int] = None,
+        limit: int = ARCHIVE_PAGE_SIZE,
+    ) -> List[dict]:
+        """
+        Strona wyników od najnowszych; następna strona: before_id = id ostatniego wiersza.
+        """
+        columns = (
+            "o.id, o.created_at, o.number, o.product_type, o.model, o.furnace, o.location,"
+            " o.distance_km, o.total_price, o.source"
+        )
+        conditions, params = [], []
+        query = fts_query(text)
+        if query:
+            # FTS5 zwraca trafienia po rowid - sortowanie i zakres po f.rowid nie wymagają sortowania wyników
+            sql, key = f"SELECT {columns} FROM offers_fts f JOIN offers o ON o.id = f.rowid", "f.rowid"
+            conditions.append("offers_fts MATCH ?")
+            params.append(query)
+        else:
+            sql, key = f"SELECT {columns} FROM offers o", "o.id"
+        if model:
+            conditions.append("o.model = ?")
+            params.append(model)
+        if before_id is not None:
+            conditions.append(f"{key} < ?")
+            params.append(before_id)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {key} DESC LIMIT ?"
+        params.append(limit)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        keys = (
+            "id", "created_at", "number", "product_type", "model", "furnace", "location",
+            "distance_km", "total_price", "source",
+        )
+        return [dict(zip(keys, row)) for row in rows]
+
+    def get(self, offer_id: int) -> Optional[dict]:
+        """Pełny wpis oferty (bez PDF): konfiguracja, ceny, dostawa i opis klienta."""
+        row = self._connection().execute(
+            "SELECT id, created_at, number, source, config_json, prices_json, delivery_json, input_text, pdf_size,"
+            " product_type FROM offers WHERE id = ?",
+            (offer_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "created_at": row[1], "number": row[2], "source": row[3],
+            "data": json.loads(row[4]), "quote": json.loads(row[5]), "delivery_info": json.loads(row[6]),
+            "input_text": row[7], "pdf_size": row[8], "product_type": row[9],
+        }
+
+    def get_pdf(self, offer_id: int) -> Optional[bytes]:
+        """Składa PDF oferty z fragmentów."""
+        conn = self._connection()
+        row = conn.execute("SELECT pdf_chunks FROM offers WHERE id = ?", (offer_id,)).fetchone()
+        if row is None:
+            return None
+        hashes = json.loads(row[0])
+        placeholders = ",".join("?" * len(set(hashes)))
+        stored = {
+            digest: zlib.decompress(data) if compressed else data
+            for digest, compressed, data in conn.execute(
+                f"SELECT hash, compressed, data FROM chunks WHERE hash IN ({placeholders})", tuple(set(hashes))
+            )
+        }
+        return b"".join(stored[digest] for digest in hashes)
+
+    def delete(self, offer_id: int) -> bool:
+        """Usuwa ofertę; fragmenty, do których nic już się nie odwołuje, są kasowane."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT pdf_chunks FROM offers WHERE id = ?", (offer_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return False
+            for digest in json.loads(row[0]):
+                conn.execute("UPDATE chunks SET refs = refs - 1 WHERE hash = ?", (digest,))
+            conn.execute("DELETE FROM chunks WHERE refs <= 0")
+            conn.execute("DELETE FROM offers WHERE id = ?", (offer_id,))
+            conn.execute("DELETE FROM offers_fts WHERE rowid = ?", (offer_id,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def models(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT DISTINCT model FROM offers ORDER BY model")]
+
+    def stats(self) -> dict:
+        """Liczba ofert, łączny rozmiar PDF i faktycznie zajęte miejsce (po deduplikacji)."""
+        conn = self._connection()
+        offers, pdf_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(pdf_size), 0) FROM offers").fetchone()
+        chunks, stored_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(length(data)), 0) FROM chunks").fetchone()
+        return {
+            "offers": offers,
+            "pdf_bytes": pdf_bytes,
+            "chunks": chunks,
+            "stored_bytes": stored_bytes,
+            "saving_ratio": round(1 - stored_bytes / pdf_bytes, 3) if pdf_bytes else 0.0,
+        }
+
+
+_archive: Optional[OfferArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_offer_archive() -> OfferArchive:
+    """Zwraca współdzielone w procesie archiwum ofert."""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = OfferArchive(OFFER_ARCHIVE_PATH)
+    return _archive
+
+
+def archive_offer(offer: dict, input_text: str = "", source: str = "") -> Optional[int]:
+    """
+    Archiwizuje wynik offer_engine.generate_offer_details. Błąd zapisu nie przerywa
+    generowania oferty - jest tylko wypisywany. Oferty robocze (draft - cennik
+    typu produktu niepotwierdzony) nie są archiwizowane.
+
+    Returns:
+        Optional[int]: Identyfikator w archiwum lub None (wyłączone, oferta robocza albo błąd)
+    """
+    if not OFFER_ARCHIVE_ENABLED or offer.get("draft"):
+        return None
+    try:
+        return get_offer_archive().add(
+            offer["data"], offer["pdf_bytes"], offer["number"],
+            offer["delivery_info"], offer["quote"], input_text=input_text, source=source,
+            product_type=offer["product_type"],
+        )
+    except (sqlite3.Error, OSError) as e:
+        # OSError: np. katalog archiwum na wolumenie tylko do odczytu albo niedostępnym
+        print(f"Nie można zapisać oferty w archiwum: {e}")
+        return None
+
+
+register_collector("offer_archive", lambda: _archive.stats() if _archive is not None else {})
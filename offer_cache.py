@@ -0,0 +1,126 @@
+"""
+Cache gotowych ofert PDF adresowany skrótem ich danych wejściowych.
+
+Klucz obejmuje znormalizowaną konfigurację, cenniki, wersję szablonu,
+skróty zawartości użytych zdjęć oraz datę oferty (data i numer są drukowane
+w PDF), więc zmiana któregokolwiek z nich automatycznie daje nowy wpis.
+Pliki leżą w OFFER_CACHE_DIR; po przekroczeniu OFFER_CACHE_MAX_BYTES
+usuwane są najdawniej używane.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Iterable, Optional
+
+from image_derivatives import content_hash
+from metrics import register_collector
+
+OFFER_CACHE_DIR = os.getenv("OFFER_CACHE_DIR", "cache/offers")
+OFFER_CACHE_MAX_BYTES = int(os.getenv("OFFER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+OFFER_CACHE_ENABLED = os.getenv("OFFER_CACHE_ENABLED", "1") == "1"
+# Podbić przy zmianie sposobu liczenia cen lub budowania danych dla szablonu
+OFFER_CACHE_VERSION = 1
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def offer_cache_key(payload: dict, asset_paths: Iterable[str], template_version: str) -> str:
+    """
+    Liczy kanoniczny skrót oferty.
+
+    Args:
+        payload (dict): Znormalizowane dane oferty (konfiguracja, cenniki, data)
+        asset_paths (Iterable[str]): Ścieżki zdjęć, które trafią do PDF
+        template_version (str): Skrót plików szablonu
+
+    Returns:
+        str: Klucz sha256 (hex)
+    """
+    assets = []
+    for path in sorted(set(asset_paths)):
+        try:
+            assets.append([path, content_hash(path)])
+        except OSError:
+            assets.append([path, None])
+
+    canonical = json.dumps(
+        {"v": OFFER_CACHE_VERSION, "payload": payload, "assets": assets, "template": template_version},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(OFFER_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def get_cached_offer(key: str) -> Optional[bytes]:
+    if not OFFER_CACHE_ENABLED:
+        return None
+    path = _entry_path(key)
+    try:
+        with open(path, "rb") as pdf_file:
+            pdf_bytes = pdf_file.read()
+        # mtime służy jako znacznik ostatniego użycia dla LRU
+        os.utime(path)
+    except OSError:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    with _lock:
+        _stats["hits"] += 1
+    return pdf_bytes
+
+
+def store_offer(key: str, pdf_bytes: bytes) -> None:
+    if not OFFER_CACHE_ENABLED:
+        return
+    path = _entry_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        _evict()
+    except OSError as e:
+        print(f"Nie można zapisać oferty w cache: {e}")
+
+
+def _evict() -> None:
+    entries = []
+    for root, _, files in os.walk(OFFER_CACHE_DIR):
+        for name in files:
+            if name.endswith(".pdf"):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= OFFER_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            with _lock:
+                _stats["evictions"] += 1
+        except OSError:
+            pass
+
+
+def offer_cache_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+register_collector("offer_cache", offer_cache_stats)
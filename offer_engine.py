@@ -0,0 +1,730 @@
+"""
+Wspólny silnik ofert PDF dla wszystkich typów produktów (sauny, domki, ...).
+
+Typ produktu to wtyczka (ProductType): wskazuje plik katalogu, szablon,
+prefiks numeru oferty i reguły cen, a silnik robi resztę tak samo dla
+każdego typu - równoległe wczytanie zdjęć i geokodowanie z limitami czasu,
+cache gotowych PDF, wspólne środowisko szablonów/fontów (render_env),
+wspólny cache zdjęć (assets) i metryki etapów. Nowy typ produktu to klasa
+z konfiguracją oraz plik katalogu i szablon - bez własnej ścieżki renderu.
+Rozmiar i jakość PDF (zdjęcia, fonty, galeria) wybiera profil z pdf_profiles.
+Typ z osobnymi szablonami stron zmiennych i stałych renderuje przy każdej
+ofercie tylko strony zmienne, a stałe dokleja z pamięci fragmentów (pdf_fragments).
+
+Wtyczki są ładowane leniwie po nazwie z PRODUCT_TYPE_MODULES.
+"""
+import abc
+import asyncio
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from assets import asset_url, load_asset, register_asset_resolver
+from data.catalog import MODEL, Catalog, Product, get_catalog
+from data.prices import DELIVERY_DISTANCE_MODE, calculate_delivery_cost, get_delivery_info
+from data.pricing_engine import parse_custom_delivery_cost, parse_paint_multiplier
+from image_derivatives import get_derivative_path
+from metrics import SIZE_BUCKETS, inc, observe, span
+from offer_cache import get_cached_offer, offer_cache_key, store_offer
+from pdf_fragments import OFFER_FRAGMENTS_ENABLED, get_fragment_cache
+from pdf_profiles import PdfTooLargeError, get_pdf_profile
+from render_env import TEMPLATE_STYLESHEETS, render_document, render_pdf, template_variables, template_version
+
+LOGO_PATH = "images/LOGO/Wooden_spa.png"
+
+# Równoległe wczytywanie zdjęć i geokodowanie przed renderem oferty
+OFFER_IO_WORKERS = int(os.getenv("OFFER_IO_WORKERS", "8"))
+OFFER_GEOCODE_TIMEOUT = float(os.getenv("OFFER_GEOCODE_TIMEOUT", "8"))
+OFFER_ASSET_TIMEOUT = float(os.getenv("OFFER_ASSET_TIMEOUT", "5"))
+
+# Nazwa typu produktu -> moduł, który rejestruje jego wtyczkę
+PRODUCT_TYPE_MODULES = {
+    "sauna": "pdf_template",
+    "domek": "domki.domki_offer",
+}
+
+
+def format_price(value: float) -> str:
+    """Kwota w formacie oferty: 12 345"""
+    return f"{value:,.0f}".replace(",", " ")
+
+
+class ProductType(abc.ABC):
+    """
+    Wtyczka typu produktu. Podklasa ustawia atrybuty konfiguracji, implementuje
+    quote i w razie potrzeby nadpisuje template_context; resztę daje silnik.
+    """
+
+    name = ""
+    label = ""
+    # Prefiks numeru oferty, np. "SAU" -> SAU/2026/10/18
+    number_prefix = ""
+    template = ""
+    stylesheets: List[str] = []
+    catalog_path = ""
+    max_gallery_images = 4
+    # Pola konfiguracji drukowane w ofercie (wchodzą do klucza cache)
+    printed_fields = ("type", "model", "location", "custom_delivery", "paint")
+    # Pola konfiguracji wskazujące pozycje katalogu: pole -> rodzaj, np. {"furnace": FURNACE}.
+    # Wartość pola to nazwa albo lista nazw (np. dodatki domku)
+    option_fields: Dict[str, str] = {}
+    # Pola, których wartością może być lista nazw (np. dodatki domku)
+    list_fields: Tuple[str, ...] = ()
+    filename_label = "oferta"
+    # Sekcje szablonu renderowane osobno w podglądzie HTML (offer_preview); puste = brak podglądu
+    preview_sections: Tuple[str, ...] = ()
+    # Oferta składana z fragmentów: strony zmienne (numer, data, ceny) renderowane
+    # przy każdej ofercie i strony stałe dla modelu/pozycji renderowane raz (pdf_fragments).
+    # Razem muszą dawać to samo co template; puste = render całego template
+    dynamic_template = ""
+    static_template = ""
+    # Cennik niepotwierdzony: PDF oznaczony jako projekt (zmienna szablonu draft,
+    # prefiks nazwy pliku) i nie trafia do archiwum ofert
+    draft = False
+
+    def catalog(self) -> Catalog:
+        return get_catalog(self.catalog_path)
+
+    def selected_options(self, data: dict, strict: bool = False) -> List[Tuple[str, Product]]:
+        """
+        Pozycje katalogu wybrane w konfiguracji jako (nazwa etapu, produkt):
+        pole z jedną nazwą -> "furnace", lista -> "addons:0", "addons:1"...
+        Nieznane nazwy są pomijane, a przy strict=True zgłaszają UnknownProductError.
+        """
+        catalog = self.catalog()
+        selected = []
+        for field, kind in self.option_fields.items():
+            value = data.get(field) or ""
+            names = [(field, value)] if isinstance(value, str) else [(f"{field}:{i}", name) for i, name in enumerate(value)]
+            for stage, name in names:
+                option = catalog.require(kind, name) if strict else catalog.resolve(kind, name)
+                if option is not None:
+                    selected.append((stage, option))
+        return selected
+
+    def canonicalize(self, data: dict) -> dict:
+        """Kopia konfiguracji z nazwami z katalogu (model, typ i pola option_fields)."""
+        catalog = self.catalog()
+        canonical = dict(data)
+        model = catalog.model(data.get("model", ""))
+        if model is not None:
+            canonical["model"] = model.name
+            canonical["type"] = model.type
+        for field, kind in self.option_fields.items():
+            value = data.get(field) or ""
+            if isinstance(value, str):
+                option = catalog.resolve(kind, value)
+                if option is not None:
+                    canonical[field] = option.name
+            else:
+                canonical[field] = [
+                    option.name if option is not None else name
+                    for name, option in ((name, catalog.resolve(kind, name)) for name in value)
+                ]
+        return canonical
+
+    def check_catalog(self, data: dict) -> None:
+        """
+        Sprawdza, czy model i pozycje konfiguracji są w katalogu (puste pola są dozwolone).
+
+        Raises:
+            UnknownProductError: Niepusta nazwa spoza katalogu
+        """
+        self.catalog().require(MODEL, data.get("model", ""))
+        self.selected_options(data, strict=True)
+
+    def gallery_paths(self, model_name: str) -> List[str]:
+        model = self.catalog().model(model_name)
+        return list(model.images[:self.max_gallery_images]) if model else []
+
+    def option_assets(self, data: dict, profile=None) -> Dict[str, str]:
+        """Zdjęcia pozycji wybranych w konfiguracji: nazwa etapu -> adres asset:// (w jakości profilu PDF)"""
+        profile_name = get_pdf_profile(profile).name
+        return {
+            stage: asset_url("option", self.name, profile_name, option.kind, option.name)
+            for stage, option in self.selected_options(data) if option.images
+        }
+
+    def asset_paths(self, data: dict) -> List[str]:
+        """Pliki źródłowe zdjęć oferty - ich zmiana unieważnia cache PDF."""
+        paths = self.gallery_paths(data.get("model", "")) + [LOGO_PATH]
+        for _, option in self.selected_options(data):
+            paths.extend(option.images)
+        return paths
+
+    def price_fingerprint(self, data: dict) -> list:
+        """Ceny pozycji z konfiguracji - zmiana cennika unieważnia cache PDF."""
+        model = self.catalog().model(data.get("model", ""))
+        fingerprint = [model and (model.sku, model.price, model.paint_price)]
+        fingerprint.extend((option.sku, option.price) for _, option in self.selected_options(data))
+        return fingerprint
+
+    @abc.abstractmethod
+    def quote(self, data: dict, distance_km: float) -> dict:
+        """
+        Wycena konfiguracji.
+
+        Returns:
+            dict: Składniki ceny; co najmniej delivery_cost, custom_delivery_cost i total_price
+        """
+
+    def template_context(self, data: dict, quote: dict) -> dict:
+        """Zmienne szablonu specyficzne dla typu (poza wspólnymi: images, logo_image, numer, data...)."""
+        return {}
+
+    def filename(self, data: dict) -> str:
+        model = data.get("model", "").replace(" ", "_").replace(",", "").replace("/", "_")
+        prefix = "PROJEKT_" if self.draft else ""
+        return f"{prefix}{datetime.now().strftime('%d.%m.%Y')}_{self.filename_label}_{model}.pdf"
+
+    def offer_number(self, offer_date: datetime) -> str:
+        return f"{self.number_prefix}/{offer_date.strftime('%Y/%m')}/{offer_date.strftime('%d')}"
+
+
+def quote_from_catalog(product_type: ProductType, data: dict, distance_km: float) -> dict:
+    """
+    Wycena dla typów bez własnego silnika cen: model + malowanie x krotność
+    + wybrane pozycje katalogu + dostawa + rozładunek.
+
+    Raises:
+        UnknownProductError: Model lub pozycja konfiguracji spoza katalogu
+    """
+    model = product_type.catalog().require(MODEL, data.get("model", ""))
+    model_price = model.price if model else 0.0
+    paint_price = model.paint_price if model else 0.0
+    paint_cost = paint_price * parse_paint_multiplier(data.get("paint"))
+
+    options = [
+        {"field": stage.split(":")[0], "sku": option.sku, "name": option.name, "price": option.price}
+        for stage, option in product_type.selected_options(data, strict=True)
+    ]
+    options_price = sum(option["price"] for option in options)
+
+    delivery_cost = float(calculate_delivery_cost(distance_km))
+    custom_delivery_cost = parse_custom_delivery_cost(data.get("custom_delivery"))
+    return {
+        "model_price": model_price,
+        "base_paint_price": paint_price,
+        "paint_cost": paint_cost,
+        "options": options,
+        "options_price": options_price,
+        "delivery_cost": delivery_cost,
+        "custom_delivery_cost": custom_delivery_cost,
+        "total_price": model_price + paint_cost + options_price + delivery_cost + custom_delivery_cost,
+    }
+
+
+_product_types: Dict[str, ProductType] = {}
+_product_types_lock = threading.Lock()
+
+
+def register_product_type(product_type: ProductType) -> ProductType:
+    """Rejestruje wtyczkę typu produktu (wywoływane przy imporcie jej modułu)."""
+    with _product_types_lock:
+        _product_types[product_type.name] = product_type
+        if product_type.stylesheets:
+            for template_name in (product_type.template, product_type.dynamic_template, product_type.static_template):
+                if template_name:
+                    TEMPLATE_STYLESHEETS.setdefault(template_name, list(product_type.stylesheets))
+    return product_type
+
+
+def get_product_type(name: str) -> ProductType:
+    """Zwraca wtyczkę po nazwie, importując jej moduł przy pierwszym użyciu."""
+    product_type = _product_types.get(name)
+    if product_type is None:
+        module = PRODUCT_TYPE_MODULES.get(name)
+        if module is None:
+            raise KeyError(f"Nieznany typ produktu: {name}")
+        importlib.import_module(module)
+        product_type = _product_types[name]
+    return product_type
+
+
+def product_types() -> List[ProductType]:
+    return [get_product_type(name) for name in PRODUCT_TYPE_MODULES]
+
+
+def _derivative(source_path, kind, profile_name):
+    profile = get_pdf_profile(profile_name)
+    return get_derivative_path(source_path, kind, profile.image_scale, profile.jpeg_quality)
+
+def _resolve_gallery_asset(type_name, profile_name, model_name, index):
+    return _derivative(get_product_type(type_name).gallery_paths(model_name)[int(index)], "gallery", profile_name)
+
+def _resolve_option_asset(type_name, profile_name, kind, option_name):
+    option = get_product_type(type_name).catalog().resolve(kind, option_name)
+    if option is not None and option.images:
+        # Zdjęcia pozycji (piec, dodatek) mają tę samą ramkę w szablonach co zdjęcie pieca
+        return _derivative(option.images[0], "furnace", profile_name)
+    return None
+
+def _resolve_logo_asset(profile_name):
+    return _derivative(LOGO_PATH, "logo", profile_name)
+
+register_asset_resolver("gallery", _resolve_gallery_asset)
+register_asset_resolver("option", _resolve_option_asset)
+register_asset_resolver("logo", _resolve_logo_asset)
+
+
+def gallery_urls(product_type: ProductType, model_name: str, profile=None) -> List[str]:
+    profile_name = get_pdf_profile(profile).name
+    return [
+        asset_url("gallery", product_type.name, profile_name, model_name, index)
+        for index in range(len(product_type.gallery_paths(model_name)))
+    ]
+
+def load_asset_url(url: str) -> Optional[str]:
+    """Wczytuje zasób do cache procesu; zwraca adres albo None, gdy pliku brak"""
+    return url if load_asset(url) is not None else None
+
+def get_logo_image(profile=None) -> Optional[str]:
+    """Pobiera logo firmy (adres asset://)"""
+    return load_asset_url(asset_url("logo", get_pdf_profile(profile).name))
+
+def warm_up_assets(profile=None) -> None:
+    """Wczytuje logo i zdjęcia wszystkich pozycji z jednym zdjęciem (piece, dodatki) każdego typu."""
+    profile_name = get_pdf_profile(profile).name
+    get_logo_image(profile_name)
+    for product_type in product_types():
+        catalog = product_type.catalog()
+        kinds = set(product_type.option_fields.values())
+        for option in catalog.furnaces + catalog.addons:
+            if option.kind in kinds and option.images:
+                load_asset_url(asset_url("option", product_type.name, profile_name, option.kind, option.name))
+
+
+def _delivery_fallback(location, reason):
+    """Dane dostawy, gdy geokodowanie nie zdążyło lub się nie powiodło - koszt do ustalenia"""
+    return {
+        "distance_km": 0.0,
+        "delivery_cost": 0.0,
+        "message": f"Nie udało się ustalić odległości do {location} ({reason}) - koszt dostawy do ustalenia",
+        "degraded": True,
+    }
+
+# WeasyPrint (z Pango i fontami) ładuje się dopiero przy pierwszej ofercie albo w rozgrzewce z main.py
+_weasyprint_error = None
+_weasyprint_checked = False
+
+def weasyprint_available():
+    """Importuje WeasyPrint przy pierwszym wywołaniu; False, gdy brakuje bibliotek systemowych"""
+    global _weasyprint_error, _weasyprint_checked
+    if not _weasyprint_checked:
+        try:
+            import weasyprint  # noqa: F401
+        except (ImportError, OSError) as e:
+            # Brak libpango/libgobject kończy się OSError, a nie ImportError
+            _weasyprint_error = e
+        _weasyprint_checked = True
+    return _weasyprint_error is None
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+def _get_io_executor():
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(max_workers=OFFER_IO_WORKERS, thread_name_prefix="offer-io")
+    return _io_executor
+
+def _reset_io_executor():
+    # Wątki puli nie przechodzą do procesu potomnego (fork) - potomek tworzy własną pulę
+    global _io_executor, _io_executor_lock
+    _io_executor = None
+    _io_executor_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_io_executor)
+
+def _offer_io_stages(product_type, data, delivery_info, profile):
+    """
+    Niezależne od siebie kroki wejścia/wyjścia oferty.
+
+    Returns:
+        list: Krotki (nazwa, funkcja, argumenty, limit czasu w s, wynik zastępczy)
+    """
+    location = data.get("location", "")
+    stages = []
+    if profile.include_gallery:
+        stages.extend(
+            (f"gallery:{index}", load_asset_url, (url,), OFFER_ASSET_TIMEOUT, None)
+            for index, url in enumerate(gallery_urls(product_type, data.get("model", ""), profile))
+        )
+    for name, url in product_type.option_assets(data, profile).items():
+        stages.append((name, load_asset_url, (url,), OFFER_ASSET_TIMEOUT, None))
+    stages.append(("logo", get_logo_image, (profile,), OFFER_ASSET_TIMEOUT, None))
+    if delivery_info is None:
+        stages.append(("delivery", get_delivery_info, (location,), OFFER_GEOCODE_TIMEOUT, _delivery_fallback))
+    return stages
+
+def _timed_stage(name, fn, *args):
+    with span("offer_stage", stage=name.split(":")[0]):
+        return fn(*args)
+
+def _stage_failed(name, fallback, location, reason, timed_out=False):
+    print(f"Etap oferty {name} nie powiódł się: {reason}")
+    inc("offer_stage_failures_total", stage=name.split(":")[0], reason="timeout" if timed_out else "error")
+    return fallback(location, reason) if fallback else None
+
+def _start_offer_io(product_type, data, delivery_info, profile):
+    """
+    Zleca wszystkie kroki wejścia/wyjścia w puli naraz.
+
+    Returns:
+        dict: Nazwa kroku -> (future, termin wg time.monotonic, wynik zastępczy)
+    """
+    executor = _get_io_executor()
+    started = time.monotonic()
+    return {
+        name: (executor.submit(_timed_stage, name, fn, *args), started + timeout, fallback)
+        for name, fn, args, timeout, fallback in _offer_io_stages(product_type, data, delivery_info, profile)
+    }
+
+def _collect_offer_io(pending, location):
+    """Wyniki kroków z _start_offer_io - na każdy czeka najwyżej do jego terminu"""
+    results = {}
+    for name, (future, deadline, fallback) in pending.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            future.cancel()
+            results[name] = _stage_failed(name, fallback, location, "przekroczono limit czasu", timed_out=True)
+        except Exception as e:
+            results[name] = _stage_failed(name, fallback, location, e)
+    return results
+
+def _cancel_offer_io(pending):
+    # Kroki, które już ruszyły, kończą się w tle (zdjęcia trafiają do cache zasobów)
+    for future, _, _ in pending.values():
+        future.cancel()
+
+def gather_offer_inputs(product_type, data, delivery_info=None, profile=None):
+    """
+    Uruchamia wszystkie kroki wejścia/wyjścia naraz i czeka na każdy najwyżej
+    jego limit czasu, więc całość trwa tyle, ile najwolniejszy krok.
+    Brakujące zdjęcie jest pomijane, a geokoder, który nie zdążył, daje
+    odległość 0 z komunikatem.
+
+    Returns:
+        dict: Wyniki kroków po nazwie (gallery:N, zdjęcia pozycji, logo, delivery)
+    """
+    pending = _start_offer_io(product_type, data, delivery_info, get_pdf_profile(profile))
+    return _collect_offer_io(pending, data.get("location", ""))
+
+def _start_offer_io_async(product_type, data, delivery_info, profile):
+    """Odpowiednik _start_offer_io w pętli zdarzeń: nazwa kroku -> zadanie asyncio"""
+    location = data.get("location", "")
+    return {
+        stage[0]: asyncio.ensure_future(_run_stage_async(location, *stage))
+        for stage in _offer_io_stages(product_type, data, delivery_info, profile)
+    }
+
+async def gather_offer_inputs_async(product_type, data, delivery_info=None, profile=None):
+    """Odpowiednik gather_offer_inputs dla wywołujących z własną pętlą zdarzeń"""
+    tasks = _start_offer_io_async(product_type, data, delivery_info, get_pdf_profile(profile))
+    values = await asyncio.gather(*tasks.values())
+    return dict(zip(tasks, values))
+
+async def _run_stage_async(location, name, fn, args, timeout, fallback):
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_get_io_executor(), _timed_stage, name, fn, *args), timeout)
+    except asyncio.TimeoutError:
+        return _stage_failed(name, fallback, location, "przekroczono limit czasu", timed_out=True)
+    except Exception as e:
+        return _stage_failed(name, fallback, location, e)
+
+def get_delivery_info_timed(location):
+    """get_delivery_info z limitem czasu i wynikiem zastępczym jak przy ofercie (w puli wejścia/wyjścia)"""
+    future = _get_io_executor().submit(_timed_stage, "delivery", get_delivery_info, location)
+    try:
+        return future.result(timeout=OFFER_GEOCODE_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        return _stage_failed("delivery", _delivery_fallback, location, "przekroczono limit czasu", timed_out=True)
+    except Exception as e:
+        return _stage_failed("delivery", _delivery_fallback, location, e)
+
+async def get_delivery_info_async(location):
+    """
+    get_delivery_info dla kodu w pętli asyncio: geokodowanie w puli wejścia/wyjścia,
+    z limitem czasu i wynikiem zastępczym jak przy ofercie (np. wycena bez renderu).
+    """
+    return await _run_stage_async(
+        location, "delivery", get_delivery_info, (location,), OFFER_GEOCODE_TIMEOUT, _delivery_fallback
+    )
+
+def _offer_cache_key(product_type, data, delivery_info, offer_date, profile):
+    """Klucz cache oferty: wszystko, co wpływa na treść PDF (delivery_info - już ustalona dostawa)"""
+    payload = {
+        "product_type": product_type.name,
+        "draft": product_type.draft,
+        "profile": asdict(profile),
+        # Pola drukowane w PDF wchodzą do klucza w takiej postaci, w jakiej trafią do szablonu
+        "data": {key: data.get(key) if isinstance(data.get(key), list) else str(data.get(key) or "").strip() for key in product_type.printed_fields},
+        "prices": product_type.price_fingerprint(data),
+        # Odległość i koszt dostawy drukowane w PDF - zależą też od geokodera i trybu liczenia odległości
+        "delivery": {key: delivery_info.get(key) for key in ("distance_km", "delivery_cost", "message", "degraded")},
+        "distance_mode": DELIVERY_DISTANCE_MODE,
+        # Numer i data oferty zależą od dnia
+        "date": offer_date.strftime("%Y-%m-%d"),
+    }
+    return offer_cache_key(payload, product_type.asset_paths(data), template_version())
+
+def delivery_pending(data, delivery_info):
+    """Koszt dostawy do ustalenia: odległość zastępcza albo lokalizacja, której nie udało się znaleźć"""
+    if not delivery_info:
+        return False
+    if delivery_info.get("degraded"):
+        return True
+    return bool(str(data.get("location") or "").strip()) and not delivery_info.get("distance_km")
+
+def _offer_cacheable(data, delivery_info):
+    """
+    Czy oferta może trafić do cache PDF: bez odległości zastępczej (limit czasu,
+    błąd geokodera), wyniku nierozstrzygającego (geokoder online nie odpowiedział)
+    i bez 0 km dla podanej lokalizacji - następna próba może policzyć ją poprawnie.
+    """
+    return not (delivery_info.get("provisional") or delivery_pending(data, delivery_info))
+
+def _prepare_offer(product_type, data, delivery_info, profile):
+    """Dostawa musi być już ustalona - odległość jest częścią klucza cache"""
+    if not weasyprint_available():
+        raise ImportError(f"WeasyPrint nie jest dostępny ({_weasyprint_error}). Sprawdź instalację bibliotek systemowych.")
+
+    offer_date = datetime.now()
+    cache_key = _offer_cache_key(product_type, data, delivery_info, offer_date, profile)
+    cached_pdf = get_cached_offer(cache_key)
+    inc("offers_total", product=product_type.name, profile=profile.name, source="cache" if cached_pdf is not None else "render")
+    return offer_date, cache_key, cached_pdf
+
+def offer_context(product_type, data, delivery_info, inputs, offer_date, quote):
+    """
+    Zmienne szablonu oferty (wspólne dla PDF i podglądu HTML).
+
+    Args:
+        inputs (dict): Wyniki kroków wejścia (gallery:N, zdjęcia pozycji, logo) - adresy zdjęć
+        quote (dict): Wycena z product_type.quote
+
+    Returns:
+        dict: Kontekst szablonu product_type.template
+    """
+    images = [
+        inputs[name] for name in sorted((n for n in inputs if n.startswith("gallery:")), key=lambda n: int(n.split(":")[1]))
+        if inputs[name]
+    ]
+    distance_km = delivery_info["distance_km"]
+    context = {
+        "images": images,
+        "logo_image": inputs.get("logo"),
+        "numer": product_type.offer_number(offer_date),
+        "data": offer_date.strftime("%d.%m.%Y"),
+        "delivery_info": delivery_info,
+        "distance_km": distance_km,
+        # Szablon drukuje "do ustalenia" zamiast kosztu dostawy 0 zł
+        "delivery_pending": delivery_pending(data, delivery_info),
+        "draft": product_type.draft,
+    }
+    # Zdjęcia pozycji: pole z jedną nazwą -> <pole>_image (np. furnace_image),
+    # lista nazw -> <pole>_images ({nazwa pozycji: adres})
+    for field, value in product_type.option_fields.items():
+        if isinstance(data.get(field), list):
+            context[f"{field}_images"] = {
+                option.name: inputs[stage]
+                for stage, option in product_type.selected_options(data)
+                if stage.startswith(field + ":") and inputs.get(stage)
+            }
+        else:
+            context[f"{field}_image"] = inputs.get(field)
+    context.update(product_type.template_context(data, quote))
+    return context
+
+def _fragment_key(product_type, data, context, profile):
+    """Klucz stron stałych: wartości zmiennych, których używa static_template, profil, zdjęcia i szablony"""
+    used = sorted(template_variables(product_type.static_template) & context.keys())
+    payload = {
+        "fragment": product_type.static_template,
+        "product_type": product_type.name,
+        "profile": asdict(profile),
+        "context": {name: context[name] for name in used},
+    }
+    return offer_cache_key(payload, product_type.asset_paths(data), template_version())
+
+def _render_pdf(product_type, data, context, profile):
+    """Render PDF oferty - ze stałymi stronami z pamięci fragmentów, gdy typ je wydziela"""
+    pdf_options = profile.write_pdf_options()
+    if not (OFFER_FRAGMENTS_ENABLED and product_type.dynamic_template and product_type.static_template):
+        return render_pdf(product_type.template, pdf_options=pdf_options, **context)
+
+    fragment = get_fragment_cache().get(
+        _fragment_key(product_type, data, context, profile),
+        lambda: render_document(product_type.static_template, pdf_options=pdf_options, **context),
+        label=product_type.name,
+    )
+    return render_pdf(product_type.dynamic_template, pdf_options=pdf_options, fragments=[fragment], **context)
+
+def _render_offer(product_type, data, delivery_info, inputs, offer_date, cache_key, profile):
+    """Wycena i render oferty; zwraca PDF wraz z danymi, z których powstał"""
+    with span("offer_stage", stage="pricing"):
+        quote = product_type.quote(data, delivery_info["distance_km"])
+
+    context = offer_context(product_type, data, delivery_info, inputs, offer_date, quote)
+
+    with span("offer_stage", stage="render"):
+        pdf_bytes = _render_pdf(product_type, data, context, profile)
+    observe("offer_pdf_bytes", len(pdf_bytes), buckets=SIZE_BUCKETS, product=product_type.name, profile=profile.name)
+    requested_profile = profile
+    while len(pdf_bytes) > profile.max_bytes:
+        inc("offer_pdf_oversize_total", product=product_type.name, profile=profile.name)
+        size = f"{len(pdf_bytes) / 1024:.0f} KB - ponad limit {profile.max_bytes / 1024:.0f} KB"
+        if not profile.fallback:
+            raise PdfTooLargeError(f"Oferta {product_type.name} w profilu {profile.name} ma {size}", len(pdf_bytes))
+        print(f"Oferta {product_type.name} ({profile.name}) ma {size}, render w profilu {profile.fallback}")
+        profile = get_pdf_profile(profile.fallback)
+        inputs = gather_offer_inputs(product_type, data, delivery_info, profile)
+        context = offer_context(product_type, data, delivery_info, inputs, offer_date, quote)
+        with span("offer_stage", stage="render"):
+            pdf_bytes = _render_pdf(product_type, data, context, profile)
+        observe("offer_pdf_bytes", len(pdf_bytes), buckets=SIZE_BUCKETS, product=product_type.name, profile=profile.name)
+    # PDF z mniejszego profilu nie trafia do cache - wynik z cache podaje profil zamówiony
+    if profile is requested_profile and _offer_cacheable(data, delivery_info):
+        store_offer(cache_key, pdf_bytes)
+    return {
+        "pdf_bytes": pdf_bytes,
+        "product_type": product_type.name,
+        "profile": profile.name,
+        # Inny niż profile, gdy PDF nie zmieścił się w limicie zamówionego profilu
+        "requested_profile": requested_profile.name,
+        "data": data,
+        "number": context["numer"],
+        "delivery_info": delivery_info,
+        "quote": quote,
+        "draft": product_type.draft,
+    }
+
+def _cached_offer(product_type, data, delivery_info, offer_date, pdf_bytes, profile):
+    """Oferta z cache PDF - bez wyceny (uzupełniają ją wersje *_details)"""
+    return {
+        "pdf_bytes": pdf_bytes,
+        "product_type": product_type.name,
+        "profile": profile.name,
+        "requested_profile": profile.name,
+        "data": data,
+        "number": product_type.offer_number(offer_date),
+        "delivery_info": delivery_info,
+        "draft": product_type.draft,
+    }
+
+def _generate(product_type, data, delivery_info, profile):
+    data = product_type.canonicalize(data)
+    # Nieznany produkt to błąd konfiguracji - bez oferty z ceną 0 zł (także z cache PDF)
+    product_type.check_catalog(data)
+    with span("offer", product=product_type.name, profile=profile.name):
+        # Zdjęcia wczytują się w trakcie geokodowania; odległość jest potrzebna
+        # już do klucza cache, a zdjęcia dopiero do renderu
+        location = data.get("location", "")
+        pending = _start_offer_io(product_type, data, delivery_info, profile)
+        try:
+            if delivery_info is None:
+                delivery_info = _collect_offer_io({"delivery": pending.pop("delivery")}, location)["delivery"]
+            offer_date, cache_key, cached_pdf = _prepare_offer(product_type, data, delivery_info, profile)
+            if cached_pdf is None:
+                with span("offer_stage", stage="io"):
+                    inputs = _collect_offer_io(pending, location)
+        finally:
+            # PDF z cache (albo błąd) - zdjęcia nie są już potrzebne
+            _cancel_offer_io(pending)
+        if cached_pdf is not None:
+            return _cached_offer(product_type, data, delivery_info, offer_date, cached_pdf, profile)
+        return _render_offer(product_type, data, delivery_info, inputs, offer_date, cache_key, profile)
+
+def generate_offer(product_type, data, delivery_info=None, profile=None):
+    """
+    Generuje ofertę PDF dla konfiguracji produktu danego typu.
+
+    Args:
+        product_type (str | ProductType): Typ produktu, np. "sauna", "domek"
+        data (dict): Konfiguracja w formacie typu (model, location, ...)
+        delivery_info (dict, optional): Gotowy wynik get_delivery_info dla lokalizacji
+        profile (str | PdfProfile, optional): Profil PDF ("email", "print", "preview");
+            domyślnie PDF_PROFILE
+
+    Returns:
+        bytes: Zawartość pliku PDF
+    """
+    if isinstance(product_type, str):
+        product_type = get_product_type(product_type)
+    return _generate(product_type, data, delivery_info, get_pdf_profile(profile))["pdf_bytes"]
+
+def generate_offer_details(product_type, data, delivery_info=None, profile=None):
+    """
+    Jak generate_offer, ale zwraca też numer oferty, dane dostawy i wycenę
+    (np. do archiwum ofert).
+
+    Returns:
+        dict: pdf_bytes, product_type, profile, requested_profile, data, number,
+            delivery_info, quote; profile różni się od requested_profile, gdy PDF
+            przekroczył limit rozmiaru i powstał w mniejszym profilu (fallback)
+    """
+    if isinstance(product_type, str):
+        product_type = get_product_type(product_type)
+    offer = _generate(product_type, data, delivery_info, get_pdf_profile(profile))
+    if "quote" not in offer:
+        # PDF z cache - wycena jest liczona ponownie, bez renderu
+        offer["quote"] = product_type.quote(offer["data"], offer["delivery_info"]["distance_km"])
+    return offer
+
+async def _generate_async(product_type, data, delivery_info, profile):
+    data = product_type.canonicalize(data)
+    product_type.check_catalog(data)
+    with span("offer", product=product_type.name, profile=profile.name):
+        tasks = _start_offer_io_async(product_type, data, delivery_info, profile)
+        try:
+            if delivery_info is None:
+                delivery_info = await tasks.pop("delivery")
+            offer_date, cache_key, cached_pdf = await asyncio.to_thread(_prepare_offer, product_type, data, delivery_info, profile)
+            if cached_pdf is None:
+                with span("offer_stage", stage="io"):
+                    values = await asyncio.gather(*tasks.values())
+                inputs = dict(zip(tasks, values))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        if cached_pdf is not None:
+            return _cached_offer(product_type, data, delivery_info, offer_date, cached_pdf, profile)
+        return await asyncio.to_thread(_render_offer, product_type, data, delivery_info, inputs, offer_date, cache_key, profile)
+
+async def generate_offer_async(product_type, data, delivery_info=None, profile=None):
+    """
+    Wersja generate_offer dla kodu działającego w pętli asyncio.
+    Kroki wejścia/wyjścia i render wykonują się w wątkach, nie blokując pętli
+    (render w domyślnej puli pętli - wywołujący może ją ograniczyć).
+
+    Returns:
+        bytes: Zawartość pliku PDF
+    """
+    if isinstance(product_type, str):
+        product_type = get_product_type(product_type)
+    return (await _generate_async(product_type, data, delivery_info, get_pdf_profile(profile)))["pdf_bytes"]
+
+async def generate_offer_details_async(product_type, data, delivery_info=None, profile=None):
+    """
+    Wersja generate_offer_details dla kodu działającego w pętli asyncio.
+
+    Returns:
+        dict: Jak generate_offer_details
+    """
+    if isinstance(product_type, str):
+        product_type = get_product_type(product_type)
+    offer = await _generate_async(product_type, data, delivery_info, get_pdf_profile(profile))
+    if "quote" not in offer:
+        offer["quote"] = product_type.quote(offer["data"], offer["delivery_info"]["distance_km"])
+    return offer
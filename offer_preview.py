@@ -0,0 +1,153 @@
+"""
+Szybki podgląd HTML oferty - bez WeasyPrint, do formularza w sauny.py.
+
+Szablon oferty jest złożony z sekcji (ProductType.preview_sections, np.
+templates/sauna/pricing.html). Podgląd renderuje każdą sekcję osobno i
+zapamiętuje wynik pod kluczem z tych zmiennych szablonu, których sekcja
+faktycznie używa (render_env.template_variables). Zmiana
+malowania renderuje więc ponownie tylko specyfikację i tabelę cen, a logo,
+galeria, piec i kontakt przychodzą z pamięci.
+
+Zdjęcia to pochodne w jakości profilu OFFER_PREVIEW_PROFILE wstawione jako
+data URI (zakodowane raz na adres). Galeria jest pokazywana zawsze - podgląd
+ma wyglądać jak oferta. Pełny PDF powstaje dopiero po kliknięciu "Generuj".
+"""
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from assets import load_asset, resolve_asset_path
+from data.prices import get_delivery_info
+from metrics import inc, span
+from offer_engine import gallery_urls, get_logo_image, get_product_type, load_asset_url, offer_context
+from pdf_profiles import get_pdf_profile
+from render_env import (
+    TEMPLATE_STYLESHEETS, TEMPLATES_AUTO_RELOAD, TEMPLATES_DIR, get_environment, template_variables, template_version,
+)
+
+OFFER_PREVIEW_PROFILE = os.getenv("OFFER_PREVIEW_PROFILE", "preview")
+PREVIEW_SECTION_MEMO_SIZE = 512
+PREVIEW_DATA_URI_MEMO_SIZE = 256
+
+_ASSET_URL_RE = re.compile(r"asset://[^\"'\s)]+")
+
+_lock = threading.Lock()
+_section_memo: "OrderedDict[tuple, str]" = OrderedDict()
+_data_uris: "OrderedDict[str, str]" = OrderedDict()
+_stylesheets: Dict[str, tuple] = {}
+
+
+def _data_uri(url: str) -> str:
+    """Adres asset:// zamieniony na data URI (zakodowany raz na adres)."""
+    with _lock:
+        data_uri = _data_uris.get(url)
+        if data_uri is not None:
+            _data_uris.move_to_end(url)
+            return data_uri
+    payload = load_asset(url)
+    if payload is None:
+        return ""
+    mime_type = mimetypes.guess_type(resolve_asset_path(url) or "")[0] or "application/octet-stream"
+    data_uri = f"data:{mime_type};base64,{base64.b64encode(payload).decode('ascii')}"
+    with _lock:
+        _data_uris[url] = data_uri
+        if len(_data_uris) > PREVIEW_DATA_URI_MEMO_SIZE:
+            _data_uris.popitem(last=False)
+    return data_uri
+
+
+def _render_section(template_name: str, context: dict, version: str) -> str:
+    used = sorted(template_variables(template_name) & context.keys())
+    fingerprint = json.dumps([(name, context[name]) for name in used], sort_keys=True, default=str, ensure_ascii=False)
+    key = (template_name, version, hashlib.sha256(fingerprint.encode("utf-8")).hexdigest())
+    with _lock:
+        html = _section_memo.get(key)
+        if html is not None:
+            _section_memo.move_to_end(key)
+    if html is not None:
+        inc("offer_preview_sections_total", result="memo")
+        return html
+
+    html = get_environment().get_template(template_name).render(**context)
+    html = _ASSET_URL_RE.sub(lambda match: _data_uri(match.group(0)), html)
+    inc("offer_preview_sections_total", result="render")
+    with _lock:
+        _section_memo[key] = html
+        if len(_section_memo) > PREVIEW_SECTION_MEMO_SIZE:
+            _section_memo.popitem(last=False)
+    return html
+
+
+def _stylesheet_text(template_name: str) -> str:
+    parts = []
+    for filename in TEMPLATE_STYLESHEETS.get(template_name, []):
+        path = os.path.join(TEMPLATES_DIR, filename)
+        mtime = os.path.getmtime(path)
+        cached = _stylesheets.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding="utf-8") as css_file:
+                cached = (mtime, css_file.read())
+            _stylesheets[filename] = cached
+        parts.append(cached[1])
+    return "\n".join(parts)
+
+
+def _preview_inputs(product_type, data: dict, profile) -> Dict[str, Optional[str]]:
+    """Adresy zdjęć oferty jak z gather_offer_inputs, ale synchronicznie (zasoby są już w cache procesu)."""
+    inputs = {
+        f"gallery:{index}": load_asset_url(url)
+        for index, url in enumerate(gallery_urls(product_type, data.get("model", ""), profile))
+    }
+    for name, url in product_type.option_assets(data, profile).items():
+        inputs[name] = load_asset_url(url)
+    inputs["logo"] = get_logo_image(profile)
+    return inputs
+
+
+def render_preview(product_type, data: dict, delivery_info: Optional[dict] = None) -> str:
+    """
+    Renderuje podgląd HTML oferty (samodzielny dokument z CSS i zdjęciami jako data URI).
+
+    Args:
+        product_type (str | ProductType): Typ produktu z sekcjami podglądu (preview_sections)
+        data (dict): Konfiguracja w formacie typu
+        delivery_info (dict, optional): Gotowy wynik get_delivery_info; bez niego
+            odległość jest brana z cache geokodowania (albo liczona)
+
+    Returns:
+        str: Dokument HTML
+    """
+    if isinstance(product_type, str):
+        product_type = get_product_type(product_type)
+    if not product_type.preview_sections:
+        raise ValueError(f"Typ produktu {product_type.name} nie ma sekcji podglądu")
+
+    with span("offer_preview", product=product_type.name):
+        data = product_type.canonicalize(data)
+        if delivery_info is None:
+            delivery_info = get_delivery_info(data.get("location", ""))
+        quote = product_type.quote(data, delivery_info["distance_km"])
+        inputs = _preview_inputs(product_type, data, get_pdf_profile(OFFER_PREVIEW_PROFILE))
+        context = offer_context(product_type, data, delivery_info, inputs, datetime.now(), quote)
+        # Bez auto-reload szablony się nie zmieniają - nie ma potrzeby liczyć ich skrótu
+        version = template_version() if TEMPLATES_AUTO_RELOAD else ""
+        sections = "\n\n".join(_render_section(name, context, version) for name in product_type.preview_sections)
+        return (
+            '<!DOCTYPE html>\n<html lang="pl">\n<head>\n<meta charset="UTF-8">\n'
+            f"<style>\n{_stylesheet_text(product_type.template)}\n</style>\n</head>\n"
+            f'<body>\n<div class="container">\n{sections}\n</div>\n</body>\n</html>'
+        )
+
+
+def clear_preview_cache() -> None:
+    with _lock:
+        _section_memo.clear()
+        _data_uris.clear()
+        _stylesheets.clear()
@@ -0,0 +1,103 @@
+"""
+Wspólne elementy stron ofert Streamlit (sauny, domki): wybór profilu PDF,
+wysyłka generowania do kolejki renderowania (render_queue) oraz postęp
+i wynik zadania z przyciskiem pobrania PDF.
+"""
+import json
+
+import streamlit as st
+
+from data.catalog import UnknownProductError
+from offer_engine import delivery_pending
+from pdf_profiles import PDF_PROFILE, PDF_PROFILES
+from render_queue import FAILED, RenderQueueFull, get_render_service
+
+def pdf_profile_select(key):
+    """Wybór profilu PDF (e-mail / druk / podgląd); zwraca nazwę profilu"""
+    names = list(PDF_PROFILES)
+    return st.selectbox(
+        "Profil PDF", names, index=names.index(PDF_PROFILE) if PDF_PROFILE in names else 0,
+        format_func=lambda name: PDF_PROFILES[name].label, key=key,
+    )
+
+def submit_offer_job(session_key, label, fn, *args):
+    """Wysyła generowanie oferty do wspólnej kolejki renderowania; id zadania trafia do session_state"""
+    try:
+        st.session_state[session_key] = get_render_service().submit(label, fn, *args)
+    except RenderQueueFull as e:
+        st.warning(f"⏳ {e}. Spróbuj ponownie za chwilę.")
+
+@st.fragment(run_every=1)
+def _poll_offer_job(job_id):
+    service = get_render_service()
+    job = service.get_job(job_id)
+    if job is None or job.is_finished:
+        st.rerun()
+    
+    position = service.queue_position(job_id)
+    if position:
+        st.info(f"⏳ Oferta czeka w kolejce (pozycja {position})...")
+    else:
+        st.info(f"⏳ {job.stage}... ({job.elapsed_s:.0f} s)")
+
+def show_offer_job(session_key, error_hint, show_summary):
+    """Pokazuje postęp zadania z kolejki renderowania albo jego wynik (podsumowanie: show_summary(data))"""
+    job_id = st.session_state.get(session_key)
+    if not job_id:
+        return
+    
+    job = get_render_service().get_job(job_id)
+    if job is None:
+        del st.session_state[session_key]
+        st.warning("Wygenerowana oferta wygasła - wygeneruj ją ponownie.")
+        return
+    
+    if not job.is_finished:
+        _poll_offer_job(job_id)
+        return
+    
+    if job.status == FAILED:
+        if isinstance(job.error, json.JSONDecodeError):
+            st.error(f"❌ Błąd parsowania odpowiedzi AI: {str(job.error)}")
+            st.write("AI nie zwróciło poprawnego formatu JSON. Spróbuj ponownie z bardziej precyzyjnym opisem.")
+        elif isinstance(job.error, UnknownProductError):
+            st.error(f"❌ {str(job.error)} - oferta nie została wygenerowana.")
+            st.write("Wybierz pozycję z katalogu albo popraw opis tak, aby wskazywał istniejący model i piec.")
+        else:
+            st.error(f"❌ Błąd podczas generowania oferty: {str(job.error)}")
+            if error_hint:
+                st.write(error_hint)
+            st.write(f"Szczegóły błędu: {str(job.error)}")
+        return
+    
+    result = job.result
+    st.success("✅ Oferta PDF została wygenerowana!")
+    # Balony tylko raz - kolejne przebiegi skryptu pokazują już sam wynik
+    if st.session_state.get(f"{session_key}_celebrated") != job_id:
+        st.session_state[f"{session_key}_celebrated"] = job_id
+        st.balloons()
+    
+    show_summary(result["data"])
+    if delivery_pending(result["data"], result.get("delivery_info")):
+        st.warning(f"⚠️ Koszt dostawy w ofercie: do ustalenia. {result['delivery_info']['message']}")
+    if result.get("archive_id"):
+        st.caption(f"🗄️ Zapisano w archiwum ofert jako #{result['archive_id']}")
+    if result.get("profile") in PDF_PROFILES:
+        st.caption(f"📄 Profil PDF: {PDF_PROFILES[result['profile']].label}, {len(result['pdf_bytes']) / 1024:.0f} KB")
+    requested = PDF_PROFILES.get(result.get("requested_profile"))
+    if requested is not None and requested.name != result.get("profile"):
+        # Etykieta profilu mówi, czego w nim brakuje (np. "Podgląd (bez galerii)")
+        st.warning(
+            f"⚠️ Oferta w profilu {requested.label} przekroczyła limit {requested.max_bytes / 1024:.0f} KB - "
+            f"wygenerowano ją w profilu {PDF_PROFILES[result['profile']].label}."
+        )
+    
+    # Przycisk pobierania PDF
+    st.download_button(
+        label="📥 Pobierz PDF",
+        data=result["pdf_bytes"],
+        file_name=result["filename"],
+        mime="application/pdf",
+        type="primary",
+        key=f"{session_key}_download"
+    )
@@ -0,0 +1,152 @@
+"""
+Gotowe strony stałe ofert (fragmenty) - układane przez WeasyPrint raz na
+model, pozycje (np. piec) i profil PDF, a potem doklejane do każdej oferty.
+
+Oferty tego samego modelu różnią się tylko numerem, datą, lokalizacją i
+cenami, a większość czasu renderu zajmuje ułożenie stron ze zdjęciami
+(piec, galeria). Typ produktu z szablonami dynamic_template/static_template
+(ProductType) renderuje więc przy każdej ofercie tylko strony zmienne, a
+strony stałe bierze stąd jako gotowy Document i łączy z nimi
+(Document.copy + write_pdf, patrz render_env.render_pdf).
+
+Klucz fragmentu liczy offer_engine: szablon stron stałych, profil, wartości
+zmiennych, których te strony używają, zawartość plików zdjęć i wersja
+szablonów. Fragmenty są trzymane w pamięci procesu (LRU,
+OFFER_FRAGMENT_CACHE_SIZE); procesy potomne (fork) dziedziczą gotowe strony.
+OFFER_FRAGMENTS_ENABLED=0 wyłącza składanie - oferta jest renderowana w
+całości z ProductType.template.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from metrics import inc, observe, register_collector
+
+OFFER_FRAGMENTS_ENABLED = os.getenv("OFFER_FRAGMENTS_ENABLED", "1") == "1"
+OFFER_FRAGMENT_CACHE_SIZE = int(os.getenv("OFFER_FRAGMENT_CACHE_SIZE", "64"))
+
+
+class Fragment:
+    """Ułożone strony (weasyprint.Document) z blokadą na czas zapisu do PDF."""
+
+    __slots__ = ("document", "lock", "render_s")
+
+    def __init__(self, document, render_s: float):
+        self.document = document
+        # Strony są współdzielone przez wątki renderu - zapis jednego PDF naraz
+        self.lock = threading.Lock()
+        self.render_s = render_s
+
+    @property
+    def pages(self) -> int:
+        return len(self.document.pages)
+
+
+class FragmentCache:
+    """Pamięć LRU fragmentów; równoczesne chybienia tego samego klucza renderują go raz."""
+
+    def __init__(self, max_entries: int = OFFER_FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Fragment]" = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "render_s": 0.0}
+
+    def get(self, key: str, render: Callable[[], object], label: str = "") -> Fragment:
+        """
+        Zwraca fragment spod klucza, renderując go przy pierwszym użyciu.
+
+        Args:
+            key (str): Klucz fragmentu
+            render (Callable[[], Document]): Układa strony fragmentu (render_env.render_document)
+            label (str): Etykieta metryk (np. typ produktu)
+
+        Returns:
+            Fragment: Gotowe strony
+        """
+        fragment = self._lookup(key)
+        if fragment is not None:
+            inc("offer_fragments_total", product=label, result="hit")
+            return fragment
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Inny wątek mógł wyrenderować fragment, gdy czekaliśmy
+            fragment = self._lookup(key)
+            if fragment is not None:
+                inc("offer_fragments_total", product=label, result="hit")
+                return fragment
+
+            try:
+                started = time.perf_counter()
+                fragment = Fragment(render(), time.perf_counter() - started)
+                inc("offer_fragments_total", product=label, result="miss")
+                observe("offer_fragment_render_seconds", fragment.render_s, product=label)
+                with self._lock:
+                    self._stats["misses"] += 1
+                    self._stats["render_s"] += fragment.render_s
+                    self._entries[key] = fragment
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evictions"] += 1
+            finally:
+                # Także po błędzie renderu - inaczej blokada klucza zostaje w _key_locks na zawsze
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return fragment
+
+    def _lookup(self, key: str) -> Optional[Fragment]:
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+            return fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["pages"] = sum(fragment.pages for fragment in self._entries.values())
+        return stats
+
+    def _reset_locks(self) -> None:
+        # Blokady mogły zostać zajęte przez inny wątek w chwili fork
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        for fragment in self._entries.values():
+            fragment.lock = threading.Lock()
+
+
+_cache: Optional[FragmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_fragment_cache() -> FragmentCache:
+    """Zwraca współdzieloną w procesie pamięć fragmentów."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FragmentCache()
+    return _cache
+
+
+def _after_fork():
+    global _cache_lock
+    _cache_lock = threading.Lock()
+    if _cache is not None:
+        _cache._reset_locks()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+register_collector("offer_fragments", lambda: _cache.stats() if _cache is not None else {})
@@ -0,0 +1,102 @@
+"""
+Profile wyjściowe ofert PDF - rozmiar pliku dobrany do tego, gdzie trafia oferta.
+
+Profil ustala rozdzielczość i jakość JPEG pochodnych zdjęć (image_derivatives),
+opcje zapisu WeasyPrint (podzbiór fontów, optymalizacja zdjęć, limit DPI),
+obecność galerii oraz twardy limit rozmiaru pliku:
+
+- email   - domyślny; zdjęcia ~144 DPI, do wysłania klientowi
+- print   - zdjęcia ~300 DPI i hinting fontów, do druku
+- preview - bez galerii, zdjęcia 96 DPI, do szybkiego podglądu
+
+PDF większy niż max_bytes profilu jest liczony w metryce
+offer_pdf_oversize_total i renderowany ponownie w mniejszym profilu (fallback:
+print -> email -> preview); gdy nie ma już mniejszego, oferta kończy się
+błędem PdfTooLargeError. Benchmark (benchmarks/bench_offers.py) kończy się
+kodem 1, gdy któraś oferta nie zmieściła się w swoim profilu.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional, Union
+
+PDF_PROFILE = os.getenv("PDF_PROFILE", "email")
+
+
+class PdfTooLargeError(Exception):
+    """PDF przekracza max_bytes profilu, a profil nie ma mniejszego zastępczego."""
+
+    def __init__(self, message: str, size: int):
+        self.size = size
+        super().__init__(message)
+
+    def __reduce__(self):
+        return type(self), (str(self), self.size)
+
+
+@dataclass(frozen=True)
+class PdfProfile:
+    name: str
+    label: str
+    # Mnożnik rozdzielczości zdjęć względem pikseli CSS (1.0 = 96 DPI)
+    image_scale: float
+    jpeg_quality: int
+    include_gallery: bool
+    max_bytes: int
+    # Opcje write_pdf WeasyPrint: full_fonts=False osadza tylko użyte znaki fontów
+    full_fonts: bool = False
+    hinting: bool = False
+    optimize_images: bool = True
+    # Górny limit rozdzielczości zdjęć w PDF (np. oryginał, gdy pochodnej nie dało się zrobić)
+    dpi: Optional[int] = None
+    # Mniejszy profil dla PDF ponad max_bytes; None - oferta ponad limit jest błędem
+    fallback: Optional[str] = None
+
+    def write_pdf_options(self) -> dict:
+        return {
+            "full_fonts": self.full_fonts,
+            "hinting": self.hinting,
+            "optimize_images": self.optimize_images,
+            "jpeg_quality": self.jpeg_quality,
+            "dpi": self.dpi,
+            "uncompressed_pdf": False,
+        }
+
+
+PDF_PROFILES = {
+    profile.name: profile
+    for profile in (
+        PdfProfile(
+            name="email", label="E-mail (mały plik)",
+            image_scale=1.5, jpeg_quality=72, include_gallery=True, max_bytes=1024 * 1024, dpi=150,
+            fallback="preview",
+        ),
+        PdfProfile(
+            name="print", label="Druk (wysoka rozdzielczość)",
+            image_scale=3.125, jpeg_quality=90, include_gallery=True, max_bytes=8 * 1024 * 1024,
+            hinting=True, dpi=300, fallback="email",
+        ),
+        PdfProfile(
+            name="preview", label="Podgląd (bez galerii)",
+            image_scale=1.0, jpeg_quality=60, include_gallery=False, max_bytes=256 * 1024, dpi=96,
+        ),
+    )
+}
+
+
+def get_pdf_profile(profile: Union[str, PdfProfile, None] = None) -> PdfProfile:
+    """
+    Zwraca profil PDF.
+
+    Args:
+        profile (str | PdfProfile, optional): Nazwa profilu; None = PDF_PROFILE z konfiguracji
+
+    Returns:
+        PdfProfile: Profil
+    """
+    if isinstance(profile, PdfProfile):
+        return profile
+    name = profile or PDF_PROFILE
+    try:
+        return PDF_PROFILES[name]
+    except KeyError:
+        raise KeyError(f"Nieznany profil PDF: {name} (dostępne: {', '.join(PDF_PROFILES)})") from None
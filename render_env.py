@@ -0,0 +1,302 @@
+"""
+Współdzielone w procesie środowisko renderowania ofert.
+
+Szablony Jinja (katalog templates/) są kompilowane raz i trzymane w pamięci
+oraz w cache bajtkodu na dysku, a arkusze CSS i konfiguracja fontów
+WeasyPrint są parsowane osobno w każdym wątku - renderujące równolegle wątki
+(RENDER_WORKERS, pula renderu API) nie współdzielą obiektów Pango/fontconfig,
+które nie są bezpieczne wielowątkowo. Wątki tych pul rozgrzewają się przy
+starcie (warm_up_render_thread), pozostałe - przy pierwszym renderze. W trybie
+OFFER_TEMPLATES_AUTO_RELOAD=1 zmiany w plikach szablonów są widoczne bez
+restartu aplikacji.
+
+render_document daje sam układ stron (Document WeasyPrint) bez zapisu PDF,
+a render_pdf może dokleić do oferty strony takich gotowych dokumentów
+(fragmentów z pdf_fragments) - układane jest wtedy tylko to, co się zmienia.
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import ExitStack
+from typing import FrozenSet, List, Optional, Sequence
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, meta, select_autoescape
+
+from assets import asset_url_fetcher
+from metrics import observe
+
+TEMPLATES_DIR = os.getenv("OFFER_TEMPLATES_DIR", "templates")
+TEMPLATE_BYTECODE_DIR = os.getenv("OFFER_TEMPLATE_BYTECODE_DIR", "cache/jinja")
+TEMPLATES_AUTO_RELOAD = os.getenv("OFFER_TEMPLATES_AUTO_RELOAD", "0") == "1"
+
+# Arkusze stylów dołączane do każdego szablonu oferty
+TEMPLATE_STYLESHEETS = {
+    "sauna_offer.html": ["sauna_offer.css"],
+    "sauna_offer_dynamic.html": ["sauna_offer.css"],
+    "sauna_offer_static.html": ["sauna_offer.css"],
+}
+
+_lock = threading.RLock()
+_environment: Optional[Environment] = None
+# FontConfiguration i sparsowane CSS (związane z nią przez @font-face) - osobno dla każdego wątku
+_thread_state = threading.local()
+# Zwiększane przez reload_templates - wątki odrzucają wtedy swoje arkusze CSS
+_stylesheets_generation = 0
+_template_version = (None, None)
+_template_variables = {}
+_timings = {
+    "renders": 0,
+    "fragment_renders": 0,
+    "cold_render_s": None,
+    "last_render_s": None,
+    "warm_render_total_s": 0.0,
+    "last_template_s": None,
+    "last_layout_s": None,
+}
+
+
+def get_environment() -> Environment:
+    global _environment
+    if _environment is None:
+        with _lock:
+            if _environment is None:
+                os.makedirs(TEMPLATE_BYTECODE_DIR, exist_ok=True)
+                _environment = Environment(
+                    loader=FileSystemLoader(TEMPLATES_DIR),
+                    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_BYTECODE_DIR),
+                    autoescape=select_autoescape(["html"]),
+                    auto_reload=TEMPLATES_AUTO_RELOAD,
+                    cache_size=-1,
+                )
+    return _environment
+
+
+def get_font_config():
+    """Konfiguracja fontów WeasyPrint bieżącego wątku."""
+    font_config = getattr(_thread_state, "font_config", None)
+    if font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        font_config = _thread_state.font_config = FontConfiguration()
+    return font_config
+
+
+def _thread_stylesheets() -> dict:
+    if getattr(_thread_state, "generation", None) != _stylesheets_generation:
+        _thread_state.stylesheets = {}
+        _thread_state.generation = _stylesheets_generation
+    return _thread_state.stylesheets
+
+
+def get_stylesheets(template_name: str) -> List:
+    """Sparsowane arkusze CSS dla szablonu w bieżącym wątku (przy auto-reload - odświeżane po mtime)."""
+    from weasyprint import CSS
+
+    cache = _thread_stylesheets()
+    stylesheets = []
+    for filename in TEMPLATE_STYLESHEETS.get(template_name, []):
+        path = os.path.join(TEMPLATES_DIR, filename)
+        mtime = os.path.getmtime(path) if TEMPLATES_AUTO_RELOAD else None
+        cached = cache.get(filename)
+        if cached is None or (TEMPLATES_AUTO_RELOAD and cached[0] != mtime):
+            cached = (mtime, CSS(filename=path, font_config=get_font_config()))
+            cache[filename] = cached
+        stylesheets.append(cached[1])
+    return stylesheets
+
+
+def template_version() -> str:
+    """Skrót zawartości wszystkich plików szablonów (liczony ponownie tylko po zmianie mtime)."""
+    global _template_version
+    files = []
+    for root, _, names in os.walk(TEMPLATES_DIR):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files.append((path, os.stat(path).st_mtime_ns))
+    files.sort()
+
+    signature, version = _template_version
+    if signature != files:
+        digest = hashlib.sha256()
+        for path, _ in files:
+            digest.update(path.encode("utf-8"))
+            with open(path, "rb") as template_file:
+                digest.update(template_file.read())
+        version = digest.hexdigest()
+        _template_version = (files, version)
+    return version
+
+
+def render_html(template_name: str, **context) -> str:
+    return get_environment().get_template(template_name).render(**context)
+
+
+def template_variables(template_name: str) -> FrozenSet[str]:
+    """
+    Zmienne kontekstu używane przez szablon razem z dołączanymi (include/extends)
+    - wyznaczane raz z kodu szablonów (przy auto-reload - raz na ich wersję).
+    """
+    version = template_version() if TEMPLATES_AUTO_RELOAD else ""
+    variables = _template_variables.get((template_name, version))
+    if variables is None:
+        environment = get_environment()
+        found, pending, seen = set(), [template_name], set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            tree = environment.parse(environment.loader.get_source(environment, name)[0])
+            found |= meta.find_undeclared_variables(tree)
+            pending.extend(child for child in meta.find_referenced_templates(tree) if child)
+        variables = frozenset(found)
+        _template_variables[(template_name, version)] = variables
+    return variables
+
+
+def _layout(template_name: str, pdf_options: Optional[dict], context: dict):
+    from weasyprint import HTML
+
+    started = time.perf_counter()
+    html = render_html(template_name, **context)
+    template_done = time.perf_counter()
+    # Opcje zdjęć (jakość JPEG, DPI) WeasyPrint stosuje już przy układaniu stron
+    document = HTML(string=html, url_fetcher=asset_url_fetcher).render(
+        stylesheets=get_stylesheets(template_name),
+        font_config=get_font_config(),
+        **(pdf_options or {}),
+    )
+    finished = time.perf_counter()
+
+    observe("render_template_seconds", template_done - started, template=template_name)
+    observe("render_layout_seconds", finished - template_done, template=template_name)
+    return document, template_done - started, finished - template_done
+
+
+def render_document(template_name: str, pdf_options: Optional[dict] = None, **context):
+    """
+    Renderuje szablon do układu stron WeasyPrint (Document), bez zapisu PDF.
+
+    Returns:
+        weasyprint.Document: Strony do zapisania lub doklejenia do innej oferty (render_pdf)
+    """
+    return _layout(template_name, pdf_options, context)[0]
+
+
+def render_pdf(template_name: str, pdf_options: Optional[dict] = None, fragments: Sequence = (), **context) -> bytes:
+    """
+    Renderuje szablon do PDF, korzystając z gotowych szablonów, CSS i fontów.
+    pdf_options to dodatkowe opcje write_pdf (np. z PdfProfile.write_pdf_options).
+
+    fragments to gotowe fragmenty (pdf_fragments.Fragment: document i lock),
+    których strony trafiają na koniec PDF. Fragment jest blokowany na czas
+    zapisu - jego strony są współdzielone przez wątki renderujące.
+    """
+    document, template_s, layout_s = _layout(template_name, pdf_options, context)
+
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        pages = list(document.pages)
+        for fragment in sorted(fragments, key=id):
+            stack.enter_context(fragment.lock)
+        for fragment in fragments:
+            pages.extend(fragment.document.pages)
+        if fragments:
+            document = document.copy(pages)
+        pdf_bytes = document.write_pdf(**(pdf_options or {}))
+    write_s = time.perf_counter() - started
+
+    _record_render(template_s, layout_s + write_s, fragment=bool(fragments))
+    observe("render_write_seconds", write_s, template=template_name)
+    return pdf_bytes
+
+
+def _record_render(template_s: float, layout_s: float, fragment: bool = False) -> None:
+    total = template_s + layout_s
+    with _lock:
+        if fragment:
+            _timings["fragment_renders"] += 1
+        if _timings["renders"] == 0:
+            _timings["cold_render_s"] = total
+        else:
+            _timings["warm_render_total_s"] += total
+        _timings["renders"] += 1
+        _timings["last_render_s"] = total
+        _timings["last_template_s"] = template_s
+        _timings["last_layout_s"] = layout_s
+
+
+def render_timings() -> dict:
+    """Czas pierwszego (zimnego) renderu oraz średnia kolejnych (ciepłych)."""
+    with _lock:
+        timings = dict(_timings)
+    warm_renders = timings["renders"] - 1
+    timings["warm_render_avg_s"] = timings.pop("warm_render_total_s") / warm_renders if warm_renders > 0 else None
+    return timings
+
+
+def compile_templates() -> None:
+    """Kompiluje wszystkie szablony - wspólne dla wątków procesu (i procesów potomnych po fork)."""
+    environment = get_environment()
+    for template_name in environment.list_templates(extensions=["html"]):
+        environment.get_template(template_name)
+
+
+def warm_up(render_sample: bool = True) -> float:
+    """
+    Kompiluje wszystkie szablony oraz parsuje CSS i fonty - te tylko w wątku
+    wywołującym; wątki pul renderu rozgrzewa warm_up_render_thread. Opcjonalnie
+    renderuje pusty dokument, żeby rozgrzać WeasyPrint przed pierwszą ofertą.
+
+    Returns:
+        float: Czas rozgrzewania w sekundach
+    """
+    started = time.perf_counter()
+    compile_templates()
+    for template_name in TEMPLATE_STYLESHEETS:
+        get_stylesheets(template_name)
+
+    if render_sample:
+        from weasyprint import HTML
+        HTML(string="<p>Wooden Spa</p>").write_pdf(font_config=get_font_config())
+    return time.perf_counter() - started
+
+
+def warm_up_render_thread() -> None:
+    """
+    Initializer puli wątków renderu (ThreadPoolExecutor): rozgrzewa fonty i CSS
+    nowego wątku. Błąd jest tylko wypisywany - wyjątek w initializerze
+    unieruchomiłby całą pulę.
+    """
+    try:
+        warm_up()
+    except (ImportError, OSError):
+        # Bez WeasyPrint nie ma czego rozgrzewać - brak bibliotek zgłosi pierwsza oferta
+        pass
+    except Exception as e:
+        print(f"Nie udało się rozgrzać wątku renderu: {e}")
+
+
+def start_render_threads(executor, count: int) -> None:
+    """
+    Uruchamia od razu wątki puli - ThreadPoolExecutor tworzy je dopiero przy
+    zadaniach, więc initializer rozgrzewałby wątek w trakcie pierwszej oferty.
+    """
+    # Każdy wątek jest zajęty initializerem, więc kolejne puste zadanie tworzy następny
+    for _ in range(count):
+        executor.submit(_noop)
+
+
+def _noop() -> None:
+    pass
+
+
+def reload_templates() -> None:
+    """Wymusza ponowne wczytanie szablonów i arkuszy CSS (tryb deweloperski)."""
+    global _stylesheets_generation
+    environment = get_environment()
+    with _lock:
+        environment.cache.clear()
+        environment.bytecode_cache.clear()
+        _stylesheets_generation += 1
+        _template_variables.clear()
@@ -0,0 +1,154 @@
+"""
+Kolejka renderowania ofert działająca w tle, niezależnie od wątku skryptu Streamlit.
+
+Ograniczona pula wątków wykonuje zadania (analiza opisu, geokodowanie, render PDF),
+a interfejs jedynie odpytuje status zadania po jego identyfikatorze. Gdy w kolejce
+jest już RENDER_QUEUE_SIZE zadań, kolejne są odrzucane (RenderQueueFull).
+Gotowe wyniki są przechowywane przez RENDER_RESULT_TTL sekund.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from metrics import observe, register_collector
+from render_env import start_render_threads, warm_up_render_thread
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "8"))
+RENDER_RESULT_TTL = float(os.getenv("RENDER_RESULT_TTL", "900"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "error"
+
+
+class RenderQueueFull(Exception):
+    """Kolejka renderowania jest pełna - spróbuj ponownie za chwilę."""
+
+
+@dataclass
+class RenderJob:
+    id: str
+    label: str
+    status: str = QUEUED
+    stage: str = "W kolejce"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished_at or time.time()) - self.submitted_at
+
+
+class RenderService:
+    """Ograniczona pula wątków z kolejką zadań, statusem i krótkotrwałym magazynem wyników."""
+
+    def __init__(self, max_workers: int, max_pending: int, result_ttl: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        # Fonty i CSS WeasyPrint są osobne dla każdego wątku - każdy rozgrzewa własne
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="offer-render", initializer=warm_up_render_thread
+        )
+        self._jobs: Dict[str, RenderJob] = {}
+        self._lock = threading.Lock()
+
+    def start_workers(self) -> None:
+        """Uruchamia i rozgrzewa wątki renderu przed pierwszym zadaniem."""
+        start_render_threads(self._executor, self.max_workers)
+
+    def _pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.is_finished)
+
+    def submit(self, label: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Dodaje zadanie do kolejki.
+
+        Funkcja dostaje jako pierwszy argument callback report(stage), którym
+        może zgłaszać postęp, np. report("Generowanie PDF").
+
+        Raises:
+            RenderQueueFull: gdy liczba oczekujących i trwających zadań osiągnęła limit
+        """
+        self._purge_expired()
+        with self._lock:
+            if self._pending_count() >= self.max_pending:
+                raise RenderQueueFull(f"W kolejce jest już {self.max_pending} ofert do wygenerowania")
+            job = RenderJob(id=uuid.uuid4().hex, label=label)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: RenderJob, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        def report(stage: str) -> None:
+            job.stage = stage
+
+        job.status, job.stage, job.started_at = RUNNING, "Rozpoczęto", time.time()
+        observe("render_queue_wait_seconds", job.started_at - job.submitted_at)
+        try:
+            job.result = fn(report, *args, **kwargs)
+            job.status, job.stage = DONE, "Gotowe"
+        except Exception as e:
+            job.error = e
+            job.status, job.stage = FAILED, "Błąd"
+        finally:
+            job.finished_at = time.time()
+
+    def get_job(self, job_id: str) -> Optional[RenderJob]:
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> int:
+        """Liczba zadań oczekujących przed danym zadaniem (0 - jest renderowane)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return 0
+            return sum(
+                1 for other in self._jobs.values()
+                if other.status == QUEUED and other.submitted_at < job.submitted_at
+            ) + 1
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.is_finished and now - job.finished_at > self.result_ttl
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+
+_service: Optional[RenderService] = None
+_service_lock = threading.Lock()
+
+
+def get_render_service() -> RenderService:
+    """Zwraca współdzieloną w procesie usługę renderowania."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RenderService(RENDER_WORKERS, RENDER_QUEUE_SIZE, RENDER_RESULT_TTL)
+    return _service
+
+
+register_collector("render_queue", lambda: _service.stats() if _service is not None else {})
@@ -0,0 +1,76 @@
+"""
+Analiza swobodnego opisu sauny (tekst, dyktowanie) do konfiguracji oferty.
+
+Opisy z dokładnymi nazwami z katalogu rozpoznaje parser lokalny
+(text_parser), resztę analizuje model językowy z promptem zbudowanym z
+katalogu (llm_cache - odpowiedzi zapamiętywane). Wspólne dla strony Sauny
+i API (api_server.py).
+"""
+from typing import Tuple
+
+from data.catalog import get_catalog
+from metrics import inc, span
+from sauny.llm_cache import get_llm
+from sauny.text_parser import parse_sauna_description
+
+SYSTEM_PROMPT_TEMPLATE = """Od teraz twoim zadaniem jest poukladanie calego tekstu i zwrocenie go w odpowiednim formacie JSON: 
+
+                    Przyklad:
+                    {{
+                        "type": "{example_type}",
+                        "model": "{example_model}",
+                        "location": "Warszawa",
+                        "custom_delivery": "1000",
+                        "furnace": "{example_furnace}",
+                        "paint": "1"
+                    }}
+                    
+                    Do indentyfikacji modelu typu rodzaju pieca skorzystaj z tych danych:
+                    type:
+{types}
+
+                    model:
+{models}
+
+
+                    furnace:
+{furnaces}
+                    """
+
+_system_prompts = {}
+
+
+def system_prompt():
+    """Prompt dla LLM z listami typów, modeli i pieców z katalogu (budowany raz na wersję katalogu)"""
+    catalog = get_catalog()
+    prompt = _system_prompts.get(catalog.version)
+    if prompt is None:
+        listing = lambda names: "\n".join(f'                    "{name}"' for name in names)
+        prompt = SYSTEM_PROMPT_TEMPLATE.format(
+            example_type=catalog.models[0].type,
+            example_model=catalog.models[0].name,
+            example_furnace=catalog.furnaces[0].name,
+            types=listing(catalog.types),
+            models=listing(catalog.model_names),
+            furnaces=listing(catalog.furnace_names),
+        )
+        _system_prompts[catalog.version] = prompt
+    return prompt
+
+
+def llm_parse_configuration(sauna_configuration):
+    # Odpowiedzi (tylko poprawne JSON) są zapamiętywane - powtórzony opis nie idzie do OpenAI
+    return get_llm().parse_json(system_prompt(), sauna_configuration)
+
+
+def parse_description(sauna_configuration: str) -> Tuple[dict, str]:
+    """
+    Konfiguracja sauny z opisu.
+
+    Returns:
+        Tuple[dict, str]: Dane w formacie generate_sauna_offer oraz ścieżka ("local" albo "llm")
+    """
+    with span("description_parse"):
+        sauna_data, parse_path = parse_sauna_description(sauna_configuration, llm_parse_configuration)
+    inc("description_parse_total", path=parse_path)
+    return sauna_data, parse_path
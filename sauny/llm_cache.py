@@ -0,0 +1,153 @@
+"""
+Warstwa cache dla zapytań do modelu językowego analizującego opisy saun.
+
+Odpowiedzi są zapisywane w SQLite (TTL + wypieranie LRU) pod kluczem
+złożonym ze znormalizowanego opisu, nazwy modelu i skrótu promptu
+systemowego - ale tylko te, które dały się sparsować do JSON. Sam model
+jest schowany za interfejsem LLMBackend, więc testy i maszyny bez sieci
+mogą użyć lokalnego StubBackend (LLM_BACKEND=stub).
+"""
+import abc
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from data.normalize import fold_text
+from data.sqlite_cache import SqliteTTLCache
+from metrics import register_collector, span
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-5-nano-2025-08-07")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm.sqlite3")
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+class LLMBackend(abc.ABC):
+    """Interfejs modelu: zwraca surowy tekst odpowiedzi na (prompt systemowy, opis)."""
+
+    model = "unknown"
+
+    @abc.abstractmethod
+    def complete(self, system_prompt: str, user_text: str) -> str:
+        """Surowy tekst odpowiedzi modelu (oczekiwany obiekt JSON)"""
+
+
+class OpenAIBackend(LLMBackend):
+    def __init__(self, model: str = LLM_MODEL, api_key: Optional[str] = None):
+        from openai import OpenAI
+
+        self.model = model
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    def complete(self, system_prompt: str, user_text: str) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_text}
+            ]
+        )
+        return response.choices[0].message.content
+
+
+class StubBackend(LLMBackend):
+    """Lokalny zamiennik modelu (bez sieci) - odpowiada wynikiem parsera lokalnego."""
+
+    model = "local-stub"
+
+    def complete(self, system_prompt: str, user_text: str) -> str:
+        from sauny.text_parser import parse_configuration
+
+        sauna_data, _ = parse_configuration(user_text)
+        return json.dumps(sauna_data, ensure_ascii=False)
+
+
+class CachedLLM:
+    """Backend LLM z trwałym cache poprawnych (JSON) odpowiedzi i licznikami."""
+
+    def __init__(self, backend: LLMBackend, cache: SqliteTTLCache):
+        self.backend = backend
+        self.cache = cache
+        self.latency_saved_s = 0.0
+        self.backend_calls = 0
+        self.backend_latency_s = 0.0
+        self._lock = threading.Lock()
+
+    def cache_key(self, system_prompt: str, user_text: str) -> str:
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        normalized = fold_text(user_text)
+        return hashlib.sha256(f"{self.backend.model}\0{prompt_hash}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def parse_json(self, system_prompt: str, user_text: str) -> dict:
+        """
+        Zwraca odpowiedź modelu sparsowaną do słownika.
+
+        Raises:
+            json.JSONDecodeError: gdy model nie zwrócił poprawnego JSON albo JSON nie jest
+                obiektem, np. listą lub tekstem (nic nie jest zapisywane)
+        """
+        key = self.cache_key(system_prompt, user_text)
+        found, entry = self.cache.get(key)
+        if found and entry:
+            with self._lock:
+                self.latency_saved_s += entry["latency_s"]
+            return entry["response"]
+
+        started = time.perf_counter()
+        with span("llm_request", backend=type(self.backend).__name__):
+            raw_response = self.backend.complete(system_prompt, user_text)
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.backend_calls += 1
+            self.backend_latency_s += latency
+
+        parsed = json.loads(raw_response)
+        if not isinstance(parsed, dict):
+            # Wywołujący oczekują słownika (.get) - obsługa jak przy niepoprawnym JSON
+            raise json.JSONDecodeError(f"Oczekiwano obiektu JSON, jest {type(parsed).__name__}", raw_response, 0)
+        self.cache.set(key, {"response": parsed, "latency_s": latency})
+        return parsed
+
+    def stats(self) -> dict:
+        cache_stats = self.cache.stats()
+        with self._lock:
+            cache_stats.update(
+                backend=type(self.backend).__name__,
+                model=self.backend.model,
+                backend_calls=self.backend_calls,
+                avg_backend_latency_s=round(self.backend_latency_s / self.backend_calls, 3) if self.backend_calls else None,
+                latency_saved_s=round(self.latency_saved_s, 3),
+            )
+        return cache_stats
+
+
+_BACKENDS = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+_llm: Optional[CachedLLM] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm() -> CachedLLM:
+    """Zwraca współdzielony w procesie model (wg LLM_BACKEND) z cache odpowiedzi."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                cache = SqliteTTLCache(
+                    LLM_CACHE_PATH,
+                    table="llm_responses",
+                    ttl_seconds=LLM_CACHE_TTL_DAYS * 86400,
+                    max_entries=LLM_CACHE_MAX_ENTRIES,
+                )
+                _llm = CachedLLM(_BACKENDS[LLM_BACKEND](), cache)
+    return _llm
+
+
+register_collector("llm_cache", lambda: _llm.stats() if _llm is not None else {})
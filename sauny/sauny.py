@@ -1,141 +1,95 @@
 import streamlit as st 
-from pdf_template import generate_sauna_offer, get_pdf_filename
-from openai import OpenAI
+from data.catalog import get_catalog
+from pdf_template import generate_sauna_offer_details, get_pdf_filename
+from offer_archive import archive_offer
+from offer_ui import pdf_profile_select, show_offer_job, submit_offer_job
+from sauny.description import parse_description
+from metrics import span
 from dotenv import load_dotenv
-import os
-import json
+import time
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def _render_offer(report, sauna_data, input_text="", source="lista", profile=None):
+    report("Generowanie PDF")
+    offer = generate_sauna_offer_details(sauna_data, profile=profile)
+    # Archiwum pozwala odtworzyć ofertę z tymi samymi cenami i odległością, gdy klient oddzwoni
+    archive_id = archive_offer(offer, input_text=input_text, source=source)
+    return {
+        "data": offer["data"],
+        "pdf_bytes": offer["pdf_bytes"],
+        "profile": offer["profile"],
+        "requested_profile": offer["requested_profile"],
+        "delivery_info": offer["delivery_info"],
+        "filename": get_pdf_filename(offer["data"]),
+        "archive_id": archive_id,
+    }
+
+def _parse_and_render_offer(report, sauna_configuration, profile=None):
+    report("Analiza opisu")
+    sauna_data, _ = parse_description(sauna_configuration)
+    return _render_offer(report, sauna_data, input_text=sauna_configuration, source="opis", profile=profile)
+
+def _show_offer_summary(sauna_data):
+    st.subheader("📋 Podsumowanie oferty:")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write(f"**Typ:** {sauna_data.get('type', 'Nieznany')}")
+        st.write(f"**Model:** {sauna_data.get('model', 'Nieznany')}")
+        st.write(f"**Lokalizacja:** {sauna_data.get('location') or 'Do uzgodnienia'}")
+    
+    with col2:
+        st.write(f"**Piec:** {sauna_data.get('furnace', 'Nieznany')}")
+        paint = str(sauna_data.get('paint') or "")
+        if paint:
+            st.write(f"**Malowanie:** {paint}x krotne" if paint.isdigit() else f"**Malowanie:** {paint}")
+        if sauna_data.get('custom_delivery'):
+            st.write(f"**Dodatkowy rozładunek:** {sauna_data.get('custom_delivery')}")
+
+def _show_offer_preview(sauna_data, delivery_info):
+    """Podgląd HTML oferty bez WeasyPrint (tylko zmienione sekcje renderowane od nowa)"""
+    import streamlit.components.v1 as components
+    from offer_preview import render_preview
+
+    try:
+        started = time.perf_counter()
+        html = render_preview("sauna", sauna_data, delivery_info)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        st.error(f"Nie można przygotować podglądu: {e}")
+        return
+    components.html(html, height=900, scrolling=True)
+    st.caption(f"⚡ Podgląd przygotowany w {elapsed_ms:.0f} ms")
 
 def sauny_config_text():
     st.subheader("Konfiguracja")
     sauna_configuration = st.text_area("Konfiguracja sauny", value="", height=300, placeholder="Opisz saunę słowami, np: 'Chcę saunę Ankel Medium Open 2,4m z piecem elektrycznym NARVI, dostawa do Warszawy, malowanie 2x krotne'")
+    profile = pdf_profile_select("text_pdf_profile")
     
     if st.button("Generuj ofertę PDF", key="text_pdf_button"):
         if not sauna_configuration.strip():
             st.error("Proszę wpisać opis konfiguracji sauny")
             return
-            
-        try:
-            response = client.chat.completions.create(
-                model="gpt-5-nano-2025-08-07",
-                messages=[
-                    {"role": "system", "content": """Od teraz twoim zadaniem jest poukladanie calego tekstu i zwrocenie go w odpowiednim formacie JSON: 
-
-                    Przyklad:
-                    {
-                        "type": "Ankel",
-                        "model": "Ankel Mini 1,8m",
-                        "location": "Warszawa",
-                        "custom_delivery": "1000",
-                        "furnace": "Piec Harvia z kominem i kamieniami. Spalinowy, ładowany od wewnątrz",
-                        "paint": "1"
-                    }
-                    
-                    Do indentyfikacji modelu typu rodzaju pieca skorzystaj z tych danych:
-                    type:
-                    "Ankel"
-                    "Toone"
-
-                    model:
-                    "Ankel Mini 1,8m"
-                    "Ankel Medium Open 2,4m"
-                    "Ankel Medium Close 2,4m"
-                    "Ankel Large 3,0m"
-                    "Ankel XL 3,6m"
-                    "Toone Mini 1,8m"
-                    "Toone 2,4 Open"
-                    "Toone 2,4 Close"
-                    "Toone 3,0 Close"
-                    "Toone 3,6 Close"
-                    "Toone 3,6 Open"
-
-
-                    furnace:
-                    "Piec Harvia z kominem i kamieniami. Spalinowy, ładowany od wewnątrz"
-                    "Piec do sauny opalany drewnem - STOVEMAN 13-LS z kominem i kamieniami – ładowany od zewnątrz"
-                    "Piec elektryczny NARVI 9 kW"
-                    """},
-                    {"role": "user", "content": sauna_configuration}
-                ]
-            )
-            
-            # Parsuj odpowiedź z OpenAI
-            sauna_data = json.loads(response.choices[0].message.content)
-            
-            # Wyświetl sparsowane dane
-            st.success("✅ Konfiguracja została rozpoznana!")
-            
-            # Generuj PDF z sparsowanymi danymi
-            pdf_bytes = generate_sauna_offer(sauna_data)
-            filename = get_pdf_filename(sauna_data)
-            
-            st.success("✅ Oferta PDF została wygenerowana!")
-            st.balloons()
-            
-            # Wyświetl podsumowanie oferty
-            st.subheader("📋 Podsumowanie oferty:")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write(f"**Typ:** {sauna_data.get('type', 'Nieznany')}")
-                st.write(f"**Model:** {sauna_data.get('model', 'Nieznany')}")
-                st.write(f"**Lokalizacja:** {sauna_data.get('location', 'Do uzgodnienia')}")
-            
-            with col2:
-                st.write(f"**Piec:** {sauna_data.get('furnace', 'Nieznany')}")
-                if sauna_data.get('paint'):
-                    st.write(f"**Malowanie:** {sauna_data.get('paint')}x krotne")
-                if sauna_data.get('custom_delivery'):
-                    st.write(f"**Dodatkowy rozładunek:** {sauna_data.get('custom_delivery')}")
-            
-            # Przycisk pobierania PDF
-            st.download_button(
-                label="📥 Pobierz PDF",
-                data=pdf_bytes,
-                file_name=filename,
-                mime="application/pdf",
-                type="primary"
-            )
-            
-        except json.JSONDecodeError as e:
-            st.error(f"❌ Błąd parsowania odpowiedzi AI: {str(e)}")
-            st.write("AI nie zwróciło poprawnego formatu JSON. Spróbuj ponownie z bardziej precyzyjnym opisem.")
-        except Exception as e:
-            st.error(f"❌ Błąd podczas generowania oferty: {str(e)}")
-            st.write(f"Szczegóły błędu: {str(e)}")
+        submit_offer_job("text_offer_job", "Oferta z opisu", _parse_and_render_offer, sauna_configuration, profile)
+    
+    show_offer_job("text_offer_job", None, _show_offer_summary)
 
 
 def sauny_config():
     st.subheader("Konfiguracja")
-    type = st.selectbox("Typ sauny", ["Ankel", "Toone"], index=0)
-
-    if type == "Ankel":
-        model = st.radio("Wybierz model Ankel:", [
-            "Ankel Mini 1,8m",
-            "Ankel Medium Open 2,4m", 
-            "Ankel Medium Close 2,4m",
-            "Ankel Large 3,0m",
-            "Ankel XL 3,6m"
-        ])
-    elif type == "Toone":
-        model = st.radio("Wybierz model Toone:", [
-            "Toone Mini 1,8m",
-            "Toone 2,4 Open",
-            "Toone 2,4 Close", 
-            "Toone 3,0 Close",
-            "Toone 3,6 Close",
-            "Toone 3,6 Open"
-        ])
+    catalog = get_catalog()
+    type = st.selectbox("Typ sauny", catalog.types, index=0)
+    model = st.radio(f"Wybierz model {type}:", catalog.models_by_type[type])
     
     location = st.text_input("Lokalizacja dostawy", value="", placeholder="Warszawa")
     
+    delivery_info = None
     if location:
         try:
             from data.prices import get_delivery_info
-            delivery_info = get_delivery_info(location)
+            with span("delivery_preview"):
+                delivery_info = get_delivery_info(location)
             
             if delivery_info["distance_km"] > 0:
                 col1, col2 = st.columns(2)
@@ -143,63 +97,34 @@ def sauny_config():
                     st.info(f"📏 Odległość: **{delivery_info['distance_km']} km**")
                 with col2:
                     st.warning(f"🚚 Koszt dostawy: **{delivery_info['delivery_cost']} zł**")
+            else:
+                st.warning(f"⚠️ {delivery_info['message']} - koszt dostawy do ustalenia")
         except Exception as e:
             st.error(f"Nie można obliczyć odległości: {e}")
 
     custom_delivery = st.text_input("Niestandardowy rozładunek", value="", placeholder="1000zł")
 
-    furnace = st.radio("Wybierz piec", [
-        "Piec Harvia z kominem i kamieniami. Spalinowy, ładowany od wewnątrz", 
-        "Piec do sauny opalany drewnem - STOVEMAN 13-LS z kominem i kamieniami – ładowany od zewnątrz", 
-        "Piec elektryczny NARVI 9 kW"
-        ])
+    furnace = st.radio("Wybierz piec", catalog.furnace_names)
     
     paint = st.text_input("Malowanie", value="", placeholder="1x krotne")
 
+    profile = pdf_profile_select("checklist_pdf_profile")
+
+    sauna_data = {
+        "type": type,
+        "model": model,
+        "location": location,
+        "custom_delivery": custom_delivery,
+        "furnace": furnace,
+        "paint": paint
+    }
+    if st.toggle("Podgląd na żywo", value=False, help="Oferta w HTML odświeżana przy każdej zmianie - PDF powstaje dopiero po kliknięciu Generuj"):
+        _show_offer_preview(sauna_data, delivery_info)
+
     if st.button("Generuj ofertę PDF"):
-        sauna_data = {
-            "type": type,
-            "model": model,
-            "location": location,
-            "custom_delivery": custom_delivery,
-            "furnace": furnace,
-            "paint": paint
-        }
-        
-        try:
-            pdf_bytes = generate_sauna_offer(sauna_data)
-            filename = get_pdf_filename(sauna_data)
-            
-            st.success("✅ Oferta PDF została wygenerowana!")
-            st.balloons()
-            
-            st.subheader("📋 Podsumowanie oferty:")
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write(f"**Typ:** {type}")
-                st.write(f"**Model:** {model}")
-                st.write(f"**Lokalizacja:** {location or 'Do uzgodnienia'}")
-            
-            with col2:
-                st.write(f"**Piec:** {furnace}")
-                if paint:
-                    st.write(f"**Malowanie:** {paint}")
-                if custom_delivery:
-                    st.write(f"**Dodatkowy rozładunek:** {custom_delivery}")
-            
-            st.download_button(
-                label="📥 Pobierz PDF",
-                data=pdf_bytes,
-                file_name=filename,
-                mime="application/pdf",
-                type="primary"
-            )
-            
-        except Exception as e:
-            st.error(f"❌ Błąd podczas generowania PDF: {str(e)}")
-            st.write("Sprawdź czy wszystkie wymagane biblioteki są zainstalowane.")
-            st.write(f"Szczegóły błędu: {str(e)}")
+        submit_offer_job("checklist_offer_job", f"Oferta {model}", _render_offer, sauna_data, "", "lista", profile)
+    
+    show_offer_job("checklist_offer_job", "Sprawdź czy wszystkie wymagane biblioteki są zainstalowane.", _show_offer_summary)
     
     return {
         "type": type,
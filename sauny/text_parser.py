@@ -0,0 +1,244 @@
+"""
+Lokalny, deterministyczny parser opisów konfiguracji sauny.
+
+Rozpoznaje model i piec po nazwach z katalogu (data/catalog.json) (bez polskich znaków,
+z tolerancją na odmianę i literówki), a krotność malowania, rozładunek
+i lokalizację - wzorcami. Zwraca ten sam JSON co model językowy oraz
+pewność wyniku; dopiero gdy jest ona poniżej LOCAL_PARSER_THRESHOLD,
+opis trafia do LLM.
+"""
+import difflib
+import os
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from data.gazetteer import get_gazetteer
+from data.normalize import fold_text
+from data.catalog import get_catalog
+from metrics import register_collector
+
+LOCAL_PARSER_THRESHOLD = float(os.getenv("LOCAL_PARSER_THRESHOLD", "0.8"))
+# Mnożnik pewności, gdy podanej lokalizacji nie ma w spisie miejscowości - opis trafia wtedy do LLM
+UNRESOLVED_LOCATION_CONFIDENCE = 0.5
+
+# Słowa rozmiaru i długości sauny oznaczają to samo ("Ankel Mini" = "1,8m")
+_SIZE_EQUIVALENTS = {"mini": "1.8", "medium": "2.4", "large": "3.0", "xl": "3.6"}
+_SIZE_EQUIVALENTS.update({length: word for word, length in _SIZE_EQUIVALENTS.items()})
+_SYNONYMS = {
+    "tonne": "toone", "tone": "toone", "closed": "close", "zamkn": "close",
+    "otwar": "open", "dluga": "large", "srednia": "medium", "mala": "mini",
+}
+# Słowa, które nie odróżniają pozycji katalogu od siebie
+_STOPWORDS = {"do", "od", "na", "ze", "dla", "lub", "oraz", "sauna", "sauny", "saune", "piec", "piece"}
+_PAINT_WORDS = {"jedno": 1, "dwu": 2, "trzy": 3, "cztero": 4}
+_STEM_LENGTH = 5
+
+_TOKEN_RE = re.compile(r"\d+[.,]\d+|[a-z]+|\d+")
+_PAINT_RE = re.compile(r"malowan\w*\D{0,15}?(\d+)\s*x|(\d+)\s*x\s*(?:krotn\w*\s*)?malowan|(\w+)krotn\w*\s*malowan|malowan\w*\s*(\w+)krotn")
+_UNLOADING_RE = re.compile(r"(?:rozladun\w*|hds)\D{0,25}?(\d[\d\s]*\d|\d)\s*(?:zl|pln)?")
+# Przyimek tylko jako osobne słowo - inaczej "dostawa Warszawa" dałoby "arszawa"
+_LOCATION_RE = re.compile(
+    r"(?:dostaw\w*|lokalizacj\w*|transport\w*|adres\w*)\s*(?:[:\-]|(?:do|w|na)\s+)?\s*"
+    r"(?:miejscowos\w*\s*)?:?\s*([^\n;]+)"
+)
+# Koniec zdania w lokalizacji - kropka, ale nie po skrócie ("ul. Gdańska 5")
+_SENTENCE_END_RE = re.compile(r"(?<!\bul)(?<!\bal)(?<!\bos)(?<!\bpl)(?<!\bnr)\.(?:\s|$)")
+_KEYWORD_STEMS = ("piec", "malow", "rozla", "hds", "sauna", "saun")
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _stem(token: str) -> str:
+    token = _SYNONYMS.get(token, token)
+    stem = token[:_STEM_LENGTH] if len(token) > _STEM_LENGTH else token
+    return _SYNONYMS.get(stem, stem)
+
+
+def _tokens(text: str) -> Set[str]:
+    tokens = set()
+    for token in _TOKEN_RE.findall(fold_text(text)):
+        token = token.replace(",", ".")
+        if len(token) == 1 and not token.isdigit():
+            continue
+        stem = _stem(token)
+        if stem not in _STOPWORDS:
+            tokens.add(stem)
+    return tokens | {_SIZE_EQUIVALENTS[token] for token in tokens if token in _SIZE_EQUIVALENTS}
+
+
+def _fuzzy_tokens(text_tokens: Set[str], vocabulary: Set[str]) -> Set[str]:
+    """Dopasowuje literówki ("ankle" -> "ankel") do słownictwa katalogu."""
+    matched = set(text_tokens & vocabulary)
+    for token in text_tokens - vocabulary:
+        if len(token) >= 4 and not token[0].isdigit():
+            matched.update(difflib.get_close_matches(token, vocabulary, n=1, cutoff=0.8))
+    return matched
+
+
+def _best_match(scores: Dict[str, float]) -> Tuple[Optional[str], float]:
+    """Najlepsza pozycja i pewność (połowa, gdy remis - opis jest niejednoznaczny)."""
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] <= 0:
+        return None, 0.0
+    best, best_score = ranked[0]
+    if len(ranked) > 1 and ranked[1][1] == best_score:
+        return best, best_score * 0.5
+    return best, best_score
+
+
+def match_model(text: str) -> Tuple[Optional[str], float]:
+    model_tokens = {model: _tokens(model) for model in get_catalog().model_names}
+    vocabulary = set().union(*model_tokens.values())
+    found = _fuzzy_tokens(_tokens(text), vocabulary)
+    scores = {model: len(tokens & found) / len(tokens) for model, tokens in model_tokens.items()}
+    return _best_match(scores)
+
+
+def match_furnace(text: str) -> Tuple[Optional[str], float]:
+    furnace_tokens = {furnace: _tokens(furnace) for furnace in get_catalog().furnace_names}
+    shared = Counter(token for tokens in furnace_tokens.values() for token in tokens)
+    # Liczą się tylko słowa wyróżniające dany piec ("narvi", "drewn", "harvia"...)
+    distinctive = {furnace: {t for t in tokens if shared[t] == 1} for furnace, tokens in furnace_tokens.items()}
+    vocabulary = set().union(*distinctive.values())
+    found = _fuzzy_tokens(_tokens(text), vocabulary)
+    scores = {furnace: min(1.0, float(len(tokens & found))) for furnace, tokens in distinctive.items()}
+    return _best_match(scores)
+
+
+def extract_paint(folded: str) -> str:
+    if re.search(r"bez\s+malowan", folded):
+        return ""
+    match = _PAINT_RE.search(folded)
+    if not match:
+        return "1" if re.search(r"\bmalowan", folded) else ""
+    number = match.group(1) or match.group(2)
+    if number:
+        return number
+    word = match.group(3) or match.group(4) or ""
+    for prefix, value in _PAINT_WORDS.items():
+        if word.startswith(prefix):
+            return str(value)
+    return ""
+
+
+def extract_custom_delivery(folded: str) -> str:
+    match = _UNLOADING_RE.search(folded)
+    return re.sub(r"\s", "", match.group(1)) if match else ""
+
+
+def _fold_chars(text: str) -> str:
+    """fold_text znak po znaku - bez zmiany długości, więc pozycje dopasowań pasują do oryginału."""
+    return "".join(fold_text(ch)[:1] or ch for ch in text)
+
+
+def _location_span(text: str, start: int, end: int, catalog_tokens: Set[str]) -> str:
+    """
+    Lokalizacja po słowie-kluczu z oryginalnego tekstu (wielkość liter, polskie
+    znaki): do końca zdania i bez kolejnych fragmentów listy opisujących saunę,
+    piec czy malowanie ("ul. Gdańska 5, Wąchock, piec Harvia" -> "ul. Gdańska 5, Wąchock").
+    """
+    sentence_end = _SENTENCE_END_RE.search(_fold_chars(text[start:end]))
+    if sentence_end:
+        end = start + sentence_end.start()
+    segments = text[start:end].split(",")
+    kept = [segments[0]]
+    for segment in segments[1:]:
+        segment_tokens = _tokens(segment)
+        if segment_tokens & catalog_tokens or any(token.startswith(_KEYWORD_STEMS) for token in segment_tokens):
+            break
+        kept.append(segment)
+    return ",".join(kept).strip(" .")
+
+
+def _canonical_location(phrase: str) -> Optional[str]:
+    gazetteer = get_gazetteer()
+    return gazetteer.canonical_name(phrase) if gazetteer else None
+
+
+def location_resolves(location: str) -> bool:
+    """Czy lokalizację da się znaleźć w spisie miejscowości (offline)"""
+    gazetteer = get_gazetteer()
+    return gazetteer is not None and gazetteer.lookup(location) is not None
+
+
+def extract_location(text: str, model: Optional[str], furnace: Optional[str]) -> str:
+    catalog_tokens = (_tokens(model) if model else set()) | (_tokens(furnace) if furnace else set())
+    explicit = _LOCATION_RE.search(_fold_chars(text))
+    if explicit:
+        phrase = _location_span(text, explicit.start(1), explicit.end(1), catalog_tokens)
+        return _canonical_location(phrase) or phrase
+
+    # "... do Krakowa" - nazwa własna po przyimku, o ile jest w spisie miejscowości
+    for phrase in re.findall(r"\b(?:do|w|we)\s+([A-ZŁŚŻŹĆ][\w\-]+(?:\s+[A-ZŁŚŻŹĆ][\w\-]+)?)", text):
+        canonical = _canonical_location(phrase)
+        if canonical:
+            return canonical
+
+    # Bez słowa-klucza: szukamy fragmentu listy, który nie opisuje sauny ani pieca
+    for segment in re.split(r"[,;\n]", text):
+        segment_tokens = _tokens(segment)
+        if not segment_tokens or segment_tokens & catalog_tokens:
+            continue
+        if any(token.startswith(_KEYWORD_STEMS) for token in segment_tokens) or any(ch.isdigit() for ch in segment):
+            continue
+        words = [word for word in re.findall(r"[^\W\d_][\w\-]*", segment) if word.lower() not in ("do", "w", "na")]
+        canonical = _canonical_location(" ".join(words))
+        if canonical:
+            return canonical
+    return ""
+
+
+def parse_configuration(text: str) -> Tuple[dict, float]:
+    """
+    Wyciąga konfigurację sauny z opisu bez udziału LLM.
+
+    Returns:
+        Tuple[dict, float]: Dane w formacie generate_sauna_offer oraz pewność 0-1
+            (iloczyn pewności rozpoznania modelu i pieca, obniżony, gdy
+            lokalizacji nie ma w spisie miejscowości)
+    """
+    folded = fold_text(text)
+    model, model_confidence = match_model(text)
+    furnace, furnace_confidence = match_furnace(text)
+    sauna_data = {
+        "type": model.split()[0] if model else "",
+        "model": model or "",
+        "location": extract_location(text, model, furnace),
+        "custom_delivery": extract_custom_delivery(folded),
+        "furnace": furnace or "",
+        "paint": extract_paint(folded),
+    }
+    confidence = model_confidence * furnace_confidence
+    if sauna_data["location"] and not location_resolves(sauna_data["location"]):
+        confidence *= UNRESOLVED_LOCATION_CONFIDENCE
+    return sauna_data, round(confidence, 3)
+
+
+def parse_sauna_description(text: str, llm_parse: Callable[[str], dict]) -> Tuple[dict, str]:
+    """
+    Zwraca konfigurację z parsera lokalnego, a przy niskiej pewności - z LLM.
+
+    Returns:
+        Tuple[dict, str]: Dane sauny oraz ścieżka, którą je uzyskano ("local" albo "llm")
+    """
+    sauna_data, confidence = parse_configuration(text)
+    path = "local" if confidence >= LOCAL_PARSER_THRESHOLD else "llm"
+    if path == "llm":
+        sauna_data = llm_parse(text)
+    with _stats_lock:
+        _stats[path] += 1
+    return sauna_data, path
+
+
+def parse_path_stats() -> dict:
+    """Ile opisów rozpoznał parser lokalny, a ile trafiło do LLM."""
+    with _stats_lock:
+        local, llm = _stats["local"], _stats["llm"]
+    total = local + llm
+    return {"local": local, "llm": llm, "local_rate": round(local / total, 3) if total else 0.0}
+
+
+register_collector("text_parser", parse_path_stats)
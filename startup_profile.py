@@ -0,0 +1,98 @@
+"""
+Tryb profilowania startu (STARTUP_PROFILE=1): czas importu każdego modułu.
+
+Po install() każdy importowany od tej chwili moduł jest mierzony - łącznie
+(z modułami, które sam importuje) i własny. report() wypisuje najwolniejsze
+moduły w konsoli, a strona Metryki pokazuje je w tabeli. Dla pełnego obrazu
+(łącznie z samym Streamlit) można też użyć: python -X importtime -m streamlit run main.py
+"""
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "25"))
+
+_timings = {}
+_stack = threading.local()
+_started_at: Optional[float] = None
+_reported = False
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Opakowanie loadera mierzące wykonanie modułu; po imporcie przywracany jest oryginał."""
+
+    def __init__(self, loader, name: str):
+        self.loader = loader
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        frames = _stack.__dict__.setdefault("frames", [])
+        frames.append(0.0)
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = frames.pop()
+            if frames:
+                frames[-1] += elapsed
+            _timings[self.name] = (elapsed, elapsed - children)
+            if module.__spec__ is not None:
+                module.__spec__.loader = self.loader
+            module.__loader__ = self.loader
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+def install() -> None:
+    """Włącza pomiar importów (raz na proces)."""
+    global _started_at
+    if _started_at is None:
+        _started_at = time.perf_counter()
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def is_enabled() -> bool:
+    return _started_at is not None
+
+
+def import_report(top: int = STARTUP_PROFILE_TOP) -> List[dict]:
+    """Najwolniej importowane moduły (czas łączny i własny w ms)."""
+    ranked = sorted(_timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [
+        {"module": name, "total_ms": round(total * 1000, 1), "self_ms": round(own * 1000, 1)}
+        for name, (total, own) in ranked
+    ]
+
+
+def report(top: int = STARTUP_PROFILE_TOP) -> None:
+    """Wypisuje raport importów w konsoli - tylko po pierwszym przebiegu skryptu."""
+    global _reported
+    if _reported or _started_at is None:
+        return
+    _reported = True
+    elapsed = time.perf_counter() - _started_at
+    print(f"Start aplikacji: {elapsed * 1000:.0f} ms, zaimportowano {len(_timings)} modułów")
+    print(f"{'moduł':<50} {'łącznie ms':>11} {'własny ms':>10}")
+    for entry in import_report(top):
+        print(f"{entry['module']:<50} {entry['total_ms']:>11.1f} {entry['self_ms']:>10.1f}")
@@ -0,0 +1,18 @@
+import pytest
+
+from data.catalog import MODEL, UnknownProductError, get_catalog
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ankel Larg 3,0m", "Ankel Large 3,0m"),
+    ("Ankel Large 3m", "Ankel Large 3,0m"),
+    ("Toone 3,6 Opne", "Toone 3,6 Open"),
+])
+def test_fuzzy_match_with_same_size(text, expected):
+    assert get_catalog().require(MODEL, text).name == expected
+
+
+@pytest.mark.parametrize("text", ["Ankel Large 3,6m", "Ankel Mini 2,4m"])
+def test_fuzzy_match_rejects_other_size(text):
+    with pytest.raises(UnknownProductError):
+        get_catalog().require(MODEL, text)
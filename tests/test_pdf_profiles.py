@@ -0,0 +1,36 @@
+import dataclasses
+
+import pytest
+
+from data.catalog import get_catalog
+from offer_engine import weasyprint_available
+from pdf_profiles import PDF_PROFILES, get_pdf_profile
+from pdf_template import generate_sauna_offer_details
+
+# Bez geokodowania - odległość nie wpływa na rozmiar PDF
+DELIVERY_INFO = {"distance_km": 120.0, "delivery_cost": 600.0, "message": ""}
+
+
+@pytest.fixture
+def sauna_data():
+    if not weasyprint_available():
+        pytest.skip("WeasyPrint nie jest dostępny")
+    catalog = get_catalog()
+    # Model z największą galerią - najcięższa oferta w katalogu
+    model = max(catalog.models, key=lambda product: len(product.images))
+    return {"type": model.type, "model": model.name, "furnace": catalog.furnace_names[0], "location": "Kraków", "paint": "2"}
+
+
+@pytest.mark.parametrize("profile", list(PDF_PROFILES))
+def test_offer_fits_profile(sauna_data, profile):
+    offer = generate_sauna_offer_details(sauna_data, delivery_info=DELIVERY_INFO, profile=profile)
+    assert offer["profile"] == profile
+    assert len(offer["pdf_bytes"]) <= PDF_PROFILES[profile].max_bytes
+
+
+def test_oversized_offer_reports_fallback_profile(sauna_data):
+    profile = dataclasses.replace(get_pdf_profile("email"), max_bytes=1)
+    offer = generate_sauna_offer_details(sauna_data, delivery_info=DELIVERY_INFO, profile=profile)
+    assert offer["requested_profile"] == "email"
+    assert offer["profile"] == profile.fallback
+    assert len(offer["pdf_bytes"]) <= get_pdf_profile(profile.fallback).max_bytes
@@ -0,0 +1,19 @@
+import pytest
+
+from sauny.text_parser import extract_location
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("dostawa do Warszawy", "Warszawa"),
+    ("dostawa w Krakowie", "Kraków"),
+    ("dostawa: Kraków", "Kraków"),
+    ("lokalizacja - Gdańsk", "Gdańsk"),
+    # Początek nazwy miejscowości nie może zostać wzięty za przyimek
+    ("dostawa Warszawa", "Warszawa"),
+    ("dostawa Wrocław", "Wrocław"),
+    ("dostawa Dobrzyca", "Dobrzyca"),
+    ("transport Wieliczka", "Wieliczka"),
+    ("dostawa Nakło nad Notecią", "Nakło nad Notecią"),
+])
+def test_extract_location_after_keyword(text, expected):
+    assert extract_location(text, None, None) == expected